@@ -2,7 +2,6 @@
 Should take in a sam file from a aligner like bwa aln or bwa mem and convert it into a
 """
 from copy import copy
-import itertools
 import os
 import re
 import subprocess
@@ -425,6 +424,58 @@ def align_sequences(
                         warnings.warn(repr(err))
 
 
+def paired_alignment_candidates(evidence, std_reads):
+    """
+    Pairs the standardized reads for a contig which could possibly support the primary event
+
+    Reads are bucketed by which evidence window their breakpoint could fall in. Only pairs with one read in each window
+    and whose combined query coverage extends far enough past either read alone are returned. This avoids calling
+    :func:`call_paired_read_event` for every combination of reads
+
+    Args:
+        evidence (Evidence): the evidence object the contig belongs to
+        std_reads (Iterable of pysam.AlignedSegment): the standardized contig alignments
+
+    Returns:
+        :class:`list` of :class:`tuple` of :class:`pysam.AlignedSegment`: read pairs in the order of :func:`itertools.combinations`
+    """
+    reads = []
+    window1_reads = []
+    window2_reads = []
+    for read in std_reads:
+        try:
+            breakpoint = read_breakpoint(read)
+        except AssertionError:
+            continue
+        qcov = query_coverage_interval(read)
+        if read.is_reverse:  # use the query coverage relative to the forward strand so reads can be compared directly
+            seqlen = len(read.query_sequence)
+            qcov = Interval(seqlen - qcov.end, seqlen - qcov.start)
+        # the second breakpoint of a pair can be shifted by the query overlap which is at most the aligned query length
+        shift = len(qcov)
+        window = (breakpoint.start - shift, breakpoint.end + shift)
+        index = len(reads)
+        reads.append((read, qcov))
+        if breakpoint.chr == evidence.break1.chr and Interval.overlaps(window, evidence.outer_window1):
+            window1_reads.append(index)
+        if breakpoint.chr == evidence.break2.chr and Interval.overlaps(window, evidence.outer_window2):
+            window2_reads.append(index)
+
+    pairs = set()
+    for index1 in window1_reads:
+        qcov1 = reads[index1][1]
+        for index2 in window2_reads:
+            if index1 == index2:
+                continue
+            qcov2 = reads[index2][1]
+            # must match the criteria used by SplitAlignment.query_overlap_extension
+            extension = max(qcov1.end, qcov2.end) - min(qcov1.start, qcov2.start) + 1 - max(len(qcov1), len(qcov2))
+            if extension < evidence.contig_aln_min_extend_overlap:
+                continue
+            pairs.add((min(index1, index2), max(index1, index2)))
+    return [(reads[index1][0], reads[index2][0]) for index1, index2 in sorted(pairs)]
+
+
 def select_contig_alignments(evidence, reads_by_query):
     """
     standardize/simplify reads and filter bad/irrelevant alignments
@@ -484,7 +535,7 @@ def select_contig_alignments(evidence, reads_by_query):
                 min_anchor_size=evidence.contig_aln_min_anchor_size
             ))
 
-        for read1, read2 in itertools.combinations(std_reads, 2):
+        for read1, read2 in paired_alignment_candidates(evidence, std_reads):
             try:
                 paired_event = call_paired_read_event(read1, read2)
 
@@ -1,9 +1,78 @@
+from collections import OrderedDict
 import re
 
 from ..constants import STRAND
 from ..interval import Interval
 
 
+class SequenceCache:
+    """
+    size-bounded memo of computed sequences (genomic slices, spliced cdna, translations). Entries are evicted least
+    recently used first once the total length of the cached sequences (and any sequences used in their keys) exceeds
+    the maximum length
+
+    Attributes:
+        max_length (int): the maximum total length of the cached sequences
+        length (int): the current total length of the cached sequences
+        hits (int): the number of lookups which were found in the cache
+        misses (int): the number of lookups which had to be computed
+    """
+
+    def __init__(self, max_length=50000000):
+        self.max_length = max_length
+        self.length = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __str__(self):
+        return 'SequenceCache(entries={}, length={}, hits={}, misses={})'.format(
+            len(self), self.length, self.hits, self.misses)
+
+    def fetch(self, key, compute, *pinned):
+        """
+        Args:
+            key (tuple): the key for the sequence, must identify the inputs to compute completely
+            compute (callable): computes the sequence if it is not cached
+            pinned: objects which must be kept alive while the entry is cached (ex. objects whose id is part of the key)
+
+        Returns:
+            str: the cached or newly computed sequence
+        """
+        try:
+            seq, _, _ = self._items[key]
+            self._items.move_to_end(key)
+            self.hits += 1
+            return seq
+        except KeyError:
+            pass
+        self.misses += 1
+        seq = compute()
+        cost = len(seq) + sum([len(k) for k in key if isinstance(k, str)])
+        if cost <= self.max_length:
+            self._items[key] = (seq, cost, pinned)
+            self.length += cost
+            while self.length > self.max_length:
+                _, (_, evicted_cost, _) = self._items.popitem(last=False)
+                self.length -= evicted_cost
+        return seq
+
+    def clear(self):
+        """
+        remove all cached sequences and reset the counters
+        """
+        self._items.clear()
+        self.length = 0
+        self.hits = 0
+        self.misses = 0
+
+
+SEQUENCE_CACHE = SequenceCache()
+
+
 class ReferenceName(str):
     """
     Class for reference sequence names. Ensures that hg19/hg38 chromosome names match.
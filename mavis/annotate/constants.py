@@ -8,7 +8,11 @@ from ..util import WeakMavisNamespace
 
 DEFAULTS = WeakMavisNamespace()
 """
+- :term:`annotate_cache`
+- :term:`annotate_checkpoint_interval`
+- :term:`annotate_workers`
 - :term:`annotation_filters`
+- :term:`defer_drawings`
 - :term:`max_orf_cap`
 - :term:`min_domain_mapping_match`
 - :term:`min_orf_size`
@@ -29,6 +33,22 @@ DEFAULTS.add(
 DEFAULTS.add(
     'draw_non_synonymous_cdna_only', True, cast_type=tab.cast_boolean,
     defn='flag to indicate if events which are synonymous at the cdna level should produce illustrations')
+DEFAULTS.add(
+    'annotate_workers', 1, cast_type=int,
+    defn='the number of processes to use in annotating the breakpoint pairs, building the fusion products and drawing '
+    'the illustrations')
+DEFAULTS.add(
+    'annotate_cache', False, cast_type=tab.cast_boolean,
+    defn='flag to indicate if the results for each breakpoint pair should be cached in the output directory so that '
+    'a rerun (with the same reference files and options) only annotates new or changed breakpoint pairs')
+DEFAULTS.add(
+    'annotate_checkpoint_interval', 50, cast_type=int,
+    defn='the number of newly annotated breakpoint pairs between writes of the annotation cache to disk')
+DEFAULTS.add(
+    'defer_drawings', False, cast_type=tab.cast_boolean,
+    defn='flag to indicate if the illustrations should be drawn after all the breakpoint pairs have been annotated '
+    'rather than as each annotation is built. Keeps the drawing out of the annotation workers and spreads the '
+    'illustrations evenly over the worker processes')
 
 SPLICE_TYPE = MavisNamespace(
     RETAIN='retained intron',
@@ -70,3 +90,14 @@ ACCEPTOR_SEQ = [
     re.compile('([TC]{9}TAG)([GA][ATCG])'),
     re.compile('([TC]{8}[ATCG]AAG)([GA][ATCG])')
 ]
+
+SPLICE_SEQ_ANCHORS = {
+    DONOR_SEQ[0]: (2, 'GT'),
+    DONOR_SEQ[1]: (3, 'GT'),
+    ACCEPTOR_SEQ[0]: (10, 'AG'),
+    ACCEPTOR_SEQ[1]: (10, 'AG'),
+    ACCEPTOR_SEQ[2]: (10, 'AG')
+}
+""":class:`dict`: the offset of the GT (donor) or AG (acceptor) dinucleotide in each of the splice site patterns. Matches
+for a pattern can only start at the positions of its dinucleotide less the offset
+"""
@@ -1,11 +1,16 @@
+from .base import SequenceCache
 from .genomic import Exon, Transcript, PreTranscript
-from .protein import calculate_orf, Domain, Translation
+from .protein import calculate_orf, Domain, DomainRegion, Translation
 from ..breakpoint import Breakpoint
 from ..constants import ORIENT, PRIME, PROTOCOL, reverse_complement, STRAND, SVTYPE
 from ..error import NotSpecifiedError
 from ..interval import Interval, IntervalMapping
 
 
+FUSION_PRODUCT_CACHE = SequenceCache()
+""":class:`~mavis.annotate.base.SequenceCache`: translations and domain mappings computed for each spliced fusion sequence"""
+
+
 def determine_prime(transcript, breakpoint):
     """
     determine the side of the transcript 5' or 3' which is 'kept' given the breakpoint
@@ -59,6 +64,7 @@ class FusionTranscript(PreTranscript):
         self.name = None
         # interval to interval mapping of transcript coord to their original genome coord
         self.mapping_to_genome = IntervalMapping()
+        self._coordinate_maps = {}
         self.mapping_to_chrs = dict()  # keeps track of what chromosome per interval
         self.break1 = None  # first breakpoint position in the fusion transcript
         self.break2 = None  # second breakpoint position in the fusion transcript
@@ -373,47 +379,78 @@ class FusionTranscript(PreTranscript):
             fusion_spl_tx = Transcript(fusion_pre_transcript, spl_patt)
             fusion_pre_transcript.spliced_transcripts.append(fusion_spl_tx)
 
-            # calculate the putative open reading frames
-            orfs = calculate_orf(fusion_spl_tx.get_seq(), min_orf_size=min_orf_size)
-            # limit the length to either only the longest ORF or anything longer than the input translations
-            min_orf_length = max([len(o) for o in orfs] + [min_orf_size if min_orf_size else 0])
-            for ref_tx in [ann.transcript1, ann.transcript2]:
-                for tlx in ref_tx.translations:
-                    min_orf_length = min(min_orf_length, len(tlx))
-
-            # filter the orfs based on size
-            orfs = [o for o in orfs if len(o) >= min_orf_length]
-
-            # if there are still too many filter to reasonable number
-            if max_orf_cap and len(orfs) > max_orf_cap:  # limit the number of orfs returned
-                orfs = sorted(orfs, key=lambda x: len(x), reverse=True)
-                orfs = orfs[0:max_orf_cap]
-            # create the translations
-            for orf in orfs:
-                translation = Translation(
-                    orf.start - fusion_spl_tx.start + 1,
-                    orf.end - fusion_spl_tx.start + 1, fusion_spl_tx)
+            # the products depend only on the spliced sequence so fusions which only differ in the intronic sequence
+            # or in the exact breakpoint position (ex. between calls) reuse the translations and domain mappings
+            key = (
+                'fusion_products', fusion_spl_tx.get_seq(), fusion_spl_tx.start,
+                id(ann.transcript1), id(ann.transcript2), id(reference_genome),
+                min_orf_size, max_orf_cap, min_domain_mapping_match
+            )
+            products = FUSION_PRODUCT_CACHE.fetch(
+                key,
+                lambda: cls._translate_spliced_transcript(
+                    ann, fusion_spl_tx, reference_genome, min_orf_size, max_orf_cap, min_domain_mapping_match),
+                ann.transcript1, ann.transcript2, reference_genome
+            )
+            for start, end, domains in products:
+                translation = Translation(start, end, fusion_spl_tx)
+                for name, regions in domains:
+                    translation.domains.append(
+                        Domain(name, [DomainRegion(rstart, rend, rseq) for rstart, rend, rseq in regions], translation))
                 fusion_spl_tx.translations.append(translation)
-
-        # remap the domains from the original translations to the current translations
-        for fusion_spl_tx in fusion_pre_transcript.spliced_transcripts:
-            for new_tl in fusion_spl_tx.translations:
-                aa_seq = new_tl.get_aa_seq()
-                assert aa_seq[0] == 'M'
-                translations = ann.transcript1.translations[:]
-                if ann.transcript1 != ann.transcript2:
-                    translations += ann.transcript2.translations
-                for translation in translations:
-                    for dom in translation.domains:
-                        try:
-                            match, total, regions = dom.align_seq(aa_seq, reference_genome)
-                            if min_domain_mapping_match is None or match / total >= min_domain_mapping_match:
-                                new_dom = Domain(dom.name, regions, new_tl)
-                                new_tl.domains.append(new_dom)
-                        except UserWarning:
-                            pass
         return fusion_pre_transcript
 
+    @classmethod
+    def _translate_spliced_transcript(
+        cls, ann, fusion_spl_tx, reference_genome, min_orf_size, max_orf_cap, min_domain_mapping_match
+    ):
+        """
+        calculates the putative open reading frames for a spliced fusion transcript and maps the domains from the
+        original translations onto them
+
+        Returns:
+            tuple: the start and end of each translation (wrt the spliced transcript) and its domains as tuples of the
+            domain name and the start, end and sequence of each region
+        """
+        # calculate the putative open reading frames
+        orfs = calculate_orf(fusion_spl_tx.get_seq(), min_orf_size=min_orf_size)
+        # limit the length to either only the longest ORF or anything longer than the input translations
+        min_orf_length = max([len(o) for o in orfs] + [min_orf_size if min_orf_size else 0])
+        for ref_tx in [ann.transcript1, ann.transcript2]:
+            for tlx in ref_tx.translations:
+                min_orf_length = min(min_orf_length, len(tlx))
+
+        # filter the orfs based on size
+        orfs = [o for o in orfs if len(o) >= min_orf_length]
+
+        # if there are still too many filter to reasonable number
+        if max_orf_cap and len(orfs) > max_orf_cap:  # limit the number of orfs returned
+            orfs = sorted(orfs, key=lambda x: len(x), reverse=True)
+            orfs = orfs[0:max_orf_cap]
+
+        translations = ann.transcript1.translations[:]
+        if ann.transcript1 != ann.transcript2:
+            translations += ann.transcript2.translations
+        products = []
+        for orf in orfs:
+            new_tl = Translation(
+                orf.start - fusion_spl_tx.start + 1,
+                orf.end - fusion_spl_tx.start + 1, fusion_spl_tx)
+            # remap the domains from the original translations to the current translation
+            aa_seq = new_tl.get_aa_seq()
+            assert aa_seq[0] == 'M'
+            domains = []
+            for translation in translations:
+                for dom in translation.domains:
+                    try:
+                        match, total, regions = dom.align_seq(aa_seq, reference_genome)
+                        if min_domain_mapping_match is None or match / total >= min_domain_mapping_match:
+                            domains.append((dom.name, tuple([(r.start, r.end, r.seq) for r in regions])))
+                    except UserWarning:
+                        pass
+            products.append((new_tl.start, new_tl.end, tuple(domains)))
+        return tuple(products)
+
     def get_seq(self, reference_genome=None, ignore_cache=False):
         return PreTranscript.get_seq(self)
 
@@ -1,7 +1,10 @@
+import bisect
 from copy import copy
 import itertools
 
-from .base import BioInterval, ReferenceName
+import numpy as np
+
+from .base import BioInterval, ReferenceName, SEQUENCE_CACHE
 from .constants import SPLICE_SITE_TYPE
 from .splicing import SpliceSite, SplicingPattern
 from ..constants import ORIENT, reverse_complement, STRAND
@@ -245,6 +248,151 @@ class Exon(BioInterval):
             self.end, '' if self.end_splice_site.intact else '*')
 
 
+class ExonCoordinateMap:
+    """
+    Maps between genomic and cdna coordinates for a single splicing pattern of a transcript. Stores the sorted genomic
+    exon starts and ends with the prefix sums of the exon lengths so that positions are converted by bisection
+
+    Attributes:
+        starts (:class:`list` of :class:`int`): the genomic start of each exon (sorted)
+        ends (:class:`list` of :class:`int`): the genomic end of each exon
+        offsets (:class:`list` of :class:`int`): the total length of the exons preceding (genomically) each exon
+        cumulative (:class:`list` of :class:`int`): the total length of the exons up to and including each exon
+        length (int): the length of the cdna
+        is_reverse (bool): True if the transcript is on the negative strand
+    """
+
+    def __init__(self, start, end, splice_positions, strand):
+        """
+        Args:
+            start (int): the genomic start of the transcript
+            end (int): the genomic end of the transcript
+            splice_positions (:class:`list` of :class:`int`): genomic positions of the splice sites
+            strand (STRAND): the strand of the transcript
+        """
+        if strand == STRAND.POS:
+            self.is_reverse = False
+        elif strand == STRAND.NEG:
+            self.is_reverse = True
+        else:
+            raise NotSpecifiedError('cannot convert without strand information')
+        pos = sorted(list(splice_positions) + [start, end])
+        self.starts = []
+        self.ends = []
+        self.offsets = []
+        self.cumulative = []
+        self.length = 0
+        for exon in [Interval(s, t) for s, t in zip(pos[::2], pos[1::2])]:
+            self.starts.append(exon.start)
+            self.ends.append(exon.end)
+            self.offsets.append(self.length)
+            self.length += len(exon)
+            self.cumulative.append(self.length)
+        self._np_arrays = None
+
+    def __len__(self):
+        return self.length
+
+    def exon_index(self, pos):
+        """
+        Returns:
+            int: the index of the exon containing the genomic position or None if the position is not exonic
+        """
+        index = bisect.bisect_right(self.starts, pos) - 1
+        if index >= 0 and pos <= self.ends[index]:
+            return index
+        return None
+
+    def _exon_to_cdna(self, index, pos):
+        offset = pos - self.starts[index] + self.offsets[index] + 1
+        return self.length - offset + 1 if self.is_reverse else offset
+
+    def genomic_to_cdna(self, pos):
+        """
+        Args:
+            pos (int): the genomic position
+
+        Returns:
+            int: the cdna position
+
+        Raises:
+            IndexError: the position is not exonic
+        """
+        index = self.exon_index(pos)
+        if index is None:
+            raise IndexError('outside of exonic regions', pos)
+        return self._exon_to_cdna(index, pos)
+
+    def genomic_to_nearest_cdna(self, pos, stick_direction=None, allow_outside=True):
+        """
+        see :meth:`PreTranscript.convert_genomic_to_nearest_cdna`
+        """
+        index = self.exon_index(pos)
+        if index is not None:
+            return self._exon_to_cdna(index, pos), 0
+        index = bisect.bisect_right(self.starts, pos)  # the index of the next exon
+        if 0 < index < len(self.starts):
+            # intronic
+            prev_end = self.ends[index - 1]
+            next_start = self.starts[index]
+            if (abs(pos - prev_end) <= abs(pos - next_start) or stick_direction == ORIENT.LEFT) and stick_direction != ORIENT.RIGHT:
+                # closest to the first exon
+                return self._exon_to_cdna(index - 1, prev_end), prev_end - pos if self.is_reverse else pos - prev_end
+            return self._exon_to_cdna(index, next_start), next_start - pos if self.is_reverse else pos - next_start
+        if allow_outside:
+            if index == 0:  # before the first exon
+                return self.length if self.is_reverse else 1, pos - self.starts[0]
+            return 1 if self.is_reverse else self.length, pos - self.ends[-1]
+        raise IndexError('position does not fall within the current transcript', pos, list(zip(self.starts, self.ends)))
+
+    def cdna_to_genomic(self, pos):
+        """
+        Args:
+            pos (int): the cdna position
+
+        Returns:
+            int: the genomic position
+        """
+        if pos < 0:
+            if self.is_reverse:
+                return self.ends[-1] + abs(pos)
+            return self.starts[0] + pos
+        if pos > self.length:
+            pos -= self.length
+            if self.is_reverse:
+                return self.starts[0] - pos
+            return self.ends[-1] + pos
+        if pos == 0:
+            raise IndexError(pos, 'is outside mapped range', list(zip(self.starts, self.ends)))
+        offset = self.length - pos + 1 if self.is_reverse else pos
+        index = bisect.bisect_left(self.cumulative, offset)
+        return self.starts[index] + offset - self.offsets[index] - 1
+
+    def genomic_to_cdna_array(self, positions):
+        """
+        converts many genomic positions at once
+
+        Args:
+            positions (numpy.ndarray): array of genomic positions
+
+        Returns:
+            tuple:
+                - ``numpy.ndarray`` - the cdna positions (0 where the position is not exonic)
+                - ``numpy.ndarray`` - boolean mask of the exonic positions
+        """
+        if self._np_arrays is None:
+            self._np_arrays = (np.array(self.starts), np.array(self.ends), np.array(self.offsets))
+        starts, ends, offsets = self._np_arrays
+        positions = np.asarray(positions)
+        index = np.searchsorted(starts, positions, side='right') - 1
+        safe_index = np.clip(index, 0, len(starts) - 1)
+        exonic = (index >= 0) & (positions <= ends[safe_index])
+        cdna = positions - starts[safe_index] + offsets[safe_index] + 1
+        if self.is_reverse:
+            cdna = self.length - cdna + 1
+        return np.where(exonic, cdna, 0), exonic
+
+
 class PreTranscript(BioInterval):
     """
     """
@@ -298,6 +446,7 @@ class PreTranscript(BioInterval):
 
         for s in self.spliced_transcripts:
             s.reference_object = self
+        self._coordinate_maps = {}
 
         try:
             if self.get_strand() != self.gene.get_strand():
@@ -357,6 +506,23 @@ class PreTranscript(BioInterval):
         mapping = {v: k for k, v in self._genomic_to_cdna_mapping(splicing_pattern).items()}
         return mapping
 
+    def coordinate_map(self, splicing_pattern):
+        """
+        Args:
+            splicing_pattern (SplicingPattern): list of genomic splice sites 3'5' repeating
+
+        Returns:
+            ExonCoordinateMap: the (cached) coordinate map for the splicing pattern
+        """
+        splice_positions = tuple([s.pos for s in splicing_pattern])
+        key = (self.get_strand(), self.start, self.end, splice_positions)
+        try:
+            return self._coordinate_maps[key]
+        except KeyError:
+            coordinate_map = ExonCoordinateMap(self.start, self.end, splice_positions, self.get_strand())
+            self._coordinate_maps[key] = coordinate_map
+            return coordinate_map
+
     def convert_genomic_to_cdna(self, pos, splicing_pattern):
         """
         Args:
@@ -389,33 +555,8 @@ class PreTranscript(BioInterval):
                 * *int* - the intronic shift
 
         """
-        mapping = self._genomic_to_cdna_mapping(splicing_pattern)
-        exons = sorted(list(mapping.keys()))
-        # exonic
-        for ex in exons:
-            if pos <= ex.end and pos >= ex.start:
-                # in the current exon
-                cdna_pos = Interval.convert_pos(mapping, pos, True if self.get_strand() == STRAND.NEG else False)
-                return cdna_pos, 0
-        # intronic
-        for ex1, ex2 in zip(exons, exons[1::]):
-            if pos > ex1.end and pos < ex2.start:
-                # in the current intron
-                if (abs(pos - ex1.end) <= abs(pos - ex2.start) or stick_direction == ORIENT.LEFT) and stick_direction != ORIENT.RIGHT:
-                    # closest to the first exon
-                    cdna_pos = Interval.convert_pos(mapping, ex1.end, True if self.get_strand() == STRAND.NEG else False)
-                    return cdna_pos, pos - ex1.end if self.get_strand() == STRAND.POS else ex1.end - pos
-                cdna_pos = Interval.convert_pos(mapping, ex2.start, True if self.get_strand() == STRAND.NEG else False)
-                return cdna_pos, pos - ex2.start if self.get_strand() == STRAND.POS else ex2.start - pos
-        if allow_outside:
-            cdna_length = sum([len(e) for e in exons])
-            if pos < exons[0].start:  # before the first exon
-                return cdna_length if self.is_reverse else 1, pos - exons[0].start
-            elif pos > exons[-1].end:
-                return 1 if self.is_reverse else cdna_length, pos - exons[-1].end
-            else:
-                raise NotImplementedError('Unexpected error', self.exons, pos)
-        raise IndexError('position does not fall within the current transcript', pos, mapping)
+        return self.coordinate_map(splicing_pattern).genomic_to_nearest_cdna(
+            pos, stick_direction=stick_direction, allow_outside=allow_outside)
 
     def convert_cdna_to_genomic(self, pos, splicing_pattern):
         """
@@ -426,19 +567,7 @@ class PreTranscript(BioInterval):
         Returns:
             int: the genomic equivalent
         """
-        mapping = self._cdna_to_genomic_mapping(splicing_pattern)
-        exons = sorted(mapping.values())
-        length = sum([len(e) for e in mapping])
-        if pos < 0:
-            if self.is_reverse:
-                return exons[-1].end + abs(pos)
-            return exons[0].start + pos
-        if pos > length:
-            pos -= length
-            if self.is_reverse:
-                return exons[0].start - pos
-            return exons[-1].end + pos
-        return Interval.convert_pos(mapping, pos, True if self.get_strand() == STRAND.NEG else False)
+        return self.coordinate_map(splicing_pattern).cdna_to_genomic(pos)
 
     def exon_number(self, exon):
         """
@@ -485,9 +614,14 @@ class PreTranscript(BioInterval):
             return self.gene.seq[start:end]
         elif reference_genome is None:
             raise NotSpecifiedError('reference genome is required to retrieve the gene sequence')
-        if self.get_strand() == STRAND.NEG:
-            return reverse_complement(reference_genome[self.gene.chr].seq[self.start - 1:self.end]).upper()
-        return str(reference_genome[self.gene.chr].seq[self.start - 1:self.end]).upper()
+        record = reference_genome[self.gene.chr]
+        strand = self.get_strand()
+
+        def compute():
+            if strand == STRAND.NEG:
+                return reverse_complement(record.seq[self.start - 1:self.end]).upper()
+            return str(record.seq[self.start - 1:self.end]).upper()
+        return SEQUENCE_CACHE.fetch(('genomic', id(record), self.start, self.end, strand == STRAND.NEG), compute, record)
 
     def get_cdna_seq(self, splicing_pattern, reference_genome=None, ignore_cache=False):
         """
@@ -506,12 +640,17 @@ class PreTranscript(BioInterval):
         for i in range(0, len(temp) - 1, 2):
             conti.append(Interval(temp[i] - cdna_start, temp[i + 1] - cdna_start))
         seq = self.get_seq(reference_genome, ignore_cache)
-        if self.get_strand() == STRAND.NEG:
-            # adjust the continuous intervals for the min and flip if revcomp
-            seq = reverse_complement(seq)
-        spliced_seq = ''.join([str(seq[i.start:i.end + 1]) for i in conti])
-        spliced_seq = spliced_seq.upper()
-        return spliced_seq if self.get_strand() == STRAND.POS else reverse_complement(spliced_seq)
+        strand = self.get_strand()
+
+        def compute():
+            strand_seq = seq
+            if strand == STRAND.NEG:
+                # adjust the continuous intervals for the min and flip if revcomp
+                strand_seq = reverse_complement(strand_seq)
+            spliced_seq = ''.join([str(strand_seq[i.start:i.end + 1]) for i in conti])
+            spliced_seq = spliced_seq.upper()
+            return spliced_seq if strand == STRAND.POS else reverse_complement(spliced_seq)
+        return SEQUENCE_CACHE.fetch(('cdna', str(seq), strand, tuple([(i.start, i.end) for i in conti])), compute)
 
     @property
     def translations(self):
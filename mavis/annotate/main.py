@@ -1,20 +1,24 @@
+from concurrent.futures import ProcessPoolExecutor
 import json
 import os
+import pickle
 import re
 import time
 import warnings
 import hashlib
+import tempfile
 
+from .base import SEQUENCE_CACHE
 from .constants import DEFAULTS
 from .genomic import PreTranscript
 from .variant import annotate_events, choose_more_annotated, choose_transcripts_by_priority, call_protein_indel, flatten_fusion_transcript, flatten_fusion_translation
-from .fusion import determine_prime
+from .fusion import determine_prime, FUSION_PRODUCT_CACHE
 from ..cluster.constants import DEFAULTS as CLUSTER_DEFAULTS
 from ..constants import COLUMNS, PRIME, PROTOCOL, sort_columns
 from ..error import DrawingFitError, NotSpecifiedError
 from ..illustrate.constants import DEFAULTS as ILLUSTRATION_DEFAULTS
 from ..illustrate.constants import DiagramSettings
-from ..illustrate.diagram import draw_sv_summary_diagram
+from ..illustrate.diagram import draw_sv_summary_diagram, measure_sv_summary_diagram
 from ..util import generate_complete_stamp, log, mkdirp, read_inputs
 
 
@@ -24,9 +28,43 @@ ACCEPTED_FILTERS = {
 }
 
 
+def _drawing_name(ann):
+    """
+    Returns:
+        str: the file name (without extension) used for the drawing and legend of an annotation
+    """
+    gene_aliases1 = 'NA'
+    gene_aliases2 = 'NA'
+    try:
+        if ann.transcript1.gene.aliases:
+            gene_aliases1 = '-'.join(ann.transcript1.gene.aliases)
+        if ann.transcript1.is_best_transcript:
+            gene_aliases1 = 'b-' + gene_aliases1
+    except AttributeError:
+        pass
+    try:
+        if ann.transcript2.gene.aliases:
+            gene_aliases2 = '-'.join(ann.transcript2.gene.aliases)
+        if ann.transcript2.is_best_transcript:
+            gene_aliases2 = 'b-' + gene_aliases2
+    except AttributeError:
+        pass
+    try:
+        if determine_prime(ann.transcript1, ann.break1) == PRIME.THREE:
+            gene_aliases1, gene_aliases2 = gene_aliases2, gene_aliases1
+    except NotSpecifiedError:
+        pass
+
+    return 'mavis_{}-chr{}_chr{}-{}_{}'.format(
+        ann.annotation_id, ann.break1.chr, ann.break2.chr, gene_aliases1, gene_aliases2
+    )
+
+
 def draw(drawing_config, ann, reference_genome, template_metadata, drawings_directory):
     """
-    produces the svg diagram and json legend for a given annotation
+    produces the svg diagram and json legend for a given annotation. Each of the drawing settings is measured first
+    (see :func:`~mavis.illustrate.diagram.measure_sv_summary_diagram`) so that widths which cannot fit the diagram are
+    skipped without drawing
     """
     drawing = None
     legend = None
@@ -41,7 +79,14 @@ def draw(drawing_config, ann, reference_genome, template_metadata, drawings_dire
         ))
     drawing_attempts.append((initial_width, {'draw_fusion_transcript': False, 'draw_reference_transcripts': False}))
 
+    min_widths = {}
     for i, (curr_width, other_settings) in enumerate(drawing_attempts):
+        settings_key = tuple(sorted(other_settings.items()))
+        if settings_key not in min_widths:
+            min_widths[settings_key] = measure_sv_summary_diagram(
+                drawing_config, ann, templates=template_metadata, **other_settings)
+        if curr_width < min_widths[settings_key]:
+            continue
         log('drawing attempt:', i + 1, str(curr_width) + 'px', other_settings if other_settings else '', time_stamp=False)
         try:
             drawing_config.width = curr_width
@@ -50,33 +95,7 @@ def draw(drawing_config, ann, reference_genome, template_metadata, drawings_dire
                 templates=template_metadata,
                 **other_settings
             )
-
-            gene_aliases1 = 'NA'
-            gene_aliases2 = 'NA'
-            try:
-                if ann.transcript1.gene.aliases:
-                    gene_aliases1 = '-'.join(ann.transcript1.gene.aliases)
-                if ann.transcript1.is_best_transcript:
-                    gene_aliases1 = 'b-' + gene_aliases1
-            except AttributeError:
-                pass
-            try:
-                if ann.transcript2.gene.aliases:
-                    gene_aliases2 = '-'.join(ann.transcript2.gene.aliases)
-                if ann.transcript2.is_best_transcript:
-                    gene_aliases2 = 'b-' + gene_aliases2
-            except AttributeError:
-                pass
-            try:
-                if determine_prime(ann.transcript1, ann.break1) == PRIME.THREE:
-                    gene_aliases1, gene_aliases2 = gene_aliases2, gene_aliases1
-            except NotSpecifiedError:
-                pass
-
-            name = 'mavis_{}-chr{}_chr{}-{}_{}'.format(
-                ann.annotation_id, ann.break1.chr, ann.break2.chr, gene_aliases1, gene_aliases2
-            )
-
+            name = _drawing_name(ann)
             drawing = os.path.join(drawings_directory, name + '.svg')
             legend = os.path.join(drawings_directory, name + '.legend.json')
             log('generating svg:', drawing, time_stamp=False)
@@ -86,12 +105,345 @@ def draw(drawing_config, ann, reference_genome, template_metadata, drawings_dire
             with open(legend, 'w') as fh:
                 json.dump(legend_json, fh)
             break
-        except DrawingFitError:
+        except DrawingFitError:  # the measuring pass only covers the interval mappings of each view
             pass
     drawing_config.width = initial_width  # reset the width
     return drawing, legend
 
 
+_WORKER_STATE = {}
+
+
+def _init_annotate_worker(state):
+    _WORKER_STATE.clear()
+    _WORKER_STATE.update(state)
+
+
+def _annotation_rows(
+    ann, reference_genome, template_metadata, drawing_config, drawings_directory, fa_output_file,
+    draw_fusions_only, draw_non_synonymous_cdna_only, render_queue=None
+):
+    """
+    builds the output rows and fusion sequences for a single annotation and draws it (when applicable)
+
+    Args:
+        render_queue (list): if given, the annotation is added to this list to be drawn later (see
+            :func:`_render_drawing`) instead of being drawn now. The rows are given the paths the drawing will be
+            written to
+
+    Returns:
+        tuple: tuple contains
+
+            - :class:`dict`: the flattened annotation
+            - :class:`list` of :class:`dict`: the output rows for the annotation
+            - :class:`list` of :class:`tuple` of :class:`str` and :class:`str`: the fasta id and sequence of each fusion
+              transcript
+    """
+    ann_row = ann.flatten()
+    ann_row[COLUMNS.fusion_sequence_fasta_file] = fa_output_file
+    log('current annotation', ann.annotation_id, ann.transcript1, ann.transcript2, ann.event_type)
+    log(ann, time_stamp=False)
+    # get the reference sequences for either transcript
+    ref_cdna_seq = {}
+    ref_protein_seq = {}
+
+    for pre_transcript in [x for x in [ann.transcript1, ann.transcript2] if isinstance(x, PreTranscript)]:
+        name = pre_transcript.name
+        for spl_tx in pre_transcript.spliced_transcripts:
+            ref_cdna_seq.setdefault(spl_tx.get_seq(reference_genome), set()).add(name)
+            for translation in spl_tx.translations:
+                ref_protein_seq.setdefault(translation.get_aa_seq(reference_genome), set()).add(name)
+
+    # try building the fusion product
+    rows = []
+    fasta_records = []
+    cdna_synon_all = True
+    # add fusion information to the current ann_row
+    for spl_fusion_tx in [] if not ann.fusion else ann.fusion.transcripts:
+        seq = ann.fusion.get_cdna_seq(spl_fusion_tx.splicing_pattern)
+        # make the fasta id a hex of the string to avoid having to load the sequences later
+        fusion_fa_id = 'seq-{}'.format(hashlib.md5(seq.encode('utf-8')).hexdigest())
+        fasta_records.append((fusion_fa_id, seq))
+        cdna_synon = ';'.join(sorted(list(ref_cdna_seq.get(seq, set()))))
+
+        temp_row = {}
+        temp_row.update(ann_row)
+        temp_row.update(flatten_fusion_transcript(spl_fusion_tx))
+        temp_row[COLUMNS.fusion_sequence_fasta_id] = fusion_fa_id
+        temp_row[COLUMNS.cdna_synon] = cdna_synon if cdna_synon else None
+        if not cdna_synon:
+            cdna_synon_all = False
+        if spl_fusion_tx.translations:
+            # duplicate the ann_row for each translation
+            for fusion_translation in spl_fusion_tx.translations:
+                nrow = dict()
+                nrow.update(ann_row)
+                nrow.update(temp_row)
+                aa_seq = fusion_translation.get_aa_seq()
+                protein_synon = ';'.join(sorted(list(ref_protein_seq.get(aa_seq, set()))))
+                nrow[COLUMNS.protein_synon] = protein_synon if protein_synon else None
+                # select the exon
+                nrow.update(flatten_fusion_translation(fusion_translation))
+                if ann.single_transcript() and ann.transcript1.translations:
+                    nrow[COLUMNS.fusion_protein_hgvs] = call_protein_indel(
+                        ann.transcript1.translations[0], fusion_translation, reference_genome)
+                rows.append(nrow)
+        else:
+            temp_row.update(ann_row)
+            rows.append(temp_row)
+    # draw the annotation and add the path to all applicable rows (one drawing for multiple annotations)
+    if any([
+        not ann.fusion and not draw_fusions_only,
+        ann.fusion and not draw_non_synonymous_cdna_only,
+        ann.fusion and draw_non_synonymous_cdna_only and not cdna_synon_all
+    ]):
+        if render_queue is None:
+            drawing, legend = draw(drawing_config, ann, reference_genome, template_metadata, drawings_directory)
+        else:
+            name = _drawing_name(ann)
+            drawing = os.path.join(drawings_directory, name + '.svg')
+            legend = os.path.join(drawings_directory, name + '.legend.json')
+            render_queue.append((drawing, legend, ann))
+        for row in rows + [ann_row]:
+            row[COLUMNS.annotation_figure] = drawing
+            row[COLUMNS.annotation_figure_legend] = legend
+    if not rows:
+        rows = [ann_row]
+    return ann_row, rows, fasta_records
+
+
+def _annotate_breakpoint_pair(bpp, state=None):
+    """
+    annotates a single breakpoint pair and builds the output for each of its annotations. Values are converted to their
+    string representation so that they can be returned from a worker process
+
+    Args:
+        bpp (BreakpointPair): the breakpoint pair to annotate
+        state (dict): the reference files and options. If not given, the state set when the worker process was
+            initialized is used
+
+    Returns:
+        tuple: tuple contains
+
+            - :class:`list`: the column names, output rows and fasta records for each annotation
+            - :class:`list` of :class:`tuple`: the drawing path, legend path and pickled annotation for each of the
+              drawings which were deferred
+    """
+    if state is None:
+        state = _WORKER_STATE
+    annotations = annotate_events(
+        [bpp],
+        reference_genome=state['reference_genome'],
+        annotations=state['annotations'],
+        min_orf_size=state['min_orf_size'],
+        min_domain_mapping_match=state['min_domain_mapping_match'],
+        max_proximity=state['max_proximity'],
+        max_orf_cap=state['max_orf_cap'],
+        log=log,
+        filters=state['annotation_filters']
+    )
+    result = []
+    render_queue = [] if state['defer_drawings'] else None
+    for ann in annotations:
+        ann_row, rows, fasta_records = _annotation_rows(
+            ann, state['reference_genome'], state['template_metadata'], state['drawing_config'],
+            state['drawings_directory'], state['fa_output_file'],
+            state['draw_fusions_only'], state['draw_non_synonymous_cdna_only'],
+            render_queue=render_queue
+        )
+        result.append((list(ann_row.keys()), [{k: str(v) for k, v in row.items()} for row in rows], fasta_records))
+    render_jobs = [
+        (drawing, legend, pickle.dumps(ann, protocol=pickle.HIGHEST_PROTOCOL))
+        for drawing, legend, ann in render_queue or []
+    ]
+    return result, render_jobs
+
+
+def _render_drawing(job, state=None):
+    """
+    draws an annotation which was deferred to the render queue file
+
+    Args:
+        job (tuple of int and int): the offset and length of the pickled annotation in the render queue file
+        state (dict): the reference files and options. If not given, the state set when the worker process was
+            initialized is used
+
+    Returns:
+        str: the path to the drawing or None if the annotation could not be drawn
+    """
+    if state is None:
+        state = _WORKER_STATE
+    offset, length = job
+    with open(state['render_queue'], 'rb') as fh:
+        fh.seek(offset)
+        ann = pickle.loads(fh.read(length))
+    drawing, legend = draw(
+        state['drawing_config'], ann, state['reference_genome'], state['template_metadata'], state['drawings_directory'])
+    return drawing
+
+
+def _remove_failed_drawings(filename, drawings):
+    """
+    replaces the paths to the deferred drawings which could not be drawn in the tabbed output file
+    """
+    temp_filename = filename + '.tmp'
+    with open(filename, 'r') as fh, open(temp_filename, 'w') as out_fh:
+        header = fh.readline()
+        out_fh.write(header)
+        columns = header.rstrip('\n').split('\t')
+        indices = [columns.index(col) for col in [COLUMNS.annotation_figure, COLUMNS.annotation_figure_legend]]
+        for line in fh:
+            row = line.rstrip('\n').split('\t')
+            if row[indices[0]] in drawings:
+                for i in indices:
+                    row[i] = 'None'
+            out_fh.write('\t'.join(row) + '\n')
+    os.replace(temp_filename, filename)
+
+
+def _file_signature(filenames):
+    """
+    summarizes the reference input files by path, size and modification time so that changes to them invalidate
+    cached results without having to hash their (large) content
+    """
+    if not filenames:
+        return None
+    if isinstance(filenames, str):
+        filenames = [filenames]
+    result = []
+    for filename in filenames:
+        try:
+            stat = os.stat(filename)
+            result.append((os.path.abspath(filename), stat.st_size, stat.st_mtime))
+        except (OSError, TypeError):
+            result.append(str(filename))
+    return result
+
+
+class AnnotationCache:
+    """
+    on-disk cache of the annotate results for each breakpoint pair. Records are appended to a JSON lines file as they are
+    computed so that a job which is killed can resume from the last checkpoint
+
+    Attributes:
+        filename (str): path to the cache file
+        signature (str): hash of the reference files and options used in annotating. Included in every key so that a
+            change to either invalidates all cached results
+        checkpoint_interval (int): number of new records between flushes to disk
+        hits (int): number of breakpoint pairs which were found in the cache
+        misses (int): number of breakpoint pairs which were not found in the cache
+    """
+    VERSION = 1
+
+    def __init__(self, filename, signature, checkpoint_interval=DEFAULTS.annotate_checkpoint_interval):
+        self.filename = filename
+        self.signature = hashlib.md5(
+            json.dumps([self.VERSION, signature], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        self.checkpoint_interval = max(1, checkpoint_interval)
+        self.hits = 0
+        self.misses = 0
+        self._records = {}
+        self._used = {}
+        self._fh = None
+        self._unflushed = 0
+        if os.path.exists(filename):
+            with open(filename, 'r') as fh:
+                for line in fh:
+                    try:
+                        record = json.loads(line)
+                        self._records[record['key']] = record['results']
+                    except (ValueError, KeyError, TypeError):
+                        pass  # incomplete record from an interrupted run
+
+    def key(self, bpp):
+        """
+        Args:
+            bpp (BreakpointPair): the breakpoint pair to be annotated
+
+        Returns:
+            str: the cache key for the breakpoint pair. The tracking id is excluded since it is generated per run when
+            not given in the input
+        """
+        event = {k: str(v) for k, v in bpp.flatten().items() if k != COLUMNS.tracking_id}
+        return hashlib.md5(
+            json.dumps([self.signature, event], sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get(self, key, tracking_id=None):
+        """
+        Args:
+            key (str): the cache key (see :meth:`key`)
+            tracking_id (str): the tracking id to use for the cached rows
+
+        Returns:
+            list: the cached results in the format of the annotation results returned by
+            :func:`_annotate_breakpoint_pair` or None if the breakpoint pair is not cached or its drawings no longer exist
+        """
+        results = self._records.get(key)
+        if results is not None:
+            for ann_columns, rows, fasta_records in results:
+                for row in rows:
+                    for col in [COLUMNS.annotation_figure, COLUMNS.annotation_figure_legend]:
+                        if row.get(col, 'None') != 'None' and not os.path.exists(row[col]):
+                            results = None
+        if results is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._used[key] = results
+        # copy the rows so that setting the tracking id does not change the stored records
+        results = [
+            (ann_columns, [dict(row) for row in rows], [tuple(r) for r in fasta_records])
+            for ann_columns, rows, fasta_records in results
+        ]
+        if tracking_id is not None:
+            for ann_columns, rows, fasta_records in results:
+                for row in rows:
+                    if COLUMNS.tracking_id in row:
+                        row[COLUMNS.tracking_id] = tracking_id
+        return results
+
+    def put(self, key, results):
+        """
+        adds the results for a breakpoint pair to the cache and writes them to disk once the checkpoint interval is reached
+        """
+        self._used[key] = results
+        if self._fh is None:
+            self._fh = open(self.filename, 'a')
+        self._fh.write(json.dumps({'key': key, 'results': results}) + '\n')
+        self._unflushed += 1
+        if self._unflushed >= self.checkpoint_interval:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """
+        flushes any new records to disk
+        """
+        if self._fh is not None and self._unflushed:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+        self._unflushed = 0
+
+    def close(self, compact=False):
+        """
+        flushes the cache and closes the file. If compact is given, the cache file is rewritten to only contain the
+        records used in the current run
+        """
+        self.checkpoint()
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        if compact:
+            temp_filename = self.filename + '.tmp'
+            with open(temp_filename, 'w') as fh:
+                for key, results in self._used.items():
+                    fh.write(json.dumps({'key': key, 'results': results}) + '\n')
+            os.replace(temp_filename, self.filename)
+            self._records = dict(self._used)
+
+    def __str__(self):
+        return 'AnnotationCache(hits={}, misses={}, filename={})'.format(self.hits, self.misses, self.filename)
+
+
 def main(
     inputs, output, library, protocol,
     reference_genome, annotations, template_metadata,
@@ -103,6 +455,10 @@ def main(
     draw_fusions_only=DEFAULTS.draw_fusions_only,
     draw_non_synonymous_cdna_only=DEFAULTS.draw_non_synonymous_cdna_only,
     max_proximity=CLUSTER_DEFAULTS.max_proximity,
+    annotate_workers=DEFAULTS.annotate_workers,
+    annotate_cache=DEFAULTS.annotate_cache,
+    annotate_checkpoint_interval=DEFAULTS.annotate_checkpoint_interval,
+    defer_drawings=DEFAULTS.defer_drawings,
     **kwargs
 ):
     """
@@ -115,12 +471,21 @@ def main(
         min_domain_mapping_match (float): min mapping match percent (0-1) to count a domain as mapped
         min_orf_size (int): minimum size of an :term:`open reading frame` to keep as a putative translation
         max_orf_cap (int): the maximum number of :term:`open reading frame` s to collect for any given event
+        annotate_workers (int): the number of processes to use in annotating the breakpoint pairs. The output is written
+            in the input order regardless of the number of workers
+        annotate_cache (bool): reuse the results of previous runs (in the same output directory) for breakpoint pairs
+            which have not changed. See :class:`AnnotationCache`
+        annotate_checkpoint_interval (int): the number of newly annotated breakpoint pairs between writes of the cache
+        defer_drawings (bool): draw the illustrations once all the breakpoint pairs have been annotated. The annotations
+            to be drawn are written to a temporary file in the output directory instead of being held in memory
     """
     drawings_directory = os.path.join(output, 'drawings')
     tabbed_output_file = os.path.join(output, 'annotations.tab')
     fa_output_file = os.path.join(output, 'annotations.fusion-cdna.fa')
+    cache_output_file = os.path.join(output, 'annotations.cache.jsonl')
 
     annotation_filters = [] if not annotation_filters else annotation_filters.split(',')
+    annotation_filter_names = annotation_filters
     annotation_filters = [ACCEPTED_FILTERS[a] for a in annotation_filters]
 
     mkdirp(drawings_directory)
@@ -137,21 +502,31 @@ def main(
     )
     log('read {} breakpoint pairs'.format(len(bpps)))
 
-    annotations = annotate_events(
-        bpps,
+    # now try generating the svg
+    drawing_config = DiagramSettings(**{k: v for k, v in kwargs.items() if k in ILLUSTRATION_DEFAULTS})
+    state = dict(
         reference_genome=reference_genome,
         annotations=annotations,
+        template_metadata=template_metadata,
         min_orf_size=min_orf_size,
         min_domain_mapping_match=min_domain_mapping_match,
         max_proximity=max_proximity,
         max_orf_cap=max_orf_cap,
-        log=log,
-        filters=annotation_filters
+        annotation_filters=annotation_filters,
+        drawing_config=drawing_config,
+        drawings_directory=drawings_directory,
+        fa_output_file=fa_output_file,
+        draw_fusions_only=draw_fusions_only,
+        draw_non_synonymous_cdna_only=draw_non_synonymous_cdna_only,
+        defer_drawings=defer_drawings,
+        render_queue=None
     )
-
-    fa_sequence_names = set()
-    # now try generating the svg
-    drawing_config = DiagramSettings(**{k: v for k, v in kwargs.items() if k in ILLUSTRATION_DEFAULTS})
+    if defer_drawings:
+        # created before the worker processes so that they inherit the file name
+        render_queue_fd, state['render_queue'] = tempfile.mkstemp(prefix='annotations.render.', dir=output)
+        render_queue_fh = os.fdopen(render_queue_fd, 'wb')
+        log('writing deferred drawings to:', state['render_queue'])
+    render_jobs = []
 
     header_req = {
         COLUMNS.break1_strand,
@@ -176,84 +551,101 @@ def main(
     tabbed_fh = open(tabbed_output_file, 'w')
     log('opening for write:', fa_output_file)
     fasta_fh = open(fa_output_file, 'w')
-
+    cache = None
+    if annotate_cache:
+        cache = AnnotationCache(
+            cache_output_file,
+            dict(
+                min_orf_size=min_orf_size,
+                min_domain_mapping_match=min_domain_mapping_match,
+                max_proximity=max_proximity,
+                max_orf_cap=max_orf_cap,
+                annotation_filters=annotation_filter_names,
+                drawing_config={k: v for k, v in kwargs.items() if k in ILLUSTRATION_DEFAULTS},
+                drawings_directory=drawings_directory,
+                fa_output_file=fa_output_file,
+                draw_fusions_only=draw_fusions_only,
+                draw_non_synonymous_cdna_only=draw_non_synonymous_cdna_only,
+                annotations=_file_signature(kwargs.get('annotations_filename')),
+                reference_genome=_file_signature(kwargs.get('reference_genome_filename')),
+                template_metadata=_file_signature(kwargs.get('template_metadata_filename'))
+            ),
+            checkpoint_interval=annotate_checkpoint_interval
+        )
+        # keys must be computed before annotating since annotating may add columns to the breakpoint pairs
+        cached = []
+        for bpp in bpps:
+            key = cache.key(bpp)
+            cached.append((key, cache.get(key, bpp.data.get(COLUMNS.tracking_id))))
+        log('reusing cached annotations for {} of {} breakpoint pairs from:'.format(
+            cache.hits, len(bpps)), cache_output_file)
+    else:
+        cached = [(None, None) for bpp in bpps]
+    uncached_bpps = [bpp for bpp, (key, results) in zip(bpps, cached) if results is None]
+    executor = None
+    completed = False
     try:
-        total = len(annotations)
-        for i, ann in enumerate(annotations):
-            ann_row = ann.flatten()
-            ann_row[COLUMNS.fusion_sequence_fasta_file] = fa_output_file
-            if header is None:
-                header_req.update(ann_row.keys())
-                header = sort_columns(header_req)
-                tabbed_fh.write('\t'.join([str(c) for c in header]) + '\n')
-            log(
-                '({} of {}) current annotation'.format(i + 1, total),
-                ann.annotation_id, ann.transcript1, ann.transcript2, ann.event_type)
-            log(ann, time_stamp=False)
-            # get the reference sequences for either transcript
-            ref_cdna_seq = {}
-            ref_protein_seq = {}
-
-            for pre_transcript in [x for x in [ann.transcript1, ann.transcript2] if isinstance(x, PreTranscript)]:
-                name = pre_transcript.name
-                for spl_tx in pre_transcript.spliced_transcripts:
-                    ref_cdna_seq.setdefault(spl_tx.get_seq(reference_genome), set()).add(name)
-                    for translation in spl_tx.translations:
-                        ref_protein_seq.setdefault(translation.get_aa_seq(reference_genome), set()).add(name)
-
-            # try building the fusion product
-            rows = []
-            cdna_synon_all = True
-            # add fusion information to the current ann_row
-            for spl_fusion_tx in [] if not ann.fusion else ann.fusion.transcripts:
-                seq = ann.fusion.get_cdna_seq(spl_fusion_tx.splicing_pattern)
-                # make the fasta id a hex of the string to avoid having to load the sequences later
-                fusion_fa_id = 'seq-{}'.format(hashlib.md5(seq.encode('utf-8')).hexdigest())
-                fasta_fh.write('> {}\n{}\n'.format(fusion_fa_id, seq))
-                cdna_synon = ';'.join(sorted(list(ref_cdna_seq.get(seq, set()))))
-
-                temp_row = {}
-                temp_row.update(ann_row)
-                temp_row.update(flatten_fusion_transcript(spl_fusion_tx))
-                temp_row[COLUMNS.fusion_sequence_fasta_id] = fusion_fa_id
-                temp_row[COLUMNS.cdna_synon] = cdna_synon if cdna_synon else None
-                if not cdna_synon:
-                    cdna_synon_all = False
-                if spl_fusion_tx.translations:
-                    # duplicate the ann_row for each translation
-                    for fusion_translation in spl_fusion_tx.translations:
-                        nrow = dict()
-                        nrow.update(ann_row)
-                        nrow.update(temp_row)
-                        aa_seq = fusion_translation.get_aa_seq()
-                        protein_synon = ';'.join(sorted(list(ref_protein_seq.get(aa_seq, set()))))
-                        nrow[COLUMNS.protein_synon] = protein_synon if protein_synon else None
-                        # select the exon
-                        nrow.update(flatten_fusion_translation(fusion_translation))
-                        if ann.single_transcript() and ann.transcript1.translations:
-                            nrow[COLUMNS.fusion_protein_hgvs] = call_protein_indel(
-                                ann.transcript1.translations[0], fusion_translation, reference_genome)
-                        rows.append(nrow)
-                else:
-                    temp_row.update(ann_row)
-                    rows.append(temp_row)
-            # draw the annotation and add the path to all applicable rows (one drawing for multiple annotations)
-            if any([
-                not ann.fusion and not draw_fusions_only,
-                ann.fusion and not draw_non_synonymous_cdna_only,
-                ann.fusion and draw_non_synonymous_cdna_only and not cdna_synon_all
-            ]):
-                drawing, legend = draw(drawing_config, ann, reference_genome, template_metadata, drawings_directory)
-                for row in rows + [ann_row]:
-                    row[COLUMNS.annotation_figure] = drawing
-                    row[COLUMNS.annotation_figure_legend] = legend
-            if not rows:
-                rows = [ann_row]
-            for row in rows:
-                tabbed_fh.write('\t'.join([str(row.get(k, None)) for k in header]) + '\n')
+        if annotate_workers > 1 and len(uncached_bpps) > 1:
+            log('annotating with {} worker processes'.format(annotate_workers))
+            executor = ProcessPoolExecutor(
+                max_workers=annotate_workers, initializer=_init_annotate_worker, initargs=(state, ))
+            # results are returned in the input order
+            computed = executor.map(
+                _annotate_breakpoint_pair, uncached_bpps,
+                chunksize=max(1, len(uncached_bpps) // (annotate_workers * 8)))
+        else:
+            computed = (_annotate_breakpoint_pair(bpp, state) for bpp in uncached_bpps)
+        total = len(bpps)
+        for i, (key, bpp_results) in enumerate(cached):
+            if bpp_results is None:
+                bpp_results, bpp_render_jobs = next(computed)
+                for drawing, legend, ann in bpp_render_jobs:
+                    render_jobs.append((drawing, (render_queue_fh.tell(), len(ann))))
+                    render_queue_fh.write(ann)
+                if cache is not None:
+                    cache.put(key, bpp_results)
+                log('({} of {}) annotated breakpoint pair'.format(i + 1, total), 'generated', len(bpp_results), 'annotations')
+            else:
+                log('({} of {}) reused cached breakpoint pair'.format(i + 1, total), 'with', len(bpp_results), 'annotations')
+            for ann_columns, rows, fasta_records in bpp_results:
+                if header is None:
+                    header_req.update(ann_columns)
+                    header = sort_columns(header_req)
+                    tabbed_fh.write('\t'.join([str(c) for c in header]) + '\n')
+                for fusion_fa_id, seq in fasta_records:
+                    fasta_fh.write('> {}\n{}\n'.format(fusion_fa_id, seq))
+                for row in rows:
+                    tabbed_fh.write('\t'.join([str(row.get(k, None)) for k in header]) + '\n')
+        if render_jobs:
+            render_queue_fh.close()
+            log('drawing {} deferred illustrations'.format(len(render_jobs)))
+            if executor is not None:
+                drawn = executor.map(
+                    _render_drawing, [job for drawing, job in render_jobs],
+                    chunksize=max(1, len(render_jobs) // (annotate_workers * 8)))
+            else:
+                drawn = (_render_drawing(job, state) for drawing, job in render_jobs)
+            failed = {drawing for (drawing, job), result in zip(render_jobs, drawn) if result is None}
+            if failed:
+                log('could not fit {} deferred illustrations'.format(len(failed)))
+                tabbed_fh.close()
+                _remove_failed_drawings(tabbed_output_file, failed)
+        completed = True
+        if cache is not None:
+            log(cache)
+        log(SEQUENCE_CACHE)
+        log(FUSION_PRODUCT_CACHE)
         generate_complete_stamp(output, log, start_time=start_time)
     finally:
+        if executor is not None:
+            executor.shutdown()
+        if cache is not None:
+            # only drop stale records once every breakpoint pair has been written
+            cache.close(compact=completed)
         log('closing:', tabbed_output_file)
         tabbed_fh.close()
         log('closing:', fa_output_file)
         fasta_fh.close()
+        if defer_drawings:
+            render_queue_fh.close()
+            os.remove(state['render_queue'])
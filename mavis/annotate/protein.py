@@ -1,43 +1,102 @@
+import bisect
 import itertools
+import re
 
-from .base import BioInterval
+from Bio.Data.CodonTable import unambiguous_dna_by_id
+from Bio.Data.IUPACData import ambiguous_dna_values
+import numpy as np
+
+from .base import BioInterval, SEQUENCE_CACHE
 from ..constants import CODON_SIZE, START_AA, STOP_AA, translate
 from ..error import NotSpecifiedError
 from ..interval import Interval
 
 
-def calculate_orf(spliced_cdna_sequence, min_orf_size=None):
+def _codon_class(amino_acid):
+    """
+    all codons (including ambiguous and RNA codons) which can only be translated to the given amino acid
     """
-    calculate all possible open reading frames given a spliced cdna sequence (no introns)
+    codons = set(unambiguous_dna_by_id[1].stop_codons) if amino_acid == STOP_AA else {
+        codon for codon, aa in unambiguous_dna_by_id[1].forward_table.items() if aa == amino_acid}
+    expansions = {'U': 'T'}
+    expansions.update({c: v for c, v in ambiguous_dna_values.items() if c != 'X'})
+    result = []
+    for codon in itertools.product(sorted(expansions.keys()), repeat=CODON_SIZE):
+        if all([''.join(c) in codons for c in itertools.product(*[expansions[base] for base in codon])]):
+            result.append(''.join(codon))
+    return result
 
-    Args:
-        spliced_cdna_sequence (str): the sequence
 
+# sequences containing only these characters can be scanned for ORFs without translating
+_ORF_SCAN_ALPHABET = re.compile('^[ACGTURYKMSWBDHVN]*$')
+_START_CODONS = _codon_class(START_AA)
+_STOP_CODONS = _codon_class(STOP_AA)
+
+
+def _codon_positions(sequence, codons):
+    """
     Returns:
-        :any:`list` of :any:`Interval`: list of open reading frame positions on the input sequence
+        :class:`list` of :class:`int`: the 0-based positions (in any frame) of any of the codons in the sequence
     """
-    # do not revcomp
-    assert START_AA != STOP_AA
-    cds_orfs = []  # (cds_start, cds_end)
+    positions = []
+    for codon in codons:
+        pos = sequence.find(codon)
+        while pos >= 0:
+            positions.append(pos)
+            pos = sequence.find(codon, pos + 1)
+    return positions
+
+
+def _translated_orf_events(spliced_cdna_sequence):
+    """
+    finds the start and stop codons by translating each reading frame. Used for sequences with characters which do not
+    have a codon class (raises the same errors as translating)
+    """
+    events = []
     for offset in range(0, CODON_SIZE):
         aa_sequence = translate(spliced_cdna_sequence, offset)
-        # now calc the open reading frames
-        orf_intervals = []
-        current_start = None
         for i, curr_amino_acid in enumerate(aa_sequence):
             if curr_amino_acid == START_AA:
-                pos = i * CODON_SIZE + 1 + offset
-                if current_start is None:
-                    current_start = pos
+                events.append((i * CODON_SIZE + offset, START_AA))
             elif curr_amino_acid == STOP_AA:
-                pos = (i + 1) * CODON_SIZE + offset
-                if current_start is not None:  # close the current interval
-                    itvl = Interval(current_start, pos)
-                    if min_orf_size is None or len(itvl) >= min_orf_size:
-                        orf_intervals.append(itvl)
-                    current_start = None
-        cds_orfs.extend(orf_intervals)
-    return cds_orfs
+                events.append((i * CODON_SIZE + offset, STOP_AA))
+    return sorted(events)
+
+
+def calculate_orf(spliced_cdna_sequence, min_orf_size=None):
+    """
+    calculate all possible open reading frames given a spliced cdna sequence (no introns). The start and stop codons
+    for all three reading frames are found in a single scan of the sequence without translating it
+
+    Args:
+        spliced_cdna_sequence (str): the sequence
+        min_orf_size (int): the minimum length (in bp) of an open reading frame to be returned
+
+    Returns:
+        :any:`list` of :any:`Interval`: list of open reading frame positions on the input sequence (by reading frame)
+    """
+    # do not revcomp
+    assert START_AA != STOP_AA
+    sequence = str(spliced_cdna_sequence).upper()
+    if _ORF_SCAN_ALPHABET.match(sequence):
+        events = [(pos, START_AA) for pos in _codon_positions(sequence, _START_CODONS)]
+        events.extend([(pos, STOP_AA) for pos in _codon_positions(sequence, _STOP_CODONS)])
+        events.sort()
+    else:
+        events = _translated_orf_events(sequence)
+    orfs_by_frame = [[] for i in range(0, CODON_SIZE)]
+    current_start = [None for i in range(0, CODON_SIZE)]
+    for pos, amino_acid in events:  # 0-based position of the first base of the codon
+        frame = pos % CODON_SIZE
+        if amino_acid == START_AA:
+            if current_start[frame] is None:
+                current_start[frame] = pos + 1
+        elif current_start[frame] is not None:  # close the current interval
+            itvl = Interval(current_start[frame], pos + CODON_SIZE)
+            if min_orf_size is None or len(itvl) >= min_orf_size:
+                orfs_by_frame[frame].append(itvl)
+            current_start[frame] = None
+    return [orf for orfs in orfs_by_frame for orf in orfs]
 
 
 class DomainRegion(BioInterval):
@@ -182,58 +241,91 @@ class Domain:
         if total > len(input_sequence):
             raise UserWarning('could not map the sequences to the input')
 
+        input_array = _sequence_array(input_sequence)
         results = []
         last_min_end = 0
         for seq in seq_list:
             # align the current sequence to find the best matches
-            scores = []
             min_match = max(1, int(round(len(seq) * min_region_match, 0)))
-            for pos in range(last_min_end, len(input_sequence) - len(seq) + 1):
-                score = 0
-                for i in range(0, len(seq)):
-                    if input_sequence[pos + i].upper() == seq[i].upper():
-                        score += 1
-                if score > min_match:
-                    scores.append((Interval(pos + 1, pos + len(seq)), score))
-            if not scores:
+            scores = _diagonal_match_counts(input_array[last_min_end:], _sequence_array(seq))
+            if not len(scores) or scores.max() <= min_match:
                 raise UserWarning('could not align a given region', seq)
-            best_score = max([s[1] for s in scores])
-            best = [s for s in scores if s[1] == best_score]
+            best_score = int(scores.max())
+            best = [
+                (Interval(pos + last_min_end + 1, pos + last_min_end + len(seq)), best_score)
+                for pos in np.flatnonzero(scores == best_score)
+            ]
             results.append(best)
             last_min_end = min([s[0].end for s in best])
-        # take the best score for each region and see if they work in sequence
-        combinations = [[p] for p in results[0]]
-        for scores in results[1:]:
-            temp_combos = []
-            for pos, score in scores:
-                for curr in combinations:
-                    if pos.start > curr[-1][0].end:
-                        temp_combos.append(curr[:] + [(pos, score)])
-            combinations = temp_combos
-            if not combinations:
-                break
+        # every combination of the best scoring positions has the same score so the alignment is only unique if there
+        # is exactly one way to place the regions in order
+        alignment = _unique_ordered_chain([[itvl for itvl, score in best] for best in results])
+        best_score = sum([best[0][1] for best in results])
+        regions = []
+        for itvl, seq in zip(alignment, seq_list):
+            regions.append(DomainRegion(itvl.start, itvl.end, seq))
+        return best_score, total, regions
 
-        # compute the cumulative scores for the putative alignments
-        best_score = None
-        best_scoring_alignments = []
-        for alignment in combinations:
-            cumu_score = sum([s[1] for s in alignment])
-            if not best_scoring_alignments or cumu_score > best_score:
-                best_scoring_alignments = [alignment]
-                best_score = cumu_score
-            elif cumu_score == best_score:
-                best_scoring_alignments.append(alignment)
-
-        if not best_scoring_alignments:
-            raise UserWarning('could not map the sequences to the input')
-        elif len(best_scoring_alignments) > 1:
-            raise UserWarning('multiple mappings of equal score')
-        else:
-            alignment = [s[0] for s in best_scoring_alignments[0]]
-            regions = []
-            for itvl, seq in zip(alignment, seq_list):
-                regions.append(DomainRegion(itvl.start, itvl.end, seq))
-            return best_score, total, regions
+
+def _sequence_array(seq):
+    return np.frombuffer(seq.upper().encode('utf-32-le'), dtype=np.uint32)
+
+
+def _diagonal_match_counts(target, query):
+    """
+    Args:
+        target (numpy.ndarray): the sequence to align to
+        query (numpy.ndarray): the sequence being aligned
+
+    Returns:
+        numpy.ndarray: the number of matching characters (ungapped) for the query starting at each position of the target
+    """
+    positions = len(target) - len(query) + 1
+    if positions <= 0:
+        return np.zeros(0, dtype=int)
+    scores = np.zeros(positions, dtype=int)
+    for i, char in enumerate(query):
+        scores += target[i:i + positions] == char
+    return scores
+
+
+def _unique_ordered_chain(intervals_by_region):
+    """
+    counts the ways of picking one interval per region such that each interval starts after the end of the interval
+    picked for the previous region
+
+    Args:
+        intervals_by_region (:class:`list` of :class:`list` of :class:`Interval`): the candidate intervals for each region
+
+    Returns:
+        :class:`list` of :class:`Interval`: the only chain of intervals
+
+    Raises:
+        UserWarning: if there is no chain or more than one chain
+    """
+    ways = [[1 for itvl in intervals_by_region[0]]]
+    for prev_intervals, intervals in zip(intervals_by_region, intervals_by_region[1:]):
+        prev_ways = ways[-1]
+        order = sorted(range(len(prev_intervals)), key=lambda i: prev_intervals[i].end)
+        ends = [prev_intervals[i].end for i in order]
+        cumulative = list(itertools.accumulate([prev_ways[i] for i in order]))
+        current = []
+        for itvl in intervals:
+            index = bisect.bisect_left(ends, itvl.start)  # number of previous intervals ending before this one starts
+            current.append(min(2, cumulative[index - 1]) if index else 0)  # only need to distinguish 0, 1 and many
+        ways.append(current)
+    total = sum(ways[-1])
+    if not total:
+        raise UserWarning('could not map the sequences to the input')
+    elif total > 1:
+        raise UserWarning('multiple mappings of equal score')
+    chain = []
+    for intervals, region_ways in zip(reversed(intervals_by_region), reversed(ways)):
+        for itvl, count in zip(intervals, region_ways):
+            if count and (not chain or itvl.end < chain[-1].start):
+                chain.append(itvl)
+                break
+    return chain[::-1]
 
 
 class Translation(BioInterval):
@@ -409,7 +501,7 @@ class Translation(BioInterval):
             AttributeError: if the reference sequence has not been given and is not set
         """
         cds = self.get_cds_seq(reference_genome, ignore_cache)
-        return translate(cds)
+        return SEQUENCE_CACHE.fetch(('aa', cds), lambda: translate(cds))
 
     def key(self):
         """see :func:`structural_variant.annotate.base.BioInterval.key`"""
@@ -1,7 +1,7 @@
 import itertools
 
 from .base import BioInterval
-from .constants import ACCEPTOR_SEQ, DONOR_SEQ, SPLICE_SITE_RADIUS, SPLICE_SITE_TYPE, SPLICE_TYPE
+from .constants import ACCEPTOR_SEQ, DONOR_SEQ, SPLICE_SEQ_ANCHORS, SPLICE_SITE_RADIUS, SPLICE_SITE_TYPE, SPLICE_TYPE
 from ..constants import reverse_complement, STRAND
 from ..interval import Interval
 
@@ -156,6 +156,42 @@ class SpliceSite(BioInterval):
             refname, self.pos, self.start, self.end, seq, self.get_strand())
 
 
+def _scan_motif(regex, sequence, positions):
+    """
+    equivalent to regex.finditer but only tries to match where the GT/AG dinucleotide of the pattern occurs (see
+    :data:`~mavis.annotate.constants.SPLICE_SEQ_ANCHORS`)
+
+    Args:
+        regex (re.Pattern): the compiled splice site pattern
+        sequence (str): the sequence to scan
+        positions (dict of str and list of int): positions of each dinucleotide in the sequence (added to as needed)
+
+    Returns:
+        generator of re.Match: the non-overlapping matches in order
+    """
+    anchor = SPLICE_SEQ_ANCHORS.get(regex)
+    if anchor is None:
+        yield from regex.finditer(sequence)
+        return
+    offset, literal = anchor
+    if literal not in positions:
+        found = []
+        pos = sequence.find(literal)
+        while pos >= 0:
+            found.append(pos)
+            pos = sequence.find(literal, pos + 1)
+        positions[literal] = found
+    last_end = 0
+    for pos in positions[literal]:
+        start = pos - offset
+        if start < last_end:
+            continue
+        match = regex.match(sequence, start)
+        if match:
+            last_end = match.end()
+            yield match
+
+
 def predict_splice_sites(input_sequence, is_reverse=False):
     """
     looks for the expected splice site sequence patterns in the
@@ -184,16 +220,17 @@ def predict_splice_sites(input_sequence, is_reverse=False):
             strand=STRAND.POS)
 
     sites = []
+    anchor_positions = {}
     positions = set()
     for regex in DONOR_SEQ:
-        for match in regex.finditer(sequence):
+        for match in _scan_motif(regex, sequence, anchor_positions):
             donor_site = convert_match_to_ss(match, SPLICE_SITE_TYPE.DONOR)
             if donor_site.pos not in positions:
                 sites.append(donor_site)
                 positions.add(donor_site.pos)
     positions = set()
     for regex in ACCEPTOR_SEQ:
-        for match in regex.finditer(sequence):
+        for match in _scan_motif(regex, sequence, anchor_positions):
             acceptor_site = convert_match_to_ss(match, SPLICE_SITE_TYPE.ACCEPTOR)
             if acceptor_site.pos not in positions:
                 sites.append(acceptor_site)
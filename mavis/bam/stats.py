@@ -19,6 +19,7 @@ class BamStats:
         self.stranded = False
         self.strand_determining_read = 2
         self.sdr_percent_support = None
+        self.convergence_trace = []
 
     def add_stranded_information(self, strand_hist):
         self.stranded = True
@@ -50,32 +51,41 @@ class Histogram(dict):
         """
         self[item] = self.get(item, 0) + freq
 
+    def _sorted_counts(self):
+        keys = sorted(self.keys())
+        return keys, np.cumsum([self[k] for k in keys])
+
     def median(self):
         """
-        flattens the histogram to compute the median value
+        computes the median value from the cumulative frequencies of the sorted keys
         """
-        values = []
-        for val, freq in self.items():
-            for i in range(0, freq):
-                values.append(val)
-        values.sort()
-        if len(values) % 2 == 0:
-            low_center = len(values) // 2
-            high_center = len(values) // 2 + 1
-            return (values[low_center - 1] + values[high_center - 1]) / 2
+        keys, cumulative = self._sorted_counts()
+        total = int(cumulative[-1]) if keys else 0
+        if total % 2 == 0:
+            low_center = keys[np.searchsorted(cumulative, total // 2)]
+            high_center = keys[np.searchsorted(cumulative, total // 2 + 1)]
+            return (low_center + high_center) / 2
         else:
-            center = len(values) // 2 + 1
-            return values[center - 1]
+            return keys[np.searchsorted(cumulative, total // 2 + 1)]
 
     def distribution_stderr(self, median, fraction, error_function=lambda x, y: math.pow(x - y, 2)):
-        values = []
+        """
+        computes the mean error over the given fraction of the values with the lowest error
+        """
+        errors = Histogram()
         for val, freq in self.items():
-            err = error_function(val, median)
-            values.extend([err for i in range(0, freq)])
-        values.sort()
-
-        end = int(len(values) * fraction)
-        return sum(values[0:end]) / end
+            errors.add(error_function(val, median), freq)
+        total = sum(errors.values())
+        end = int(total * fraction)
+        remaining = end
+        result = 0
+        for err in sorted(errors.keys()):
+            freq = min(errors[err], remaining)
+            result += err * freq
+            remaining -= freq
+            if remaining <= 0:
+                break
+        return result / end
 
     def __add__(self, other):
         """
@@ -95,6 +105,98 @@ class Histogram(dict):
         return result
 
 
+class StatsConvergence:
+    """
+    tracks the median and standard deviation of a sampled fragment size distribution as samples are added and
+    determines when further sampling no longer changes the estimates
+
+    Attributes:
+        tolerance (float): the maximum relative change in the median and stdev between checks to be considered stable
+        window (int): the number of consecutive stable checks required to call the estimates converged
+        min_samples (int): the minimum number of samples before the estimates may be considered converged
+        distribution_fraction (float): the proportion of the distribution to use in computing stdev
+        trace (:class:`list` of :class:`tuple`): the (samples, median, stdev) at each check
+    """
+
+    def __init__(self, tolerance, distribution_fraction, window=3, min_samples=1000):
+        self.tolerance = tolerance
+        self.distribution_fraction = distribution_fraction
+        self.window = window
+        self.min_samples = min_samples
+        self.trace = []
+        self.stable_checks = 0
+
+    def _relative_change(self, previous, current):
+        if previous == current:
+            return 0
+        return abs(current - previous) / max(abs(previous), abs(current))
+
+    def update(self, hist):
+        """
+        records the current estimates from the histogram
+
+        Args:
+            hist (Histogram): the histogram of the values sampled so far
+
+        Returns:
+            bool: True if the estimates have converged
+        """
+        samples = sum(hist.values())
+        if not samples or (self.trace and self.trace[-1][0] == samples):
+            return self.converged()
+        median = hist.median()
+        stdev = math.sqrt(hist.distribution_stderr(median, self.distribution_fraction)) \
+            if int(samples * self.distribution_fraction) else 0
+        if self.trace:
+            _, prev_median, prev_stdev = self.trace[-1]
+            if self._relative_change(prev_median, median) <= self.tolerance and \
+                    self._relative_change(prev_stdev, stdev) <= self.tolerance:
+                self.stable_checks += 1
+            else:
+                self.stable_checks = 0
+        self.trace.append((samples, median, stdev))
+        return self.converged()
+
+    def converged(self):
+        """
+        Returns:
+            bool: True if the estimates have been stable for the required number of checks
+        """
+        return bool(self.trace) and self.trace[-1][0] >= self.min_samples and self.stable_checks >= self.window
+
+
+def _transcriptome_fragment_sizes(transcripts, read_starts, mate_starts):
+    """
+    converts the read and mate start positions of a batch of reads to cdna coordinates for all transcripts together
+    and computes the fragment size (excluding the read length) for each read
+
+    Args:
+        transcripts (:class:`list` of :class:`~mavis.annotate.genomic.Transcript`): the spliced transcripts of the gene
+        read_starts (numpy.ndarray): the genomic start of each read
+        mate_starts (numpy.ndarray): the genomic start of the mate of each read
+
+    Returns:
+        numpy.ndarray: the mean of the distinct fragment sizes over the transcripts in which both the read and its mate are
+        exonic, for each read where there was at least one such transcript
+    """
+    if not transcripts or not len(read_starts):
+        return np.array([], dtype=float)
+    fragments = np.empty((len(transcripts), len(read_starts)), dtype=float)
+    for i, spl_tx in enumerate(transcripts):
+        coordinate_map = spl_tx.unspliced_transcript.coordinate_map(spl_tx.splicing_pattern)
+        cdna1, exonic1 = coordinate_map.genomic_to_cdna_array(read_starts)
+        cdna2, exonic2 = coordinate_map.genomic_to_cdna_array(mate_starts)
+        fragments[i] = np.where(exonic1 & exonic2, np.abs(cdna1 - cdna2) - 2, np.nan)
+    # transcripts giving the same fragment size for a read are only counted once
+    fragments.sort(axis=0)  # nan values are sorted to the end
+    distinct = ~np.isnan(fragments)
+    distinct[1:] &= fragments[1:] != fragments[:-1]
+    counts = distinct.sum(axis=0)
+    totals = np.where(distinct, fragments, 0).sum(axis=0)
+    found = counts > 0
+    return totals[found] / counts[found]
+
+
 def compute_transcriptome_bam_stats(
     bam_cache,
     annotations,
@@ -102,7 +204,8 @@ def compute_transcriptome_bam_stats(
     min_mapping_quality=1,
     stranded=True,
     sample_cap=10000,
-    distribution_fraction=0.97
+    distribution_fraction=0.97,
+    convergence_tolerance=None
 ):
     """
     computes various statistical measures relating the input bam file
@@ -116,6 +219,8 @@ def compute_transcriptome_bam_stats(
         stranded (bool): if True then reads must match the gene strand
         sample_cap (int): maximum number of reads to collect for any given sample region
         distribution_fraction (float): the proportion of the distribution to use in computing stdev
+        convergence_tolerance (float): if given, stop sampling genes once the relative change in the median and stdev
+            fragment size is within this tolerance (see :class:`StatsConvergence`)
 
     Returns:
         BamStats: the fragment size median, stdev and the read length in a object
@@ -134,13 +239,16 @@ def compute_transcriptome_bam_stats(
             'insufficient annotations to match requested sample size. requested {}, but only {} annotations'.format(
                 sample_size, len(total_annotations)))
 
-    fragment_hist = Histogram()
     read_strand_verification = Histogram()
     read_strand_verification[1] = 0
     read_strand_verification[2] = 0
 
     read_lengths = []
+    fragment_hist = Histogram()
+    convergence = StatsConvergence(convergence_tolerance, distribution_fraction) if convergence_tolerance else None
     for gene in genes:
+        read_starts = []
+        mate_starts = []
         for read in bam_cache.fetch(gene.chr, gene.start, gene.end, cache_if=lambda x: False, limit=sample_cap):
             if any([
                 read.is_unmapped,
@@ -177,16 +285,15 @@ def compute_transcriptome_bam_stats(
 
             if read.reference_end > read.next_reference_start:
                 continue
-            current_frags = set()
-            for spl_tx in gene.spliced_transcripts:
-                try:
-                    cdna_pos1 = spl_tx.convert_genomic_to_cdna(read.reference_start)
-                    cdna_pos2 = spl_tx.convert_genomic_to_cdna(read.next_reference_start)
-                    current_frags.add(abs(cdna_pos1 - cdna_pos2) - 2)
-                except IndexError:
-                    pass
-            if current_frags:
-                fragment_hist.add(sum(current_frags) / len(current_frags))
+            read_starts.append(read.reference_start)
+            mate_starts.append(read.next_reference_start)
+        fragment_sizes = _transcriptome_fragment_sizes(
+            gene.spliced_transcripts, np.array(read_starts, dtype=int), np.array(mate_starts, dtype=int))
+        values, counts = np.unique(fragment_sizes, return_counts=True)
+        for val, freq in zip(values.tolist(), counts.tolist()):
+            fragment_hist.add(val, freq)
+        if convergence and convergence.update(fragment_hist):
+            break
     read_length = stats.median(read_lengths)
     result = Histogram()
     for val, freq in fragment_hist.items():
@@ -196,6 +303,8 @@ def compute_transcriptome_bam_stats(
     bamstats = BamStats(median, math.sqrt(err), read_length)
     if stranded:
         bamstats.add_stranded_information(read_strand_verification)
+    if convergence:
+        bamstats.convergence_trace = convergence.trace
     return bamstats
 
 
@@ -205,7 +314,8 @@ def compute_genome_bam_stats(
     sample_size,
     min_mapping_quality=1,
     sample_cap=10000,
-    distribution_fraction=0.99
+    distribution_fraction=0.99,
+    convergence_tolerance=None
 ):
     """
     computes various statistical measures relating the input bam file
@@ -218,6 +328,8 @@ def compute_genome_bam_stats(
         min_mapping_quality (int): the minimum mapping quality for a read to be used
         sample_cap (int): maximum number of reads to collect for any given sample region
         distribution_fraction (float): the proportion of the distribution to use in computing stdev
+        convergence_tolerance (float): if given, stop sampling bins once the relative change in the median and stdev
+            fragment size is within this tolerance (see :class:`StatsConvergence`)
 
     Returns:
         BamStats: the fragment size median, stdev and the read length in a object
@@ -237,6 +349,7 @@ def compute_genome_bam_stats(
 
     hist = Histogram()
     read_lengths = []
+    convergence = StatsConvergence(convergence_tolerance, distribution_fraction) if convergence_tolerance else None
     for bin_chr, bin_start, bin_end in bins:
         for read in bam_file_handle.fetch(bin_chr, bin_start, bin_end, limit=sample_cap, cache_if=lambda x: False):
             if any([
@@ -250,7 +363,12 @@ def compute_genome_bam_stats(
                 continue
             hist[abs(read.template_length)] = hist.get(abs(read.template_length), 0) + 1
             read_lengths.append(len(read.query_sequence))
+        if convergence and convergence.update(hist):
+            break
     median = hist.median()
     err = hist.distribution_stderr(median, distribution_fraction)
 
-    return BamStats(median, math.sqrt(err), np.median(read_lengths))
+    bamstats = BamStats(median, math.sqrt(err), np.median(read_lengths))
+    if convergence:
+        bamstats.convergence_trace = convergence.trace
+    return bamstats
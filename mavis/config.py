@@ -1,10 +1,12 @@
 import argparse
+from concurrent.futures import as_completed, ProcessPoolExecutor
 from configparser import ConfigParser, ExtendedInterpolation
 from copy import copy as _copy
 import os
 import re
 import warnings
 
+import numpy as np
 import tab
 
 from . import __version__
@@ -168,6 +170,7 @@ class LibraryConfig(MavisNamespace):
         sample_cap=3000,
         sample_bin_size=1000,
         sample_size=500,
+        convergence_tolerance=None,
         **kwargs
     ):
         """
@@ -185,7 +188,8 @@ class LibraryConfig(MavisNamespace):
                 annotations=annotations,
                 sample_size=sample_size,
                 sample_cap=sample_cap,
-                distribution_fraction=distribution_fraction
+                distribution_fraction=distribution_fraction,
+                convergence_tolerance=convergence_tolerance
             )
         elif protocol == PROTOCOL.GENOME:
             bamstats = compute_genome_bam_stats(
@@ -193,11 +197,14 @@ class LibraryConfig(MavisNamespace):
                 sample_size=sample_size,
                 sample_bin_size=sample_bin_size,
                 sample_cap=sample_cap,
-                distribution_fraction=distribution_fraction
+                distribution_fraction=distribution_fraction,
+                convergence_tolerance=convergence_tolerance
             )
         else:
             raise ValueError('unrecognized value for protocol', protocol)
         log(bamstats)
+        if bamstats.convergence_trace:
+            log('fragment size stats computed from', bamstats.convergence_trace[-1][0], 'fragments')
 
         return LibraryConfig(
             library=library, protocol=protocol, bam_file=bam_file, inputs=inputs,
@@ -555,6 +562,79 @@ def augment_parser(arguments, parser, required=None):
             )
 
 
+_WORKER_ANNOTATIONS = None
+
+
+def _init_library_config_worker(annotations):
+    global _WORKER_ANNOTATIONS
+    _WORKER_ANNOTATIONS = annotations
+
+
+def _build_library_config(seed, library_kwargs, annotations=None):
+    """
+    builds a single library config (gathering the bam stats) and collects the log messages so that they can be output
+    by the parent process
+    """
+    if annotations is None:
+        annotations = _WORKER_ANNOTATIONS
+    # restore the global random state afterwards so that seeding does not reset the sampling of the caller
+    state = np.random.get_state()
+    np.random.seed(seed)
+    messages = []
+    try:
+        libconf = LibraryConfig.build(annotations=annotations, log=lambda *pos: messages.append(pos), **library_kwargs)
+    finally:
+        np.random.set_state(state)
+    return libconf, messages
+
+
+def build_library_configs(library_kwargs, annotations=None, workers=1, seed=None, log=devnull):
+    """
+    builds the library configs, gathering the bam stats for each library. When more than one worker is requested the
+    libraries are processed concurrently in a process pool
+
+    Args:
+        library_kwargs (:class:`list` of :class:`dict`): the arguments to :meth:`LibraryConfig.build` for each library
+        annotations (object): see :func:`~mavis.annotate.load_reference_genes`
+        workers (int): the number of processes to use
+        seed (int): if given, the random sampling for each library is seeded from this value and the position of the
+            library in the input list so that the results do not depend on the number of workers. Otherwise a seed is
+            drawn for each library from the current random state (forked workers would otherwise all start from the
+            same state)
+        log (callable): outputs logging information
+
+    Returns:
+        :class:`list` of :class:`LibraryConfig`: the library configs in the same order as the input
+    """
+    if seed is None:
+        seeds = [int(s) for s in np.random.randint(2 ** 31, size=len(library_kwargs))]
+    else:
+        seeds = [seed + i for i in range(len(library_kwargs))]
+    result = [None for kwargs in library_kwargs]
+
+    def emit(index, libconf, messages):
+        log('generated the config section for:', libconf.library)
+        for message in messages:
+            log(*message, time_stamp=False)
+        result[index] = libconf
+
+    if workers <= 1 or len(library_kwargs) <= 1:
+        for i, kwargs in enumerate(library_kwargs):
+            emit(i, *_build_library_config(seeds[i], kwargs, annotations=annotations))
+        return result
+
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(library_kwargs)),
+        initializer=_init_library_config_worker, initargs=(annotations, )
+    ) as executor:
+        futures = {
+            executor.submit(_build_library_config, seeds[i], kwargs): i for i, kwargs in enumerate(library_kwargs)
+        }
+        for future in as_completed(futures):
+            emit(futures[future], *future.result())
+    return result
+
+
 def generate_config(args, parser, log=devnull):
     """
     Args:
@@ -633,13 +713,14 @@ def generate_config(args, parser, log=devnull):
         parser.error(' '.join(err.args))
 
     if SUBCOMMAND.VALIDATE not in args.skip_stage:
-        for i, libconf in enumerate(libs):
-            log('generating the config section for:', libconf.library)
-            libs[i] = LibraryConfig.build(
+        libs = build_library_configs([
+            dict(
                 library=libconf.library, protocol=libconf.protocol, bam_file=libconf.bam_file,
                 inputs=inputs_by_lib[libconf.library], strand_specific=libconf.strand_specific,
-                disease_status=libconf.disease_status, annotations=args.annotations, log=log,
+                disease_status=libconf.disease_status,
                 sample_size=args.genome_bins if libconf.protocol == PROTOCOL.GENOME else args.transcriptome_bins,
-                distribution_fraction=args.distribution_fraction
-            )
+                distribution_fraction=args.distribution_fraction,
+                convergence_tolerance=args.convergence_tolerance
+            ) for libconf in libs
+        ], annotations=args.annotations, workers=args.stats_workers, seed=args.stats_seed, log=log)
     write_config(args.write, include_defaults=args.add_defaults, libraries=libs, conversions=convert, log=log)
@@ -6,7 +6,8 @@ import re
 
 from Bio.Alphabet import Gapped
 from Bio.Alphabet.IUPAC import ambiguous_dna
-from Bio.Data.IUPACData import ambiguous_dna_values
+from Bio.Data.CodonTable import unambiguous_dna_by_id
+from Bio.Data.IUPACData import ambiguous_dna_complement, ambiguous_dna_values
 from Bio.Seq import Seq
 from tab import cast_boolean, cast_null
 
@@ -310,9 +311,20 @@ CODON_SIZE = 3
 """:class:`int`: the number of bases making up a codon"""
 
 
+_SEQUENCE_PATTERN = re.compile('^[A-Za-z]*$')
+_COMPLEMENT_TABLE = str.maketrans(
+    ''.join(ambiguous_dna_complement.keys()) + ''.join(ambiguous_dna_complement.keys()).lower(),
+    ''.join(ambiguous_dna_complement.values()) + ''.join(ambiguous_dna_complement.values()).lower()
+)
+# codons are added to the table as they are encountered (see _translate_codon)
+_CODON_TABLE = dict(unambiguous_dna_by_id[1].forward_table)
+_CODON_TABLE.update({codon: '*' for codon in unambiguous_dna_by_id[1].stop_codons})
+
+
 def reverse_complement(s):
     """
-    wrapper for the Bio.Seq reverse_complement method
+    reverse complements a DNA sequence using a translation table equivalent to the Bio.Seq reverse_complement method
+    (IUPAC ambiguity codes are complemented and case is preserved)
 
     Args:
         s (str): the input DNA sequence
@@ -328,10 +340,19 @@ def reverse_complement(s):
         'ACCGGAT'
     """
     input_string = str(s)
-    if not re.match('^[A-Za-z]*$', input_string):
+    if not _SEQUENCE_PATTERN.match(input_string):
         raise ValueError('unexpected sequence format. cannot reverse complement', input_string)
-    input_string = Seq(input_string, DNA_ALPHABET)
-    return str(input_string.reverse_complement())
+    return input_string.translate(_COMPLEMENT_TABLE)[::-1]
+
+
+def _translate_codon(codon):
+    """
+    translates a codon not yet in the codon table using Bio.Seq (to handle ambiguous and gap characters) and adds it to
+    the table
+    """
+    amino_acid = str(Seq(codon, DNA_ALPHABET).translate())
+    _CODON_TABLE[codon] = amino_acid
+    return amino_acid
 
 
 def translate(s, reading_frame=0):
@@ -347,13 +368,12 @@ def translate(s, reading_frame=0):
     """
     reading_frame = reading_frame % CODON_SIZE
 
-    temp = s[reading_frame:]
-    if len(temp) % 3 == 1:
-        temp = temp[:-1]
-    elif len(temp) % 3 == 2:
-        temp = temp[:-2]
-    temp = Seq(temp, DNA_ALPHABET)
-    return str(temp.translate())
+    temp = str(s[reading_frame:]).upper()
+    codons = [temp[i:i + CODON_SIZE] for i in range(0, len(temp) - len(temp) % CODON_SIZE, CODON_SIZE)]
+    try:
+        return ''.join([_CODON_TABLE[codon] for codon in codons])
+    except KeyError:
+        return ''.join([_CODON_TABLE[codon] if codon in _CODON_TABLE else _translate_codon(codon) for codon in codons])
 
 
 GAP = '-'
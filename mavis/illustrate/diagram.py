@@ -4,7 +4,7 @@ This is the primary module responsible for generating svg visualizations
 """
 from svgwrite import Drawing
 
-from .elements import draw_exon_track, draw_genes, draw_template, draw_ustranscript, draw_vmarker
+from .elements import draw_exon_track, draw_genes, draw_template, draw_ustranscript, draw_vmarker, measure_genes, measure_template, measure_ustranscript
 from .scatter import draw_scatter
 from .util import generate_interval_mapping, LabelMapping
 
@@ -18,6 +18,157 @@ HEX_WHITE = '#FFFFFF'
 HEX_BLACK = '#000000'
 
 
+def _annotation_genes(config, ann):
+    """
+    Returns:
+        tuple: tuple contains
+
+            - :class:`set`: the genes (or regions) to draw for the first breakpoint
+            - :class:`set`: the genes (or regions) to draw for the second breakpoint
+            - :class:`dict`: the colors of the genes and exons
+    """
+    colors = dict()
+    genes1 = set()
+    genes2 = set()
+
+    for gene in ann.genes_overlapping_break1:
+        genes1.add(gene)
+        colors[gene] = config.gene1_color
+
+    for gene, _ in ann.genes_proximal_to_break1:
+        genes1.add(gene)
+        colors[gene] = config.gene1_color
+
+    for gene in ann.genes_overlapping_break2:
+        genes2.add(gene)
+        colors.setdefault(gene, config.gene2_color)
+
+    for gene, _ in ann.genes_proximal_to_break2:
+        genes2.add(gene)
+        colors.setdefault(gene, config.gene2_color)
+
+    if ann.transcript1:
+        try:
+            genes1.add(ann.transcript1.gene)
+            colors[ann.transcript1.gene] = config.gene1_color_selected
+            for exon in ann.transcript1.exons:
+                colors[exon] = config.exon1_color
+        except AttributeError:
+            genes1.add(ann.transcript1)
+            colors[ann.transcript1] = config.gene1_color_selected
+
+    if ann.transcript2:
+        same = ann.transcript1 == ann.transcript2
+        try:
+            genes2.add(ann.transcript2.gene)
+            colors[ann.transcript2.gene] = config.gene2_color_selected if not same else config.gene1_color_selected
+            for exon in ann.transcript2.exons:
+                colors[exon] = config.exon2_color if not same else config.exon1_color
+        except AttributeError:
+            genes2.add(ann.transcript2)
+            colors[ann.transcript2] = config.gene2_color_selected if not same else config.gene1_color_selected
+    return genes1, genes2, colors
+
+
+def _single_transcript_view(ann):
+    """
+    Returns:
+        bool: True if the transcript level view is a single diagram rather than one for each breakpoint
+    """
+    return any([
+        ann.transcript1 == ann.transcript2,
+        ann.transcript1 is None,
+        ann.transcript2 is None,
+        isinstance(ann.transcript1, IntergenicRegion),
+        isinstance(ann.transcript2, IntergenicRegion)
+    ])
+
+
+def _transcript_ratio(ann):
+    """
+    Returns:
+        float: the fraction of the width given to the first transcript when the transcripts are drawn side-by-side
+    """
+    try:
+        ratio = len(ann.transcript1.exons) / (len(ann.transcript1.exons) + len(ann.transcript2.exons))
+        return max(0.25, min(ratio, 0.75))  # must be between 0.25 - 0.75
+    except AttributeError:
+        return 0.5
+
+
+def measure_sv_summary_diagram(
+        config, ann, templates=None, ignore_absent_templates=True,
+        draw_reference_transcripts=True,
+        draw_reference_genes=True,
+        draw_reference_templates=True,
+        draw_fusion_transcript=True,
+        stack_reference_transcripts=False):
+    """
+    measuring pass for :func:`draw_sv_summary_diagram`. Computes the minimum width (:attr:`config.width`) the
+    diagram can be drawn at with the same settings, without drawing anything. Every view-level is laid out at a
+    fixed fraction of the drawing width so the width is measured from the minimum width of each view
+
+    Returns:
+        float: the minimum width of the diagram
+    """
+    templates = dict() if templates is None else templates
+    margins = config.label_left_margin + config.left_margin + config.right_margin
+    side_margins = margins + config.inner_margin + config.label_left_margin
+
+    def full_width(view_width):  # inverse of drawing_width
+        return view_width + margins
+
+    def side_width(view_width, ratio=0.5):  # inverse of half_drawing_width * 2 * ratio
+        return view_width / ratio + side_margins
+
+    required = [0]
+    if draw_reference_templates:
+        try:
+            template1 = templates[ann.transcript1.get_chr()]
+            template2 = templates[ann.transcript2.get_chr()]
+            if template1 == template2:
+                required.append(full_width(measure_template(config, template1)))
+            else:
+                required.append(side_width(measure_template(config, template1)))
+                required.append(side_width(measure_template(config, template2)))
+        except KeyError as err:
+            if not ignore_absent_templates:
+                raise err
+
+    genes1, genes2, _ = _annotation_genes(config, ann)
+    if draw_reference_genes:
+        if ann.interchromosomal:
+            required.append(side_width(measure_genes(config, genes1, [ann.break1])))
+            required.append(side_width(measure_genes(config, genes2, [ann.break2])))
+        else:
+            required.append(full_width(measure_genes(config, genes1 | genes2, [ann.break1, ann.break2])))
+
+    if draw_reference_transcripts:
+        if _single_transcript_view(ann):
+            transcript = ann.transcript1
+            if ann.transcript1 is None or isinstance(ann.transcript1, IntergenicRegion):
+                transcript = ann.transcript2
+            try:
+                required.append(full_width(measure_ustranscript(config, transcript)))
+            except AttributeError:
+                pass  # Intergenic region or None
+        else:
+            ratio = _transcript_ratio(ann)
+            for transcript, transcript_ratio in [(ann.transcript1, ratio), (ann.transcript2, 1 - ratio)]:
+                try:
+                    width = measure_ustranscript(config, transcript)
+                except AttributeError:
+                    continue  # Intergenic region or None
+                if stack_reference_transcripts:
+                    required.append(full_width(width))
+                else:
+                    required.append(side_width(width, transcript_ratio))
+
+    if ann.fusion and draw_fusion_transcript:
+        required.append(full_width(measure_ustranscript(config, ann.fusion)))
+    return max(required)
+
+
 def draw_sv_summary_diagram(
         config, ann, reference_genome=None, templates=None, ignore_absent_templates=True,
         user_friendly_labels=True, template_display_label_prefix='',
@@ -99,48 +250,9 @@ def draw_sv_summary_diagram(
             if not ignore_absent_templates:
                 raise err
 
-    colors = dict()
-    genes1 = set()
-    genes2 = set()
+    genes1, genes2, colors = _annotation_genes(config, ann)
     legend = dict()
 
-    for gene in ann.genes_overlapping_break1:
-        genes1.add(gene)
-        colors[gene] = config.gene1_color
-
-    for gene, _ in ann.genes_proximal_to_break1:
-        genes1.add(gene)
-        colors[gene] = config.gene1_color
-
-    for gene in ann.genes_overlapping_break2:
-        genes2.add(gene)
-        colors.setdefault(gene, config.gene2_color)
-
-    for gene, _ in ann.genes_proximal_to_break2:
-        genes2.add(gene)
-        colors.setdefault(gene, config.gene2_color)
-
-    if ann.transcript1:
-        try:
-            genes1.add(ann.transcript1.gene)
-            colors[ann.transcript1.gene] = config.gene1_color_selected
-            for exon in ann.transcript1.exons:
-                colors[exon] = config.exon1_color
-        except AttributeError:
-            genes1.add(ann.transcript1)
-            colors[ann.transcript1] = config.gene1_color_selected
-
-    if ann.transcript2:
-        same = ann.transcript1 == ann.transcript2
-        try:
-            genes2.add(ann.transcript2.gene)
-            colors[ann.transcript2.gene] = config.gene2_color_selected if not same else config.gene1_color_selected
-            for exon in ann.transcript2.exons:
-                colors[exon] = config.exon2_color if not same else config.exon1_color
-        except AttributeError:
-            genes2.add(ann.transcript2)
-            colors[ann.transcript2] = config.gene2_color_selected if not same else config.gene1_color_selected
-
     if draw_reference_genes:
         # set all the labels so that they are re-used correctly
         aliases = {}
@@ -196,13 +308,7 @@ def draw_sv_summary_diagram(
     if draw_reference_transcripts:
         theights = []
         # now the transcript level drawings
-        if any([
-            ann.transcript1 == ann.transcript2,
-            ann.transcript1 is None,
-            ann.transcript2 is None,
-            isinstance(ann.transcript1, IntergenicRegion),
-            isinstance(ann.transcript2, IntergenicRegion)
-        ]):
+        if _single_transcript_view(ann):
             breaks = [ann.break1, ann.break2]
             transcript = ann.transcript1
             if ann.transcript1 is None or isinstance(ann.transcript1, IntergenicRegion):
@@ -227,11 +333,7 @@ def draw_sv_summary_diagram(
             except AttributeError:
                 pass  # Intergenic region or None
         else:  # separate drawings
-            try:
-                ratio = len(ann.transcript1.exons) / (len(ann.transcript1.exons) + len(ann.transcript2.exons))
-                ratio = max(0.25, min(ratio, 0.75))  # must be between 0.25 - 0.75
-            except AttributeError:
-                ratio = 0.5
+            ratio = _transcript_ratio(ann)
 
             try:
                 svg_group = canvas.g(class_='transcript')
@@ -5,7 +5,7 @@ This is the primary module responsible for generating svg visualizations
 import itertools
 import re
 
-from .util import dynamic_label_color, generate_interval_mapping, LabelMapping, split_intervals_into_tracks, Tag
+from .util import dynamic_label_color, generate_interval_mapping, LabelMapping, minimum_mapping_width, split_intervals_into_tracks, Tag
 from ..annotate.variant import FusionTranscript
 from ..constants import CODON_SIZE, GIEMSA_STAIN, ORIENT, STRAND
 from ..error import DrawingFitError, NotSpecifiedError
@@ -317,6 +317,46 @@ def draw_transcript_with_translation(
     return main_group
 
 
+def _transcript_range(pre_transcript):
+    """
+    Returns:
+        tuple of int and int: the genomic start and end of the transcript diagram
+    """
+    genomic_min = min([e.start for e in pre_transcript.exons] + [pre_transcript.start])
+    genomic_max = max([e.end for e in pre_transcript.exons] + [pre_transcript.end])
+    return genomic_min, genomic_max
+
+
+def _exons_to_map(config, pre_transcript):
+    """
+    Returns:
+        :class:`list` of :class:`Exon`: the exons which are given a minimum width in the transcript diagram
+    """
+    try:
+        return [e for e in pre_transcript.exons if len(e) >= config.exon_min_focus_size]
+    except AttributeError:
+        return pre_transcript.exons
+
+
+def measure_ustranscript(config, pre_transcript):
+    """
+    measures the transcript without drawing it
+
+    Returns:
+        int: the minimum target width that :func:`draw_ustranscript` can fit the transcript to
+    """
+    if pre_transcript.get_strand() not in [STRAND.POS, STRAND.NEG]:
+        raise NotSpecifiedError('strand must be positive or negative to draw the pre_transcript')
+    genomic_min, genomic_max = _transcript_range(pre_transcript)
+    return minimum_mapping_width(
+        _exons_to_map(config, pre_transcript),
+        config.exon_min_width,
+        min_inter_width=config.min_width,
+        start=genomic_min,
+        end=genomic_max
+    )
+
+
 def draw_ustranscript(
     config, canvas, pre_transcript, target_width=None, breakpoints=[], labels=LabelMapping(), colors={},
     mapping=None, reference_genome=None, masks=None
@@ -345,17 +385,11 @@ def draw_ustranscript(
     if (mapping is None and target_width is None) or (mapping is not None and target_width is not None):
         raise AttributeError('mapping and target_width arguments are required and mutually exclusive')
 
-    genomic_min = min([e.start for e in pre_transcript.exons] + [pre_transcript.start])
-    genomic_max = max([e.end for e in pre_transcript.exons] + [pre_transcript.end])
+    genomic_min, genomic_max = _transcript_range(pre_transcript)
 
     if mapping is None:
-        try:
-            exons_to_map = [e for e in pre_transcript.exons if len(e) >= config.exon_min_focus_size]
-        except AttributeError:
-            exons_to_map = pre_transcript.exons
-
         mapping = generate_interval_mapping(
-            exons_to_map,
+            _exons_to_map(config, pre_transcript),
             target_width,
             config.exon_intron_ratio,
             config.exon_min_width,
@@ -442,6 +476,33 @@ def draw_ustranscript(
     return main_group
 
 
+def _genes_range(config, genes, breakpoints):
+    """
+    Returns:
+        tuple of int and int: the genomic start and end of the genes diagram
+    """
+    st = max(min([g.start for g in genes] + [b.start for b in breakpoints]) - config.gene_min_buffer, 1)
+    end = max([g.end for g in genes] + [b.end for b in breakpoints]) + config.gene_min_buffer
+    return st, end
+
+
+def measure_genes(config, genes, breakpoints=None):
+    """
+    measures the genes without drawing them
+
+    Returns:
+        int: the minimum target width that :func:`draw_genes` can fit the genes to
+    """
+    breakpoints = [] if breakpoints is None else breakpoints
+    st, end = _genes_range(config, genes, breakpoints)
+    return minimum_mapping_width(
+        [g for g in genes],
+        config.gene_min_width,
+        start=st, end=end,
+        min_inter_width=config.min_width
+    )
+
+
 def draw_genes(config, canvas, genes, target_width, breakpoints=None, colors=None, labels=None, plots=None, masks=None):
     """
     draws the genes given in order of their start position trying to minimize
@@ -465,8 +526,7 @@ def draw_genes(config, canvas, genes, target_width, breakpoints=None, colors=Non
     labels = LabelMapping() if labels is None else labels
     plots = plots if plots else []
 
-    st = max(min([g.start for g in genes] + [b.start for b in breakpoints]) - config.gene_min_buffer, 1)
-    end = max([g.end for g in genes] + [b.end for b in breakpoints]) + config.gene_min_buffer
+    st, end = _genes_range(config, genes, breakpoints)
     main_group = canvas.g(class_='genes')
     mapping = generate_interval_mapping(
         [g for g in genes],
@@ -671,6 +731,16 @@ def draw_exon(config, canvas, exon, width, height, fill, label='', translation=N
     return g
 
 
+def measure_template(config, template):
+    """
+    measures the template without drawing it
+
+    Returns:
+        int: the minimum target width that :func:`draw_template` can fit the template to
+    """
+    return minimum_mapping_width(template.bands, config.template_band_min_width, start=template.start, end=template.end)
+
+
 def draw_template(config, canvas, template, target_width, labels=None, colors=None, breakpoints=None):
     """
     Creates the template/chromosome illustration
@@ -91,11 +91,17 @@ def split_intervals_into_tracks(intervals):
     return tracks
 
 
-def generate_interval_mapping(
-        input_intervals, target_width, ratio, min_width,
-        buffer_length=None, start=None, end=None, min_inter_width=None,
-        min_pixel_accuracy=MIN_PIXEL_ACCURACY):
-    min_inter_width = min_width if min_inter_width is None else min_inter_width
+def _split_mapping_intervals(input_intervals, buffer_length=None, start=None, end=None):
+    """
+    merges and splits the input intervals into the intervals which are each mapped to a pixel interval
+
+    Returns:
+        tuple: tuple contains
+
+            - :class:`list` of :class:`~mavis.interval.Interval`: the sorted intervals
+            - :class:`int`: the start of the mapped range
+            - :class:`int`: the end of the mapped range
+    """
     if all([x is not None for x in [start, end, buffer_length]]):
         raise AttributeError('buffer_length is a mutually exclusive argument with start/end')
 
@@ -155,10 +161,13 @@ def generate_interval_mapping(
         end = intervals[-1].end + buffer_length
     elif end <= 0:
         raise AttributeError('end must be a natural number', end)
+    return intervals, start, end
 
-    total_length = end - start + 1
-    genic_length = sum([len(i) for i in intervals])
-    intergenic_length = total_length - genic_length
+
+def _reserved_width(intervals, start, end, min_width, min_inter_width):
+    """
+    the width reserved by the minimum widths of the split intervals and the gaps (intergenic regions) between them
+    """
     intermediate_intervals = 0
     if start < intervals[0].start:
         intermediate_intervals += 1
@@ -168,7 +177,33 @@ def generate_interval_mapping(
     for i in range(1, len(intervals)):
         if intervals[i].start > intervals[i - 1].end + 1:
             intermediate_intervals += 1
-    width = target_width - intermediate_intervals * min_inter_width - len(intervals) * min_width  # reserved width
+    return intermediate_intervals * min_inter_width + len(intervals) * min_width
+
+
+def minimum_mapping_width(input_intervals, min_width, buffer_length=None, start=None, end=None, min_inter_width=None):
+    """
+    measures the smallest target width that :func:`generate_interval_mapping` can map the intervals to without
+    raising a :class:`~mavis.error.DrawingFitError`
+
+    Returns:
+        int: the minimum target width
+    """
+    min_inter_width = min_width if min_inter_width is None else min_inter_width
+    intervals, start, end = _split_mapping_intervals(input_intervals, buffer_length, start, end)
+    return _reserved_width(intervals, start, end, min_width, min_inter_width)
+
+
+def generate_interval_mapping(
+        input_intervals, target_width, ratio, min_width,
+        buffer_length=None, start=None, end=None, min_inter_width=None,
+        min_pixel_accuracy=MIN_PIXEL_ACCURACY):
+    min_inter_width = min_width if min_inter_width is None else min_inter_width
+    intervals, start, end = _split_mapping_intervals(input_intervals, buffer_length, start, end)
+
+    total_length = end - start + 1
+    genic_length = sum([len(i) for i in intervals])
+    intergenic_length = total_length - genic_length
+    width = target_width - _reserved_width(intervals, start, end, min_width, min_inter_width)  # reserved width
 
     if width < 0:
         raise DrawingFitError('width cannot accommodate the number of expected objects')
@@ -431,6 +431,16 @@ def main():
     optional[SUBCOMMAND.CONFIG].add_argument(
         '--distribution_fraction', default=get_env_variable('distribution_fraction', 0.97), type=float_fraction, metavar=get_metavar(float),
         help='the proportion of the distribution of calculated fragment sizes to use in determining the stdev')
+    optional[SUBCOMMAND.CONFIG].add_argument(
+        '--convergence_tolerance', default=get_env_variable('convergence_tolerance', 0), type=float_fraction, metavar=get_metavar(float),
+        help='stop sampling bins/genes for the fragment size stats once the relative change in the median and stdev is within '
+        'this tolerance. A value of 0 samples all bins/genes')
+    optional[SUBCOMMAND.CONFIG].add_argument(
+        '--stats_workers', default=get_env_variable('stats_workers', 1), type=int, metavar=get_metavar(int),
+        help='number of processes to use in computing the bam stats for the libraries')
+    optional[SUBCOMMAND.CONFIG].add_argument(
+        '--stats_seed', default=get_env_variable('stats_seed', None, cast_type=int), type=int, metavar=get_metavar(int),
+        help='seed for the random sampling of bins/genes in computing the bam stats')
     optional[SUBCOMMAND.CONFIG].add_argument(
         '--convert', nmin=3,
         metavar='<alias> FILEPATH [FILEPATH ...] {{{}}} [stranded]'.format(','.join(SUPPORTED_TOOL.values())),
@@ -1,3 +1,5 @@
+import tab
+
 from ..constants import CALL_METHOD, MavisNamespace
 from ..util import WeakMavisNamespace
 
@@ -6,6 +8,8 @@ DEFAULTS = WeakMavisNamespace()
 """
 - :term:`contig_call_distance`
 - :term:`flanking_call_distance`
+- :term:`pairing_load_shards`
+- :term:`pairing_workers`
 - :term:`spanning_call_distance`
 - :term:`split_call_distance`
 """
@@ -24,6 +28,15 @@ DEFAULTS.add(
 DEFAULTS.add(
     'input_call_distance', 20,
     defn='the maximum distance allowed between breakpoint pairs (called by input tools, not validated) in order for them to pair')
+DEFAULTS.add(
+    'pairing_workers', 1, cast_type=int,
+    defn='the number of processes to use in pairing. Independent sets of calls (by chromosomes, strands and event type '
+    'or by transcripts) are split into this many shards')
+DEFAULTS.add(
+    'pairing_load_shards', False, cast_type=tab.cast_boolean,
+    defn='flag to indicate if the inputs should be streamed in chunks and split into one temporary file per shard which '
+    'each pairing worker reads, rather than loading all the calls in the main process. Limits the memory used at the cost '
+    'of re-reading the inputs and writing a copy of them to the output directory')
 
 PAIRING_DISTANCES = MavisNamespace(**{
     CALL_METHOD.FLANK: DEFAULTS.flanking_call_distance,
@@ -1,42 +1,26 @@
-import itertools
+from concurrent.futures import ProcessPoolExecutor
+import heapq
+import io
+import json
 import os
+import re
+import tempfile
 import time
 
-from .pairing import inferred_equivalent, product_key, pair_by_distance
+from .pairing import PREDICTION_CACHE, pair_by_distance, pair_by_product, product_key
 from .constants import DEFAULTS
 from ..annotate.constants import SPLICE_TYPE
-from ..constants import CALL_METHOD, COLUMNS, PROTOCOL, SVTYPE
-from ..util import generate_complete_stamp, log, output_tabbed_file, read_inputs
+from ..constants import CALL_METHOD, COLUMNS, PROTOCOL, sort_columns, SVTYPE
+from ..util import bash_expands, generate_complete_stamp, log, output_tabbed_file, read_bpp_from_input_file, read_inputs
 
+DISTANCE_PAIRING = 'distance'
+PRODUCT_PAIRING = 'product'
+_READ_CHUNK_SIZE = 10000
+""":class:`int`: the number of rows converted to breakpoint pairs at a time when streaming the inputs"""
 
-def main(
-    inputs, output, annotations,
-    flanking_call_distance=DEFAULTS.flanking_call_distance,
-    split_call_distance=DEFAULTS.split_call_distance,
-    contig_call_distance=DEFAULTS.contig_call_distance,
-    spanning_call_distance=DEFAULTS.spanning_call_distance,
-    start_time=int(time.time()),
-    **kwargs
-):
-    """
-    Args:
-        inputs (:class:`List` of :class:`str`): list of input files to read
-        output (str): path to the output directory
-        flanking_call_distance (int): pairing distance for pairing with an event called by :term:`flanking read pair`
-        split_call_distance (int): pairing distance for pairing with an event called by :term:`split read`
-        contig_call_distance (int): pairing distance for pairing with an event called by contig or :term:`spanning read`
-    """
-    # load the file
-    distances = {
-        CALL_METHOD.FLANK: flanking_call_distance,
-        CALL_METHOD.SPLIT: split_call_distance,
-        CALL_METHOD.CONTIG: contig_call_distance,
-        CALL_METHOD.SPAN: spanning_call_distance
-    }
 
-    bpps = []
-    bpps.extend(read_inputs(
-        inputs,
+def _read_arguments():
+    return dict(
         require=[
             COLUMNS.annotation_id,
             COLUMNS.library,
@@ -56,32 +40,327 @@ def main(
             COLUMNS.fusion_splicing_pattern: None
         },
         expand_strand=False, expand_orient=False, expand_svtype=False
-    ))
-    log('read {} breakpoint pairs'.format(len(bpps)))
+    )
 
-    # load all transcripts
-    reference_transcripts = dict()
-    for genes in annotations.values():
-        for gene in genes:
-            for unspliced_t in gene.transcripts:
-                if unspliced_t.name in reference_transcripts:
-                    raise KeyError('transcript name is not unique', gene, unspliced_t)
-                reference_transcripts[unspliced_t.name] = unspliced_t
+
+def _read_pairing_inputs(inputs):
+    return read_inputs(inputs, **_read_arguments())
+
+
+def _stream_pairing_inputs(inputs):
+    """
+    reads the calls from the input files without holding all of them in memory. The rows are converted to breakpoint
+    pairs :data:`_READ_CHUNK_SIZE` rows at a time
+
+    Args:
+        inputs (list of str): paths (or glob expressions) of the input files
+
+    Returns:
+        generator of :class:`tuple`: the header line, the input line and the breakpoint pair for each row
+    """
+    def read_chunk(header, lines, rows_read):
+        kwargs = _read_arguments()
+        kwargs['require'].append(COLUMNS.protocol)
+        kwargs['in_'][COLUMNS.protocol] = PROTOCOL.values()
+        bpps = read_bpp_from_input_file(io.StringIO(header + ''.join(lines)), **kwargs)
+        for line, bpp in zip(lines, bpps):
+            bpp.data['line_no'] += rows_read  # line numbers relative to the file rather than the chunk
+            yield header, line, bpp
+
+    for expr in inputs:
+        for finput in bash_expands(expr):
+            log('streaming:', finput)
+            header = None
+            lines = []
+            rows_read = 0
+            with open(finput, 'r') as fh:
+                for line in fh:
+                    if header is None:
+                        if re.match(r'^\s*##', line):  # skip comment lines
+                            continue
+                        header = line
+                        continue
+                    lines.append(line)
+                    if len(lines) >= _READ_CHUNK_SIZE:
+                        yield from read_chunk(header, lines, rows_read)
+                        rows_read += len(lines)
+                        lines = []
+            if header is None:
+                log('ignoring empty file:', finput)
+            elif lines:
+                yield from read_chunk(header, lines, rows_read)
+
+
+def _pairing_category(pairing_type, bpp):
+    """
+    the independent set of calls that the call belongs to for a type of pairing. Calls are only paired with other calls
+    in the same category. Returns None if the call is not paired by this type of pairing
+    """
+    if pairing_type == DISTANCE_PAIRING:
+        return (bpp.break1.chr, bpp.break2.chr, bpp.opposing_strands, bpp.event_type)
+    if bpp.gene1 or bpp.gene2:
+        return (bpp.transcript1, bpp.transcript2)
+    return None
+
+
+def _shard_categories(category_sizes, shards):
+    """
+    splits the categories into shards of similar total size, largest categories first
+
+    Args:
+        category_sizes (dict): the number of calls in each category
+
+    Returns:
+        :class:`list` of :class:`list` of :class:`tuple`: the categories in each (non-empty) shard
+    """
+    bins = [(0, i, []) for i in range(max(1, shards))]
+    for category, count in sorted(category_sizes.items(), key=lambda x: x[1], reverse=True):
+        size, index, categories = min(bins)
+        categories.append(category)
+        bins[index] = (size + count, index, categories)
+    return [categories for size, index, categories in bins if categories]
+
+
+_WORKER_STATE = {}
+
+
+def _init_pairing_worker(state):
+    _WORKER_STATE.clear()
+    _WORKER_STATE.update(state)
+
+
+def _pair_shard(pairing_type, categories, calls_by_category=None, shard_file=None, state=None):
+    """
+    computes the pairings for a shard of the categories
+
+    Args:
+        pairing_type (str): distance or product pairing
+        categories (:class:`list` of :class:`tuple`): the categories in this shard
+        calls_by_category (dict): the calls for each category. If not given, the calls are read from the shard file
+        shard_file (str): path to the file containing only the rows for this shard (see :func:`_write_shard_inputs`)
+        state (dict): the distances and reference transcripts. If not given, the state set when the worker process was
+            initialized is used
+
+    Returns:
+        tuple: tuple contains
+
+            - :class:`dict` of :class:`str` and :class:`set` of :class:`str`: the pairings by product key
+            - :class:`int`: the number of breakpoint predictions found in the prediction cache
+            - :class:`int`: the number of breakpoint predictions which were computed
+    """
+    if state is None:
+        state = _WORKER_STATE
+    if calls_by_category is None:
+        calls_by_category = {}
+        for bpp in _read_pairing_inputs([shard_file]):
+            calls_by_category.setdefault(_pairing_category(pairing_type, bpp), []).append(bpp)
+    hits, misses = PREDICTION_CACHE.hits, PREDICTION_CACHE.misses
+    pairings = {}
+    for category in categories:
+        calls = calls_by_category.get(category, [])
+        if pairing_type == DISTANCE_PAIRING:
+            shard_pairings = pair_by_distance(calls, state['distances'], against_self=False)
+        else:
+            shard_pairings = pair_by_product(calls, state['distances'], state['reference_transcripts'])
+        for node, adj_list in shard_pairings.items():
+            pairings.setdefault(node, set()).update(adj_list)
+    return pairings, PREDICTION_CACHE.hits - hits, PREDICTION_CACHE.misses - misses
+
+
+def _count_categories(inputs):
+    """
+    streams the inputs, keeping only the product keys and the number of calls in each category
+
+    Returns:
+        tuple: tuple contains
+
+            - :class:`dict`: the number of calls in each category by pairing type
+            - :class:`set` of :class:`str`: the libraries of the calls
+            - :class:`int`: the number of calls
+
+    Raises:
+        KeyError: if a product key is not unique
+    """
+    category_sizes = {DISTANCE_PAIRING: {}, PRODUCT_PAIRING: {}}
+    product_keys = set()
+    libraries = set()
+    for header, line, bpp in _stream_pairing_inputs(inputs):
+        libraries.add(bpp.library)
+        for pairing_type, sizes in category_sizes.items():
+            category = _pairing_category(pairing_type, bpp)
+            if category is not None:
+                sizes[category] = sizes.get(category, 0) + 1
+        if product_key(bpp) in product_keys:
+            raise KeyError('duplicate bpp is not unique within lib', bpp.library, product_key, bpp, bpp.data)
+        product_keys.add(product_key(bpp))
+    return category_sizes, libraries, len(product_keys)
+
+
+def _write_shard_inputs(inputs, shards, output):
+    """
+    copies the input rows to one temporary file per shard so that each worker reads only the rows for its own
+    categories
+
+    Args:
+        inputs (list of str): paths (or glob expressions) of the input files
+        shards (dict): the categories in each shard by pairing type
+        output (str): the directory to write the shard files to
+
+    Returns:
+        :class:`dict` of :class:`str` and :class:`list` of :class:`str`: the shard files by pairing type (in the same
+        order as the shards)
+    """
+    shard_by_category = {}
+    shard_files = {}
+    for pairing_type, type_shards in shards.items():
+        shard_files[pairing_type] = []
+        for index, categories in enumerate(type_shards):
+            fd, filename = tempfile.mkstemp(prefix='pairing.{}.shard{}.'.format(pairing_type, index), dir=output)
+            os.close(fd)
+            shard_files[pairing_type].append(filename)
+            for category in categories:
+                shard_by_category[(pairing_type, category)] = filename
+    handles = {}
+    headers = {}
+    try:
+        for header, line, bpp in _stream_pairing_inputs(inputs):
+            for pairing_type in shards:
+                filename = shard_by_category.get((pairing_type, _pairing_category(pairing_type, bpp)))
+                if filename is None:
+                    continue
+                if filename not in handles:
+                    handles[filename] = open(filename, 'w')
+                if headers.get(filename) != header:  # inputs with a different column order
+                    if filename in headers:
+                        raise AssertionError('cannot shard inputs with different columns', header, headers[filename])
+                    handles[filename].write(header)
+                    headers[filename] = header
+                handles[filename].write(line)
+    finally:
+        for fh in handles.values():
+            fh.close()
+    return shard_files
+
+
+def _output_sorted_pairings(inputs, filename, distance_pairings, product_pairings, output):
+    """
+    streams the inputs a final time to write the calls with their pairings. The rows are sorted by library and
+    chromosome pair (as in the default mode) by writing sorted runs of rows to temporary files and merging them
+
+    Returns:
+        int: the number of rows written
+    """
+    header = set()
+    runs = []
+
+    def write_run(rows):
+        rows.sort(key=lambda r: r[0])
+        fh = tempfile.TemporaryFile('w+', dir=output)
+        for row in rows:
+            fh.write(json.dumps(row) + '\n')
+        fh.seek(0)
+        runs.append(fh)
+
+    rows = []
+    try:
+        for index, (line_header, line, bpp) in enumerate(_stream_pairing_inputs(inputs)):
+            pkey = product_key(bpp)
+            bpp.data[COLUMNS.product_id] = pkey
+            bpp.data[COLUMNS.pairing] = ';'.join(sorted(distance_pairings.get(pkey, [])))
+            bpp.data[COLUMNS.inferred_pairing] = ';'.join(sorted(product_pairings.get(pkey, [])))
+            row = bpp.flatten()
+            header.update(row.keys())
+            rows.append(([bpp.library, bpp.break1.chr, bpp.break2.chr, index], {k: str(v) for k, v in row.items()}))
+            if len(rows) >= _READ_CHUNK_SIZE:
+                write_run(rows)
+                rows = []
+        header = sort_columns(header)
+        log('writing:', filename)
+        count = 0
+        with open(filename, 'w') as fh:
+            fh.write('#' + '\t'.join(header) + '\n')
+            for key, row in heapq.merge(
+                sorted(rows, key=lambda r: r[0]), *[(json.loads(line) for line in run) for run in runs],
+                key=lambda r: r[0]
+            ):
+                fh.write('\t'.join([row.get(c, 'None') for c in header]) + '\n')
+                count += 1
+    finally:
+        for run in runs:
+            run.close()
+    return count
+
+
+def _load_shard_pairings(inputs, output, state, pairing_workers, executor=None):
+    """
+    pairs the calls without holding all of them in memory. The inputs are streamed to count the calls in each
+    category, then split into one file per shard for the workers to read, and finally streamed again to write the
+    output rows
+
+    Returns:
+        tuple: the pairings by pairing type, the libraries and the prediction cache hits and misses
+    """
+    category_sizes, libraries, total = _count_categories(inputs)
+    log('read {} breakpoint pairs'.format(total))
+    shards = {
+        pairing_type: _shard_categories(sizes, pairing_workers) for pairing_type, sizes in category_sizes.items()
+    }
+    shard_files = _write_shard_inputs(inputs, shards, output)
+    pairings = {DISTANCE_PAIRING: {}, PRODUCT_PAIRING: {}}
+    prediction_hits = 0
+    prediction_misses = 0
+    try:
+        for pairing_type in [DISTANCE_PAIRING, PRODUCT_PAIRING]:
+            log('computing {} based pairings for {} categories in {} shards'.format(
+                pairing_type, len(category_sizes[pairing_type]), len(shards[pairing_type])))
+            args = list(zip(shards[pairing_type], shard_files[pairing_type]))
+            if executor is not None and len(args) > 1:
+                futures = [
+                    executor.submit(_pair_shard, pairing_type, categories, shard_file=shard_file)
+                    for categories, shard_file in args
+                ]
+                results = [future.result() for future in futures]
+            else:
+                results = [
+                    _pair_shard(pairing_type, categories, shard_file=shard_file, state=state)
+                    for categories, shard_file in args
+                ]
+            for shard_pairings, hits, misses in results:
+                prediction_hits += hits
+                prediction_misses += misses
+                for node, adj_list in shard_pairings.items():
+                    pairings[pairing_type].setdefault(node, set()).update(adj_list)
+    finally:
+        for filenames in shard_files.values():
+            for filename in filenames:
+                os.remove(filename)
+    return pairings, libraries, prediction_hits, prediction_misses
+
+
+def _pair_calls(inputs, state, pairing_workers, executor=None):
+    """
+    reads all the calls and pairs them. The calls for each shard are sent to the worker processes
+
+    Returns:
+        tuple: the calls by product key, the pairings by pairing type, the libraries and the prediction cache hits and
+        misses
+    """
+    bpps = _read_pairing_inputs(inputs)
+    log('read {} breakpoint pairs'.format(len(bpps)))
 
     # map the calls by library and ensure there are no name/key conflicts
-    calls_by_cat = dict()
-    calls_by_ann = dict()
+    calls_by_category = {DISTANCE_PAIRING: {}, PRODUCT_PAIRING: {}}
     bpp_by_product_key = dict()
     libraries = set()
 
     # initialize the pairing mappings
     for bpp in bpps:
         libraries.add(bpp.library)
-        category = (bpp.break1.chr, bpp.break2.chr, bpp.opposing_strands, bpp.event_type)
         bpp.data[COLUMNS.product_id] = product_key(bpp)
-        calls_by_cat.setdefault(category, []).append(bpp)
-        if bpp.gene1 or bpp.gene2:
-            calls_by_ann.setdefault((bpp.transcript1, bpp.transcript2), []).append(bpp)
+        for pairing_type, calls_by_cat in calls_by_category.items():
+            category = _pairing_category(pairing_type, bpp)
+            if category is not None:
+                calls_by_cat.setdefault(category, []).append(bpp)
         bpp.data[COLUMNS.pairing] = ''
         bpp.data[COLUMNS.inferred_pairing] = ''
 
@@ -89,47 +368,102 @@ def main(
             raise KeyError('duplicate bpp is not unique within lib', bpp.library, product_key, bpp, bpp.data)
         bpp_by_product_key[product_key(bpp)] = bpp
 
-    distance_pairings = {}
-    product_pairings = {}
-    log('computing distance based pairings')
-    # pairwise comparison of breakpoints between all libraries
-    for set_num, (category, calls) in enumerate(sorted(calls_by_cat.items(), key=lambda x: (len(x[1]), x[0]), reverse=True)):
-        log('comparing set {} of {} with {} items'.format(set_num + 1, len(calls_by_cat), len(calls)))
-        for node, adj_list in pair_by_distance(calls, distances, against_self=False).items():
-            distance_pairings.setdefault(node, set()).update(adj_list)
-
-    log('computing inferred (by product) pairings')
-    for calls in calls_by_ann.values():
-        calls_by_lib = {}
-        for call in calls:
-            calls_by_lib.setdefault(call.library, []).append(call)
-
-        for lib, other_lib in itertools.combinations(calls_by_lib.keys(), 2):
-            # create combinations from other libraries in the same category
-            pairs = calls_by_lib[lib]
-            other_pairs = calls_by_lib[other_lib]
-
-            for current, other in itertools.product(pairs, other_pairs):
-                if inferred_equivalent(
-                    current,
-                    other,
-                    distances=distances,
-                    reference_transcripts=reference_transcripts
-                ):
-                    product_pairings.setdefault(product_key(current), set()).add(product_key(other))
-                    product_pairings.setdefault(product_key(other), set()).add(product_key(current))
-
-    for pkey, pkeys in distance_pairings.items():
-        bpp = bpp_by_product_key[pkey]
-        bpp.data[COLUMNS.pairing] = ';'.join(sorted(pkeys))
-
-    for pkey, pkeys in product_pairings.items():
-        bpp = bpp_by_product_key[pkey]
-        bpp.data[COLUMNS.inferred_pairing] = ';'.join(sorted(pkeys))
+    pairings = {DISTANCE_PAIRING: {}, PRODUCT_PAIRING: {}}
+    prediction_hits = 0
+    prediction_misses = 0
+    # the categories are independent so each shard can be paired separately and the pairings merged
+    for pairing_type in [DISTANCE_PAIRING, PRODUCT_PAIRING]:
+        calls_by_cat = calls_by_category[pairing_type]
+        shards = _shard_categories({c: len(calls) for c, calls in calls_by_cat.items()}, pairing_workers)
+        log('computing {} based pairings for {} categories in {} shards'.format(
+            pairing_type, len(calls_by_cat), len(shards)))
+        if executor is not None and len(shards) > 1:
+            futures = [
+                executor.submit(_pair_shard, pairing_type, categories, {c: calls_by_cat[c] for c in categories})
+                for categories in shards
+            ]
+            results = [future.result() for future in futures]
+        else:
+            results = [_pair_shard(pairing_type, categories, calls_by_cat, state=state) for categories in shards]
+        for shard_pairings, hits, misses in results:
+            prediction_hits += hits
+            prediction_misses += misses
+            for node, adj_list in shard_pairings.items():
+                pairings[pairing_type].setdefault(node, set()).update(adj_list)
+    return bpp_by_product_key, pairings, libraries, prediction_hits, prediction_misses
+
+
+def main(
+    inputs, output, annotations,
+    flanking_call_distance=DEFAULTS.flanking_call_distance,
+    split_call_distance=DEFAULTS.split_call_distance,
+    contig_call_distance=DEFAULTS.contig_call_distance,
+    spanning_call_distance=DEFAULTS.spanning_call_distance,
+    pairing_workers=DEFAULTS.pairing_workers,
+    pairing_load_shards=DEFAULTS.pairing_load_shards,
+    start_time=int(time.time()),
+    **kwargs
+):
+    """
+    Args:
+        inputs (:class:`List` of :class:`str`): list of input files to read
+        output (str): path to the output directory
+        flanking_call_distance (int): pairing distance for pairing with an event called by :term:`flanking read pair`
+        split_call_distance (int): pairing distance for pairing with an event called by :term:`split read`
+        contig_call_distance (int): pairing distance for pairing with an event called by contig or :term:`spanning read`
+        pairing_workers (int): the number of processes to use in computing the pairings
+        pairing_load_shards (bool): stream the inputs rather than loading all the calls. The rows for each shard are
+            split into separate files for the workers to read and the output is sorted by merging sorted runs of rows
+    """
+    # load the file
+    distances = {
+        CALL_METHOD.FLANK: flanking_call_distance,
+        CALL_METHOD.SPLIT: split_call_distance,
+        CALL_METHOD.CONTIG: contig_call_distance,
+        CALL_METHOD.SPAN: spanning_call_distance
+    }
+
+    # load all transcripts
+    reference_transcripts = dict()
+    for genes in annotations.values():
+        for gene in genes:
+            for unspliced_t in gene.transcripts:
+                if unspliced_t.name in reference_transcripts:
+                    raise KeyError('transcript name is not unique', gene, unspliced_t)
+                reference_transcripts[unspliced_t.name] = unspliced_t
+
+    state = dict(distances=distances, reference_transcripts=reference_transcripts)
+    PREDICTION_CACHE.clear()
+    executor = None
+    if pairing_workers > 1:
+        executor = ProcessPoolExecutor(max_workers=pairing_workers, initializer=_init_pairing_worker, initargs=(state, ))
+    try:
+        if pairing_load_shards:
+            pairings, libraries, prediction_hits, prediction_misses = _load_shard_pairings(
+                inputs, output, state, pairing_workers, executor)
+        else:
+            bpps, pairings, libraries, prediction_hits, prediction_misses = _pair_calls(
+                inputs, state, pairing_workers, executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    log('transcriptome breakpoint predictions: hits={}, misses={}'.format(prediction_hits, prediction_misses))
+    distance_pairings = pairings[DISTANCE_PAIRING]
+    product_pairings = pairings[PRODUCT_PAIRING]
 
     fname = os.path.join(
         output,
         'mavis_paired_{}.tab'.format('_'.join(sorted(list(libraries))))
     )
-    output_tabbed_file(bpps, fname)
+    if pairing_load_shards:
+        _output_sorted_pairings(inputs, fname, distance_pairings, product_pairings, output)
+    else:
+        for pkey, pkeys in distance_pairings.items():
+            bpps[pkey].data[COLUMNS.pairing] = ';'.join(sorted(pkeys))
+
+        for pkey, pkeys in product_pairings.items():
+            bpps[pkey].data[COLUMNS.inferred_pairing] = ';'.join(sorted(pkeys))
+
+        # rows for the same library and chromosome pair are written together so the summary can be streamed
+        output_tabbed_file(sorted(bpps.values(), key=lambda b: (b.library, b.break1.chr, b.break2.chr)), fname)
     generate_complete_stamp(output, log, start_time=start_time)
@@ -1,5 +1,9 @@
+import bisect
+import itertools
+
 from .constants import DEFAULTS, PAIRING_DISTANCES
 
+from ..annotate.constants import SPLICE_SITE_RADIUS
 from ..annotate.variant import determine_prime
 from ..breakpoint import Breakpoint
 from ..constants import CALL_METHOD, COLUMNS, ORIENT, PRIME, PROTOCOL, STRAND
@@ -37,12 +41,19 @@ def predict_transcriptome_breakpoint(breakpoint, transcript):
     exons = transcript.exons[:]
     if not Interval.overlaps(breakpoint, transcript):
         raise AssertionError('breakpoint does not overlap the transcript', breakpoint, transcript)
+    # only the exons (with their splice sites) and introns near the breakpoint can overlap it. The exons are sorted and
+    # non-overlapping so the window can be found from the exon coordinates
+    window_start = max(0, bisect.bisect_left([e.end for e in exons], breakpoint.start - SPLICE_SITE_RADIUS) - 1)
+    window_end = min(len(exons), bisect.bisect_right([e.start for e in exons], breakpoint.end + SPLICE_SITE_RADIUS) + 1)
+    window = range(window_start, window_end)
     if transcript.get_strand() == STRAND.NEG:
         exons.reverse()
+        window = range(len(exons) - window_end, len(exons) - window_start)
 
     tbreaks = []
 
-    for i, curr in enumerate(exons):
+    for i in window:
+        curr = exons[i]
         temp = curr.acceptor_splice_site | curr.donor_splice_site
 
         if Interval.overlaps(breakpoint, temp):  # overlaps a splice site or exon
@@ -106,6 +117,65 @@ def predict_transcriptome_breakpoint(breakpoint, transcript):
     return sorted(tbreaks)
 
 
+class BreakpointPredictionCache:
+    """
+    memo of :func:`predict_transcriptome_breakpoint` for the duration of a run. Expected errors (breakpoints which
+    cannot be predicted) are cached and raised again on lookup
+
+    Attributes:
+        hits (int): the number of predictions which were found in the cache
+        misses (int): the number of predictions which had to be computed
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._items = {}
+
+    def __len__(self):
+        return len(self._items)
+
+    def __str__(self):
+        return 'BreakpointPredictionCache(entries={}, hits={}, misses={})'.format(len(self), self.hits, self.misses)
+
+    def predict(self, breakpoint, transcript):
+        """
+        Args:
+            breakpoint (Breakpoint): the genomic breakpoint
+            transcript (PreTranscript): the transcript
+
+        Returns:
+            :class:`list` of :class:`Breakpoint`: see :func:`predict_transcriptome_breakpoint`
+        """
+        # the transcript is stored with the result so that its id cannot be reused while cached
+        key = (breakpoint.key, transcript.name, id(transcript))
+        try:
+            result, error, _ = self._items[key]
+            self.hits += 1
+        except KeyError:
+            self.misses += 1
+            result, error = None, None
+            try:
+                result = predict_transcriptome_breakpoint(breakpoint, transcript)
+            except (NotSpecifiedError, AssertionError) as err:
+                error = err
+            self._items[key] = (result, error, transcript)
+        if error is not None:
+            raise error.__class__(*error.args)
+        return result[:]
+
+    def clear(self):
+        """
+        remove all cached predictions and reset the counters
+        """
+        self._items.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+PREDICTION_CACHE = BreakpointPredictionCache()
+
+
 def _equivalent_events(event1, event2):
     # basic checks
     if any([
@@ -156,48 +226,108 @@ def equivalent(event1, event2, distances=None):
     return True
 
 
-def pair_by_distance(calls, distances, log=devnull, against_self=False):
+def _pairing_grid(calls, cell_size):
+    """
+    bins calls into a 2D grid over the start positions of their breakpoints. Calls which cannot be equivalent (different
+    chromosomes, event types or opposing strands) are binned separately
+
+    Args:
+        calls (:class:`list` of :class:`BreakpointPair`): the calls to be binned
+        cell_size (int): the width of the cells in both dimensions
+
+    Returns:
+        :class:`dict` of :class:`tuple` and :class:`list` of :class:`int`: the indices of the calls in each grid cell
     """
-    for a set of input calls, pair by distance
+    grid = {}
+    for index, call in enumerate(calls):
+        cell = (
+            call.break1.chr, call.break2.chr, call.opposing_strands, call.data.get(COLUMNS.event_type),
+            call.break1.start // cell_size, call.break2.start // cell_size
+        )
+        grid.setdefault(cell, []).append(index)
+    return grid
+
+
+# neighbouring cells which are compared against the current cell. Only half of the neighbours are used so that each pair of
+# cells is only compared once
+_GRID_NEIGHBOURS = [(0, 1), (1, -1), (1, 0), (1, 1)]
+
+
+def distance_pairs(calls, distances, log=devnull, against_self=False):
+    """
+    finds the pairs of calls which are equivalent by distance (see :func:`equivalent`). The calls are indexed in a grid
+    over the start positions of both breakpoints where the cell width is the largest distance allowed between paired
+    breakpoints. Only calls in the same or neighbouring cells need to be compared
+
+    Args:
+        calls (:class:`list` of :class:`BreakpointPair`): the calls to be paired
+        distances (dict): the maximum distance between paired breakpoints by call method
+        against_self (bool): pair calls from the same library
+
+    Returns:
+        generator of :class:`tuple` of :class:`int` and :class:`int`: the indices of each pair of equivalent calls
     """
-    distance_pairings = {}
-    break1_sorted = sorted(calls, key=lambda b: b.break1.start)
-    break2_sorted = sorted(calls, key=lambda b: b.break2.start)
     lowest_resolution = max([len(b.break1) for b in calls] + [len(b.break2) for b in calls] + [1])
-    max_distance = max(distances.values())
+    all_distances = {}
+    all_distances.update(PAIRING_DISTANCES.items())
+    all_distances.update(distances)
+    max_distance = max(all_distances.values())
     max_useq = max([len(c.untemplated_seq) if c.untemplated_seq else 0 for c in calls] + [0])
     max_distance += max_useq * 2
-    log('lowest_resolution', lowest_resolution, 'max_distance', max_distance, 'possible comparisons', len(break1_sorted) * len(break1_sorted), time_stamp=False)
+    # breakpoints within max_distance of each other must start within this distance
+    cell_size = max_distance + lowest_resolution
+    grid = _pairing_grid(calls, cell_size)
+    log(
+        'lowest_resolution', lowest_resolution, 'max_distance', max_distance, 'grid cells', len(grid),
+        'possible comparisons', len(calls) * len(calls), time_stamp=False)
+
+    def candidates():
+        for cell, indices in grid.items():
+            for pos, i in enumerate(indices):
+                for j in indices[pos + 1:]:
+                    yield i, j
+            for offset1, offset2 in _GRID_NEIGHBOURS:
+                neighbour = cell[:-2] + (cell[-2] + offset1, cell[-1] + offset2)
+                for i in indices:
+                    for j in grid.get(neighbour, []):
+                        yield i, j
 
     comparisons = 0
-    for i in range(0, len(break1_sorted)):
-        current = break1_sorted[i]
-        distance_pairings.setdefault(product_key(current), set())
-        for j in range(i + 1, len(break1_sorted)):
-            other = break1_sorted[j]
-
-            dist = abs(Interval.dist(current.break1, other.break1))
-            if dist > max_distance + lowest_resolution:
-                break
-            comparisons += 1
-            if not against_self and current.library == other.library and current.protocol == other.protocol:
-                continue  # do not pair within a single library
-            if equivalent(current, other, distances=distances):
-                distance_pairings[product_key(current)].add(product_key(other))
-                distance_pairings.setdefault(product_key(other), set()).add(product_key(current))
-        current = break2_sorted[i]
-        for j in range(i + 1, len(break2_sorted)):
-            other = break2_sorted[j]
-            dist = abs(Interval.dist(current.break2, other.break2))
-            if dist > max_distance + lowest_resolution:
-                break
-            comparisons += 1
-            if not against_self and current.library == other.library and current.protocol == other.protocol:
-                continue  # do not pair within a single library
-            if equivalent(current, other, distances=distances):
-                distance_pairings.setdefault(product_key(current), set()).add(product_key(other))
-                distance_pairings.setdefault(product_key(other), set()).add(product_key(current))
+    for i, j in candidates():
+        current = calls[i]
+        other = calls[j]
+        if any([
+            abs(current.break1.start - other.break1.start) > cell_size,
+            abs(current.break2.start - other.break2.start) > cell_size
+        ]):
+            continue
+        comparisons += 1
+        if not against_self and current.library == other.library and current.protocol == other.protocol:
+            continue  # do not pair within a single library
+        if equivalent(current, other, distances=distances):
+            yield i, j
     log('computed {} comparisons'.format(comparisons), time_stamp=False)
+
+
+def pair_by_distance(calls, distances, log=devnull, against_self=False):
+    """
+    for a set of input calls, pair by distance (see :func:`distance_pairs`)
+
+    Args:
+        calls (:class:`list` of :class:`BreakpointPair`): the calls to be paired
+        distances (dict): the maximum distance between paired breakpoints by call method
+        against_self (bool): pair calls from the same library
+
+    Returns:
+        :class:`dict` of :class:`str` and :class:`set` of :class:`str`: the product keys of the calls paired with each call
+    """
+    distance_pairings = {}
+    keys = [product_key(call) for call in calls]
+    for key in keys:
+        distance_pairings.setdefault(key, set())
+    for i, j in distance_pairs(calls, distances, log=log, against_self=against_self):
+        distance_pairings[keys[i]].add(keys[j])
+        distance_pairings[keys[j]].add(keys[i])
     return distance_pairings
 
 
@@ -230,7 +360,7 @@ def inferred_equivalent(event1, event2, reference_transcripts, distances=None):
         transcript1 = reference_transcripts.get(event1.data[COLUMNS.transcript1], None)
         if transcript1:
             try:
-                pbreaks = predict_transcriptome_breakpoint(event1.break1, transcript1)
+                pbreaks = PREDICTION_CACHE.predict(event1.break1, transcript1)
                 for breakpoint in pbreaks:
                     if abs(Interval.dist(breakpoint, event2.break1)) <= max_distance:
                         break1_match = True
@@ -240,7 +370,7 @@ def inferred_equivalent(event1, event2, reference_transcripts, distances=None):
         transcript2 = reference_transcripts.get(event1.data[COLUMNS.transcript2], None)
         if transcript2:
             try:
-                pbreaks = predict_transcriptome_breakpoint(event1.break2, transcript2)
+                pbreaks = PREDICTION_CACHE.predict(event1.break2, transcript2)
                 for breakpoint in pbreaks:
                     if abs(Interval.dist(breakpoint, event2.break2)) <= max_distance:
                         break2_match = True
@@ -256,3 +386,102 @@ def inferred_equivalent(event1, event2, reference_transcripts, distances=None):
         break2_match = True
 
     return break1_match and break2_match
+
+
+def _product_anchors(call, reference_transcripts):
+    """
+    the positions which an equivalent call (see :func:`inferred_equivalent`) must have a breakpoint near. For genome
+    calls this includes the transcriptome breakpoints predicted for the call
+
+    Returns:
+        :class:`tuple` of :class:`list` of :class:`Breakpoint`: the anchors for the first and second breakpoints
+    """
+    anchors = ([call.break1], [call.break2])
+    if call.data.get(COLUMNS.protocol) != PROTOCOL.GENOME:
+        return anchors
+    for breakpoint, transcript_column, breakpoint_anchors in [
+        (call.break1, COLUMNS.transcript1, anchors[0]),
+        (call.break2, COLUMNS.transcript2, anchors[1])
+    ]:
+        transcript = reference_transcripts.get(call.data.get(transcript_column), None)
+        if transcript:
+            try:
+                breakpoint_anchors.extend(PREDICTION_CACHE.predict(breakpoint, transcript))
+            except (NotSpecifiedError, AssertionError):
+                pass
+    return anchors
+
+
+def pair_by_product(calls, distances, reference_transcripts, log=devnull):
+    """
+    for a set of input calls, pair calls from different libraries which are expected to produce the same product (see
+    :func:`inferred_equivalent`). Rather than comparing every pair of calls, a signature is computed once per call and only
+    calls which share a signature are compared:
+
+    - calls with a fusion product are joined on the fusion sequence and coding coordinates
+    - all other calls are binned in a grid over their breakpoints and predicted transcriptome breakpoints where the cell
+      width is the largest pairing distance. These are compared against calls in the same or neighbouring cells
+
+    Args:
+        calls (:class:`list` of :class:`BreakpointPair`): the calls to be paired
+        distances (dict): the maximum distance between paired breakpoints by call method
+        reference_transcripts (:class:`dict` of :class:`str` and :class:`PreTranscript`): the transcripts by name
+
+    Returns:
+        :class:`dict` of :class:`str` and :class:`set` of :class:`str`: the product keys of the calls paired with each call
+    """
+    product_pairings = {}
+    candidates = set()
+
+    products = {}
+    has_product = []
+    for index, call in enumerate(calls):
+        has_product.append(bool(call.data[COLUMNS.fusion_sequence_fasta_id]))
+        if has_product[-1]:
+            products.setdefault((
+                call.data[COLUMNS.fusion_sequence_fasta_id],
+                call.data[COLUMNS.fusion_cdna_coding_start],
+                call.data[COLUMNS.fusion_cdna_coding_end]
+            ), []).append(index)
+    for indices in products.values():
+        candidates.update(itertools.combinations(indices, 2))
+
+    all_distances = {}
+    all_distances.update(PAIRING_DISTANCES.items())
+    if distances is not None:
+        all_distances.update(distances)
+    anchors = [_product_anchors(call, reference_transcripts) for call in calls]
+    lowest_resolution = max([len(b) for anchor in anchors for breakpoints in anchor for b in breakpoints] + [1])
+    cell_size = max(all_distances.values()) + lowest_resolution
+
+    def anchor_cells(index):
+        break1_anchors, break2_anchors = anchors[index]
+        return set([
+            (b1.chr, b2.chr, b1.start // cell_size, b2.start // cell_size)
+            for b1 in break1_anchors for b2 in break2_anchors
+        ])
+
+    grid = {}
+    for index in range(len(calls)):
+        for cell in anchor_cells(index):
+            grid.setdefault(cell, []).append(index)
+    for index in range(len(calls)):
+        for chr1, chr2, cell1, cell2 in anchor_cells(index):
+            for offset1, offset2 in itertools.product([-1, 0, 1], repeat=2):
+                for other in grid.get((chr1, chr2, cell1 + offset1, cell2 + offset2), []):
+                    # calls which both have a fusion product are only compared by product
+                    if other > index and not (has_product[index] and has_product[other]):
+                        candidates.add((index, other))
+
+    comparisons = 0
+    for index, other in candidates:
+        current = calls[index]
+        other = calls[other]
+        if current.library == other.library:
+            continue  # do not pair within a single library
+        comparisons += 1
+        if inferred_equivalent(current, other, reference_transcripts=reference_transcripts, distances=distances):
+            product_pairings.setdefault(product_key(current), set()).add(product_key(other))
+            product_pairings.setdefault(product_key(other), set()).add(product_key(current))
+    log('computed {} comparisons of {} possible'.format(comparisons, len(calls) * (len(calls) - 1) // 2), time_stamp=False)
+    return product_pairings
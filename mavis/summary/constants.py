@@ -1,3 +1,5 @@
+import tab
+
 from ..constants import MavisNamespace, float_fraction
 from ..util import WeakMavisNamespace
 
@@ -15,6 +17,7 @@ HOMOPOLYMER_MIN_LENGTH = 3
 - :term:`filter_protein_synon`
 - :term:`filter_min_complexity`
 - :term:`filter_trans_homopolymers`
+- :term:`summary_streaming`
 """
 DEFAULTS.add('filter_min_remapped_reads', 5, defn='Minimum number of remapped reads for a call by contig')
 DEFAULTS.add('filter_min_spanning_reads', 5, defn='Minimum number of spanning reads for a call by spanning reads')
@@ -30,6 +33,11 @@ DEFAULTS.add(
 DEFAULTS.add(
     'filter_min_complexity', 0.2, cast_type=float_fraction,
     defn='Filter event calls based on call sequence complexity')
+DEFAULTS.add(
+    'summary_streaming', False, cast_type=tab.cast_boolean,
+    defn='flag to indicate if the summary should be computed one library and chromosome pair at a time rather than '
+    'loading all the calls. Limits the memory used to the largest group but requires the rows of each group to be '
+    'contiguous in the inputs (as written by the pairing step)')
 
 
 PAIRING_STATE = MavisNamespace(
@@ -1,15 +1,76 @@
 from functools import partial
+import io
+import json
 import os
 import re
+import tempfile
 import time
 
 import tab
 
 from .constants import DEFAULTS, HOMOPOLYMER_MIN_LENGTH
-from .summary import annotate_dgv, filter_by_annotations, filter_by_call_method, filter_by_evidence, get_pairing_state, group_by_distance
-from ..constants import CALL_METHOD, COLUMNS, PROTOCOL, SVTYPE
+from .summary import annotate_dgv, filter_by_annotations, filter_by_call_method, filter_by_evidence, get_pairing_state, group_by_distance, index_dgv_regions
+from ..constants import CALL_METHOD, COLUMNS, PROTOCOL, sort_columns, SVTYPE
 from ..pairing.constants import DEFAULTS as PAIRING_DEFAULTS
-from ..util import generate_complete_stamp, log, output_tabbed_file, read_inputs, soft_cast
+from ..util import bash_expands, generate_complete_stamp, log, output_tabbed_file, read_bpp_from_input_file, read_inputs, soft_cast
+
+
+OUTPUT_COLUMNS = {
+    COLUMNS.annotation_id,
+    COLUMNS.product_id,
+    COLUMNS.break1_chromosome,
+    COLUMNS.break1_homologous_seq,
+    COLUMNS.break1_orientation,
+    COLUMNS.break1_position_end,
+    COLUMNS.break1_position_start,
+    COLUMNS.break2_chromosome,
+    COLUMNS.break2_homologous_seq,
+    COLUMNS.break2_orientation,
+    COLUMNS.break2_position_end,
+    COLUMNS.break2_position_start,
+    COLUMNS.contig_seq,
+    COLUMNS.event_type,
+    COLUMNS.fusion_cdna_coding_end,
+    COLUMNS.fusion_cdna_coding_start,
+    COLUMNS.fusion_protein_hgvs,
+    COLUMNS.fusion_mapped_domains,
+    COLUMNS.fusion_splicing_pattern,
+    COLUMNS.gene1,
+    COLUMNS.gene1_direction,
+    COLUMNS.gene2,
+    COLUMNS.gene2_direction,
+    COLUMNS.gene_product_type,
+    COLUMNS.genes_encompassed,
+    COLUMNS.library,
+    COLUMNS.protocol,
+    COLUMNS.transcript1,
+    COLUMNS.transcript2,
+    COLUMNS.untemplated_seq,
+    COLUMNS.tools,
+    COLUMNS.break1_strand,
+    COLUMNS.break2_strand,
+    COLUMNS.gene1_aliases,
+    COLUMNS.gene2_aliases,
+    COLUMNS.annotation_figure,
+    COLUMNS.exon_last_5prime,
+    COLUMNS.exon_first_3prime,
+
+    # For debugging
+    COLUMNS.call_method,
+    COLUMNS.flanking_pairs,
+    COLUMNS.break1_split_reads,
+    COLUMNS.break2_split_reads,
+    COLUMNS.linking_split_reads,
+    COLUMNS.contig_alignment_score,
+    COLUMNS.spanning_reads,
+    COLUMNS.contig_remapped_reads,
+    COLUMNS.tracking_id,
+    COLUMNS.supplementary_call,
+    COLUMNS.protein_synon,
+    COLUMNS.cdna_synon,
+    COLUMNS.net_size,
+    COLUMNS.assumed_untemplated,
+    'dgv'}
 
 
 def soft_cast_null(value):
@@ -19,36 +80,11 @@ def soft_cast_null(value):
         return value
 
 
-def main(
-    inputs, output, annotations,
-    dgv_annotation=None,
-    filter_cdna_synon=DEFAULTS.filter_cdna_synon,
-    filter_protein_synon=DEFAULTS.filter_protein_synon,
-    filter_min_remapped_reads=DEFAULTS.filter_min_remapped_reads,
-    filter_min_spanning_reads=DEFAULTS.filter_min_spanning_reads,
-    filter_min_flanking_reads=DEFAULTS.filter_min_flanking_reads,
-    filter_min_split_reads=DEFAULTS.filter_min_split_reads,
-    filter_trans_homopolymers=DEFAULTS.filter_trans_homopolymers,
-    filter_min_linking_split_reads=DEFAULTS.filter_min_linking_split_reads,
-    filter_min_complexity=DEFAULTS.filter_min_complexity,
-    flanking_call_distance=PAIRING_DEFAULTS.flanking_call_distance,
-    split_call_distance=PAIRING_DEFAULTS.split_call_distance,
-    contig_call_distance=PAIRING_DEFAULTS.contig_call_distance,
-    spanning_call_distance=PAIRING_DEFAULTS.spanning_call_distance,
-    start_time=int(time.time()),
-    **kwargs
-):
-    # pairing threshold parameters to be defined in config file
-    distances = {
-        CALL_METHOD.FLANK: flanking_call_distance,
-        CALL_METHOD.SPLIT: split_call_distance,
-        CALL_METHOD.CONTIG: contig_call_distance,
-        CALL_METHOD.SPAN: spanning_call_distance
-    }
-
-    bpps = []
-    bpps.extend(read_inputs(
-        inputs,
+def _read_arguments():
+    """
+    the arguments used in reading the summary input files (a new copy each time since the reader updates them)
+    """
+    return dict(
         require=[
             COLUMNS.event_type,
             COLUMNS.product_id,
@@ -109,17 +145,93 @@ def main(
             COLUMNS.protein_synon: soft_cast_null,
             COLUMNS.cdna_synon: soft_cast_null
         }
-    ))
-    # load all transcripts
-    reference_transcripts = dict()
-    best_transcripts = dict()
-    for chr, genes in annotations.items():
-        for gene in genes:
-            for t in gene.transcripts:
-                reference_transcripts[t.name] = t
-                if t.is_best_transcript:
-                    best_transcripts[t.name] = t
+    )
+
+
+def _read_call_groups(inputs):
+    """
+    reads the calls from the input files one group at a time, where a group is a run of consecutive rows with the same
+    library and chromosome pair. Only the rows of the current group are held in memory
+
+    Args:
+        inputs (list of str): paths (or glob expressions) of the input files. The rows of each group must be contiguous
+
+    Returns:
+        generator of :class:`list` of :class:`~mavis.breakpoint.BreakpointPair`: the calls for each group
+
+    Raises:
+        AssertionError: if the rows for a group are not contiguous in the inputs
+    """
+    columns = [COLUMNS.library, COLUMNS.break1_chromosome, COLUMNS.break2_chromosome]
+    groups_read = set()
+
+    def read_group(header, lines, rows_read):
+        kwargs = _read_arguments()
+        kwargs['require'].append(COLUMNS.protocol)
+        kwargs['in_'] = {COLUMNS.protocol: PROTOCOL.values()}
+        bpps = read_bpp_from_input_file(io.StringIO(header + ''.join(lines)), **kwargs)
+        for bpp in bpps:  # line numbers relative to the file rather than the group
+            bpp.data['line_no'] += rows_read
+        return bpps
+
+    for expr in inputs:
+        for finput in bash_expands(expr):
+            log('loading:', finput)
+            header = None
+            group = None
+            lines = []
+            rows_read = 0
+            with open(finput, 'r') as fh:
+                for line in fh:
+                    if header is None:
+                        if re.match(r'^\s*##', line):  # skip comment lines
+                            continue
+                        header = line
+                        header_columns = re.sub(r'(^#)|([\r\n\s]*$)', '', line).split('\t')
+                        for col in columns:
+                            if col not in header_columns:
+                                raise KeyError('cannot group: column not found in the input header', col, finput)
+                        indices = [header_columns.index(col) for col in columns]
+                        continue
+                    row = re.sub(r'[\r\n]*$', '', line).split('\t')
+                    library, chr1, chr2 = [row[i] if i < len(row) else None for i in indices]
+                    key = (library, re.sub('^chr', '', chr1 or ''), re.sub('^chr', '', chr2 or ''))
+                    if key != group:
+                        if lines:
+                            yield read_group(header, lines, rows_read)
+                            rows_read += len(lines)
+                        if key in groups_read:
+                            raise AssertionError(
+                                'streaming summary requires the rows for each library and chromosome pair to be '
+                                'contiguous in the inputs', key, finput)
+                        groups_read.add(key)
+                        group = key
+                        lines = []
+                    lines.append(line)
+            if header is None:
+                log('ignoring empty file:', finput)
+            elif lines:
+                yield read_group(header, lines, rows_read)
+
+
+def _filter_calls(
+    bpps,
+    filter_cdna_synon=DEFAULTS.filter_cdna_synon,
+    filter_protein_synon=DEFAULTS.filter_protein_synon,
+    filter_min_remapped_reads=DEFAULTS.filter_min_remapped_reads,
+    filter_min_spanning_reads=DEFAULTS.filter_min_spanning_reads,
+    filter_min_flanking_reads=DEFAULTS.filter_min_flanking_reads,
+    filter_min_split_reads=DEFAULTS.filter_min_split_reads,
+    filter_min_linking_split_reads=DEFAULTS.filter_min_linking_split_reads,
+    filter_min_complexity=DEFAULTS.filter_min_complexity
+):
+    """
+    applies the filters which are evaluated for each call on its own
 
+    Returns:
+        tuple of :class:`list` of :class:`~mavis.breakpoint.BreakpointPair`: the calls which passed and the calls which
+        were filtered (the reason is given in the filter comment column)
+    """
     filtered_pairs = []
     temp = []  # store the bpps while we filter out
 
@@ -168,192 +280,306 @@ def main(
     for pair in filtered:
         pair.data[COLUMNS.filter_comment] = 'low evidence'
         filtered_pairs.append(pair)
+    return bpps, filtered_pairs
 
-    bpps_by_library = {}  # split the input pairs by library
-    libraries = {}
-    for bpp in bpps:
-        bpps_by_library.setdefault(bpp.library, []).append(bpp)
-        libraries[bpp.library] = (bpp.protocol, bpp.disease_status)
 
+def _collapse_calls(bpps, best_transcripts, distances):
+    """
+    collapses the calls for a single library. Calls for different chromosome pairs are never collapsed together so
+    the calls may also be given in smaller groups (by chromosome pair)
+
+    Returns:
+        tuple of :class:`list` of :class:`~mavis.breakpoint.BreakpointPair`: the calls which were kept and the calls
+        which were collapsed into another call
+    """
+    filtered_pairs = []
     # collapse identical calls with different call methods
-    for library in bpps_by_library:
-        uncollapsed = dict()
-        for bpp in bpps_by_library[library]:
-            group = (
-                bpp,
-                bpp.transcript1,
-                bpp.transcript2,
-                bpp.fusion_sequence_fasta_id,
-                bpp.fusion_splicing_pattern,
-                bpp.fusion_cdna_coding_start,
-                bpp.fusion_cdna_coding_end
-            )
-            uncollapsed.setdefault(group, []).append(bpp)
-        collapsed = []
-        for bpp_set in uncollapsed.values():
-            result, removed = filter_by_call_method(bpp_set)
-            collapsed.extend(result)
-            for bpp in removed:
-                bpp.data[COLUMNS.filter_comment] = 'collapsed into another call'
-                filtered_pairs.append(bpp)
-        bpps_by_library[library] = collapsed
+    uncollapsed = dict()
+    for bpp in bpps:
+        group = (
+            bpp,
+            bpp.transcript1,
+            bpp.transcript2,
+            bpp.fusion_sequence_fasta_id,
+            bpp.fusion_splicing_pattern,
+            bpp.fusion_cdna_coding_start,
+            bpp.fusion_cdna_coding_end
+        )
+        uncollapsed.setdefault(group, []).append(bpp)
+    collapsed = []
+    for bpp_set in uncollapsed.values():
+        result, removed = filter_by_call_method(bpp_set)
+        collapsed.extend(result)
+        for bpp in removed:
+            bpp.data[COLUMNS.filter_comment] = 'collapsed into another call'
+            filtered_pairs.append(bpp)
+    bpps = collapsed
 
     # collapse similar annotations for breakpoints with the same call position
-    for library in bpps_by_library:
-        uncollapsed = dict()
-        for bpp in bpps_by_library[library]:
-            uncollapsed.setdefault(bpp, []).append(bpp)
-
-        collapsed = []
-        for bpp_set in uncollapsed.values():
-            result, removed = filter_by_annotations(bpp_set, best_transcripts)
-            collapsed.extend(result)
-            for bpp in removed:
-                bpp.data[COLUMNS.filter_comment] = 'collapsed into another call'
-                filtered_pairs.append(bpp)
-        bpps_by_library[library] = collapsed
+    uncollapsed = dict()
+    for bpp in bpps:
+        uncollapsed.setdefault(bpp, []).append(bpp)
+
+    collapsed = []
+    for bpp_set in uncollapsed.values():
+        result, removed = filter_by_annotations(bpp_set, best_transcripts)
+        collapsed.extend(result)
+        for bpp in removed:
+            bpp.data[COLUMNS.filter_comment] = 'collapsed into another call'
+            filtered_pairs.append(bpp)
+    bpps = collapsed
 
     # group close split read calls with identical annotations
+    uncollapsed = dict()
+    for bpp in bpps:
+        uncollapsed.setdefault((
+            bpp.event_type,
+            bpp.break1.chr, bpp.break2.chr,
+            bpp.break1.orient, bpp.break2.orient,
+            bpp.opposing_strands,
+            bpp.break1.strand, bpp.break2.strand,
+            bpp.transcript1 if bpp.gene1 else None,
+            bpp.transcript2 if bpp.gene2 else None,
+            bpp.fusion_sequence_fasta_id,  # id is a hash of the sequence
+            bpp.fusion_cdna_coding_start,
+            bpp.fusion_cdna_coding_end
+        ), []).append(bpp)
+
+    collapsed = []
+    for bpp_set in uncollapsed.values():
+        collapsed.extend([b for b in bpp_set if b.call_method != CALL_METHOD.SPLIT])
+        grouped, removed = group_by_distance([b for b in bpp_set if b.call_method == CALL_METHOD.SPLIT], distances)
+        collapsed.extend(grouped)
+        for bpp in removed:
+            bpp.data[COLUMNS.filter_comment] = 'collapsed into another call'
+            filtered_pairs.append(bpp)
+    return collapsed, filtered_pairs
+
+
+def _add_pairing_states(row, libraries):
+    """
+    adds a column to the row for the pairing state of the call with each library
+
+    Args:
+        row (dict): the row (or data) for the call
+        libraries (dict of str and tuple): mapping of library names to their protocol and disease status
+
+    Returns:
+        :class:`list` of :class:`str`: the names of the columns added
+    """
+    paired_libraries = set()
+    for product_id in row[COLUMNS.pairing].split(';'):
+        for lib in libraries:
+            if product_id.startswith(lib):
+                paired_libraries.add(lib)
+    inferred_paired_libraries = set()
+    for product_id in row[COLUMNS.inferred_pairing].split(';'):
+        for lib in libraries:
+            if product_id.startswith(lib):
+                inferred_paired_libraries.add(lib)
+    column_names = []
+    for other_lib, (other_protocol, other_disease_state) in libraries.items():
+        column_name = '{}_{}_{}'.format(other_lib, other_disease_state, other_protocol)
+        if other_lib != row[COLUMNS.library]:
+            pairing_state = get_pairing_state(
+                *libraries[row[COLUMNS.library]],
+                other_protocol=other_protocol, other_disease_state=other_disease_state,
+                is_matched=other_lib in paired_libraries,
+                inferred_is_matched=other_lib in inferred_paired_libraries)
+        else:
+            pairing_state = 'Not Applicable'
+        row[column_name] = pairing_state
+        column_names.append(column_name)
+    return column_names
+
+
+def _is_coding_variant(row):
+    """
+    checks if a flattened row should be reported in the non-synonymous coding variants output
+    """
+    return all([
+        not row.get(COLUMNS.protein_synon, ''),
+        not row.get(COLUMNS.cdna_synon, ''),
+        str(row.get(COLUMNS.fusion_cdna_coding_start, None)) != 'None',
+        str(row.get(COLUMNS.supplementary_call, False)) != 'True'
+    ])
+
+
+def _summary_filename(output, libraries):
+    return os.path.join(output, 'mavis_summary_all_{}.tab'.format('_'.join(sorted(list(libraries)))))
+
+
+def _coding_variants_filename(output, library):
+    return os.path.join(output, 'mavis_summary_{}_non-synonymous_coding_variants.tab'.format(library))
+
+
+def _stream_summary(
+    inputs, output, best_transcripts, distances, filter_kwargs, dgv_annotation=None, dgv_index=None
+):
+    """
+    summarizes the calls one group (library and chromosome pair) at a time. The rows are spilled to temporary files as
+    each group is completed and written to the final outputs once the libraries (and therefore the pairing state
+    columns) are known
+
+    Returns:
+        int: the number of rows written to the summary file
+    """
+    libraries = {}
+    filtered_header = set()
+    with tempfile.TemporaryFile('w+', dir=output) as rows_fh, tempfile.TemporaryFile('w+', dir=output) as filtered_fh:
+        for bpps in _read_call_groups(inputs):
+            bpps, filtered_pairs = _filter_calls(bpps, **filter_kwargs)
+            for bpp in bpps:
+                libraries[bpp.library] = (bpp.protocol, bpp.disease_status)
+            bpps, collapsed = _collapse_calls(bpps, best_transcripts, distances)
+            filtered_pairs.extend(collapsed)
+            if dgv_annotation:
+                annotate_dgv(bpps, dgv_annotation, distance=10, dgv_index=dgv_index)
+            for bpp in bpps:
+                bpp.data.setdefault(COLUMNS.inferred_pairing, '')
+                bpp.data.setdefault(COLUMNS.pairing, '')
+                row = bpp.flatten()
+                record = {col: str(row.get(col, None)) for col in OUTPUT_COLUMNS}
+                record[COLUMNS.pairing] = row[COLUMNS.pairing]
+                record[COLUMNS.inferred_pairing] = row[COLUMNS.inferred_pairing]
+                rows_fh.write(json.dumps([_is_coding_variant(row), record]) + '\n')
+            for bpp in filtered_pairs:
+                row = bpp.flatten()
+                filtered_header.update(row.keys())
+                filtered_fh.write(json.dumps({col: str(value) for col, value in row.items()}) + '\n')
+
+        output_columns = set(OUTPUT_COLUMNS)
+        output_columns.update([
+            '{}_{}_{}'.format(lib, disease_status, protocol) for lib, (protocol, disease_status) in libraries.items()
+        ])
+        output_columns = sort_columns(output_columns)
+        coding_fhs = {lib: open(_coding_variants_filename(output, lib), 'w') for lib in libraries}
+        row_count = 0
+        try:
+            fname = _summary_filename(output, libraries)
+            log('writing:', fname)
+            with open(fname, 'w') as fh:
+                for handle in [fh] + list(coding_fhs.values()):
+                    handle.write('#' + '\t'.join(output_columns) + '\n')
+                rows_fh.seek(0)
+                for line in rows_fh:
+                    is_coding, row = json.loads(line)
+                    _add_pairing_states(row, libraries)
+                    line = '\t'.join([row.get(c, 'None') for c in output_columns]) + '\n'
+                    fh.write(line)
+                    row_count += 1
+                    if is_coding:
+                        coding_fhs[row[COLUMNS.library]].write(line)
+            log('wrote {} structural variants to {}'.format(row_count, fname))
+        finally:
+            for handle in coding_fhs.values():
+                handle.close()
+
+        filtered_header = sort_columns(filtered_header)
+        fname = os.path.join(output, 'filtered_pairs.tab')
+        log('writing:', fname)
+        with open(fname, 'w') as fh:
+            fh.write('#' + '\t'.join(filtered_header) + '\n')
+            filtered_fh.seek(0)
+            for line in filtered_fh:
+                row = json.loads(line)
+                fh.write('\t'.join([row.get(c, 'None') for c in filtered_header]) + '\n')
+    return row_count
+
+
+def main(
+    inputs, output, annotations,
+    dgv_annotation=None,
+    filter_cdna_synon=DEFAULTS.filter_cdna_synon,
+    filter_protein_synon=DEFAULTS.filter_protein_synon,
+    filter_min_remapped_reads=DEFAULTS.filter_min_remapped_reads,
+    filter_min_spanning_reads=DEFAULTS.filter_min_spanning_reads,
+    filter_min_flanking_reads=DEFAULTS.filter_min_flanking_reads,
+    filter_min_split_reads=DEFAULTS.filter_min_split_reads,
+    filter_trans_homopolymers=DEFAULTS.filter_trans_homopolymers,
+    filter_min_linking_split_reads=DEFAULTS.filter_min_linking_split_reads,
+    filter_min_complexity=DEFAULTS.filter_min_complexity,
+    flanking_call_distance=PAIRING_DEFAULTS.flanking_call_distance,
+    split_call_distance=PAIRING_DEFAULTS.split_call_distance,
+    contig_call_distance=PAIRING_DEFAULTS.contig_call_distance,
+    spanning_call_distance=PAIRING_DEFAULTS.spanning_call_distance,
+    summary_streaming=DEFAULTS.summary_streaming,
+    start_time=int(time.time()),
+    **kwargs
+):
+    # pairing threshold parameters to be defined in config file
+    distances = {
+        CALL_METHOD.FLANK: flanking_call_distance,
+        CALL_METHOD.SPLIT: split_call_distance,
+        CALL_METHOD.CONTIG: contig_call_distance,
+        CALL_METHOD.SPAN: spanning_call_distance
+    }
+    filter_kwargs = dict(
+        filter_cdna_synon=filter_cdna_synon,
+        filter_protein_synon=filter_protein_synon,
+        filter_min_remapped_reads=filter_min_remapped_reads,
+        filter_min_spanning_reads=filter_min_spanning_reads,
+        filter_min_flanking_reads=filter_min_flanking_reads,
+        filter_min_split_reads=filter_min_split_reads,
+        filter_min_linking_split_reads=filter_min_linking_split_reads,
+        filter_min_complexity=filter_min_complexity
+    )
+
+    # load all transcripts
+    reference_transcripts = dict()
+    best_transcripts = dict()
+    for chr, genes in annotations.items():
+        for gene in genes:
+            for t in gene.transcripts:
+                reference_transcripts[t.name] = t
+                if t.is_best_transcript:
+                    best_transcripts[t.name] = t
+    dgv_index = index_dgv_regions(dgv_annotation) if dgv_annotation else None
+
+    if summary_streaming:
+        _stream_summary(
+            inputs, output, best_transcripts, distances, filter_kwargs,
+            dgv_annotation=dgv_annotation, dgv_index=dgv_index)
+        generate_complete_stamp(output, log, start_time=start_time)
+        return
+
+    bpps = read_inputs(inputs, **_read_arguments())
+    bpps, filtered_pairs = _filter_calls(bpps, **filter_kwargs)
+
+    bpps_by_library = {}  # split the input pairs by library
+    libraries = {}
+    for bpp in bpps:
+        bpps_by_library.setdefault(bpp.library, []).append(bpp)
+        libraries[bpp.library] = (bpp.protocol, bpp.disease_status)
+
     for library in bpps_by_library:
-        uncollapsed = dict()
-        for bpp in bpps_by_library[library]:
-            uncollapsed.setdefault((
-                bpp.event_type,
-                bpp.break1.chr, bpp.break2.chr,
-                bpp.break1.orient, bpp.break2.orient,
-                bpp.opposing_strands,
-                bpp.break1.strand, bpp.break2.strand,
-                bpp.transcript1 if bpp.gene1 else None,
-                bpp.transcript2 if bpp.gene2 else None,
-                bpp.fusion_sequence_fasta_id,  # id is a hash of the sequence
-                bpp.fusion_cdna_coding_start,
-                bpp.fusion_cdna_coding_end
-            ), []).append(bpp)
-
-        collapsed = []
-        for bpp_set in uncollapsed.values():
-            collapsed.extend([b for b in bpp_set if b.call_method != CALL_METHOD.SPLIT])
-            grouped, removed = group_by_distance([b for b in bpp_set if b.call_method == CALL_METHOD.SPLIT], distances)
-            collapsed.extend(grouped)
-            for bpp in removed:
-                bpp.data[COLUMNS.filter_comment] = 'collapsed into another call'
-                filtered_pairs.append(bpp)
-        bpps_by_library[library] = collapsed
+        bpps_by_library[library], collapsed = _collapse_calls(bpps_by_library[library], best_transcripts, distances)
+        filtered_pairs.extend(collapsed)
 
     # TODO: give an evidence score to the events based on call method and evidence levels
     # TODO: report the pairings so that germline and somatic etc can be determined properly
-    output_columns = {
-        COLUMNS.annotation_id,
-        COLUMNS.product_id,
-        COLUMNS.break1_chromosome,
-        COLUMNS.break1_homologous_seq,
-        COLUMNS.break1_orientation,
-        COLUMNS.break1_position_end,
-        COLUMNS.break1_position_start,
-        COLUMNS.break2_chromosome,
-        COLUMNS.break2_homologous_seq,
-        COLUMNS.break2_orientation,
-        COLUMNS.break2_position_end,
-        COLUMNS.break2_position_start,
-        COLUMNS.contig_seq,
-        COLUMNS.event_type,
-        COLUMNS.fusion_cdna_coding_end,
-        COLUMNS.fusion_cdna_coding_start,
-        COLUMNS.fusion_protein_hgvs,
-        COLUMNS.fusion_mapped_domains,
-        COLUMNS.fusion_splicing_pattern,
-        COLUMNS.gene1,
-        COLUMNS.gene1_direction,
-        COLUMNS.gene2,
-        COLUMNS.gene2_direction,
-        COLUMNS.gene_product_type,
-        COLUMNS.genes_encompassed,
-        COLUMNS.library,
-        COLUMNS.protocol,
-        COLUMNS.transcript1,
-        COLUMNS.transcript2,
-        COLUMNS.untemplated_seq,
-        COLUMNS.tools,
-        COLUMNS.break1_strand,
-        COLUMNS.break2_strand,
-        COLUMNS.gene1_aliases,
-        COLUMNS.gene2_aliases,
-        COLUMNS.annotation_figure,
-        COLUMNS.exon_last_5prime,
-        COLUMNS.exon_first_3prime,
-
-        # For debugging
-        COLUMNS.call_method,
-        COLUMNS.flanking_pairs,
-        COLUMNS.break1_split_reads,
-        COLUMNS.break2_split_reads,
-        COLUMNS.linking_split_reads,
-        COLUMNS.contig_alignment_score,
-        COLUMNS.spanning_reads,
-        COLUMNS.contig_remapped_reads,
-        COLUMNS.tracking_id,
-        COLUMNS.supplementary_call,
-        COLUMNS.protein_synon,
-        COLUMNS.cdna_synon,
-        COLUMNS.net_size,
-        COLUMNS.assumed_untemplated,
-        'dgv'}
+    output_columns = set(OUTPUT_COLUMNS)
 
     rows = []
     for lib in bpps_by_library:
         log('annotating dgv for', lib)
         if dgv_annotation:
-            annotate_dgv(bpps_by_library[lib], dgv_annotation, distance=10)  # TODO make distance a parameter
+            # TODO make distance a parameter
+            annotate_dgv(bpps_by_library[lib], dgv_annotation, distance=10, dgv_index=dgv_index)
         log('adding pairing states for', lib)
         for row in bpps_by_library[lib]:
             # in case no pairing was done, add default (applicable to single library summaries)
             row.data.setdefault(COLUMNS.inferred_pairing, '')
             row.data.setdefault(COLUMNS.pairing, '')
             row.data.setdefault(COLUMNS.library, lib)
-            # filter pairing ids based on what is still kept?
-            paired_libraries = set()
-            for product_id in row.pairing.split(';'):
-                for lib in bpps_by_library:
-                    if product_id.startswith(lib):
-                        paired_libraries.add(lib)
-            inferred_paired_libraries = set()
-            for product_id in row.inferred_pairing.split(';'):
-                for lib in bpps_by_library:
-                    if product_id.startswith(lib):
-                        inferred_paired_libraries.add(lib)
-            for other_lib, (other_protocol, other_disease_state) in libraries.items():
-                column_name = '{}_{}_{}'.format(other_lib, other_disease_state, other_protocol)
-                if other_lib != row.library:
-                    pairing_state = get_pairing_state(
-                        *libraries[row.library],
-                        other_protocol=other_protocol, other_disease_state=other_disease_state,
-                        is_matched=other_lib in paired_libraries,
-                        inferred_is_matched=other_lib in inferred_paired_libraries)
-                else:
-                    pairing_state = 'Not Applicable'
-                row.data[column_name] = pairing_state
-                output_columns.add(column_name)
-
+            output_columns.update(_add_pairing_states(row.data, libraries))
             rows.append(row.flatten())
-    fname = os.path.join(
-        output,
-        'mavis_summary_all_{}.tab'.format('_'.join(sorted(list(libraries.keys()))))
-    )
+    fname = _summary_filename(output, libraries)
     output_tabbed_file(rows, fname, header=output_columns)
     log('wrote {} structural variants to {}'.format(len(rows), fname))
     output_tabbed_file(filtered_pairs, os.path.join(output, 'filtered_pairs.tab'))
     # output by library non-synon protein-product
     for lib in bpps_by_library:
-        filename = os.path.join(output, 'mavis_summary_{}_non-synonymous_coding_variants.tab'.format(lib))
-        lib_rows = []
-        for row in rows:
-            if all([
-                not row.get(COLUMNS.protein_synon, ''),
-                not row.get(COLUMNS.cdna_synon, ''),
-                str(row.get(COLUMNS.fusion_cdna_coding_start, None)) != 'None',
-                row[COLUMNS.library] == lib,
-                str(row.get(COLUMNS.supplementary_call, False)) != 'True'
-            ]):
-                lib_rows.append(row)
-        output_tabbed_file(lib_rows, filename, header=output_columns)
+        lib_rows = [row for row in rows if row[COLUMNS.library] == lib and _is_coding_variant(row)]
+        output_tabbed_file(lib_rows, _coding_variants_filename(output, lib), header=output_columns)
     generate_complete_stamp(output, log, start_time=start_time)
@@ -1,9 +1,10 @@
+import bisect
+
 from .constants import PAIRING_STATE
 from ..breakpoint import Breakpoint, BreakpointPair
 from ..constants import CALL_METHOD, COLUMNS, DISEASE_STATUS, PROTOCOL, SVTYPE
 from ..interval import Interval
-from ..pairing.pairing import pair_by_distance, product_key
-from ..util import get_connected_components
+from ..pairing.pairing import distance_pairs, product_key
 
 
 def filter_by_annotations(bpp_list, best_transcripts):
@@ -142,28 +143,61 @@ def group_events(events):
 
 def group_by_distance(calls, distances):
     """
-    groups a set of calls based on their proximity. Returns a new list of calls where close calls have been merged
+    groups a set of calls based on their proximity. Returns a new list of calls where close calls have been merged.
+    Calls are merged with all calls they are transitively equivalent to (by distance) using a union-find over their
+    product keys
     """
-    mapping = {}
-    for call in calls:
-        mapping.setdefault(product_key(call), []).append(call)
-    pairing = pair_by_distance(calls, distances, against_self=True)
+    keys = [product_key(call) for call in calls]
+    parents = {key: key for key in keys}
+
+    def find(key):
+        while parents[key] != key:
+            parents[key] = parents[parents[key]]
+            key = parents[key]
+        return key
+
+    for i, j in distance_pairs(calls, distances, against_self=True):
+        root1 = find(keys[i])
+        root2 = find(keys[j])
+        if root1 != root2:
+            parents[root2] = root1
+    # collect the components in the order they are first seen
+    components = {}
+    for key, call in zip(keys, calls):
+        component_keys, component_calls = components.setdefault(find(key), (set(), []))
+        component_keys.add(key)
+        component_calls.append(call)
     # merge all the 'close-enough' pairs
     grouped_calls = []
     removed_calls = []
-    for component in get_connected_components(pairing):
-        if len(component) == 1:
-            grouped_calls.extend(mapping[component.pop()])
+    for component_keys, pairs in components.values():
+        if len(component_keys) == 1:
+            grouped_calls.extend(pairs)
         else:
-            pairs = []
-            for key in component:
-                pairs.extend(mapping[key])
             grouped_calls.append(group_events(pairs))
             removed_calls.extend(pairs)
     return grouped_calls, removed_calls
 
 
-def annotate_dgv(bpps, dgv_regions_by_reference_name, distance=0):
+def index_dgv_regions(dgv_regions_by_reference_name):
+    """
+    sorts the dgv regions for each chromosome by start position so that they can be searched by bisection
+
+    Args:
+        dgv_regions_by_reference_name (dict) : the dgv reference regions file loaded by load_masking_regions
+
+    Returns:
+        :class:`dict` of :class:`str` and :class:`tuple`: the sorted start positions and the regions in the same order by
+        chromosome
+    """
+    index = {}
+    for chrom, regions in dgv_regions_by_reference_name.items():
+        regions = sorted(regions, key=lambda x: x.start)
+        index[chrom] = ([r.start for r in regions], regions)
+    return index
+
+
+def annotate_dgv(bpps, dgv_regions_by_reference_name, distance=0, dgv_index=None):
     """
     given a list of bpps and a dgv reference, annotate the events that are within the set distance of both breakpoints
 
@@ -171,19 +205,19 @@ def annotate_dgv(bpps, dgv_regions_by_reference_name, distance=0):
         bpps (list) : the list of BreakpointPair objects
         dgv_regions_by_reference_name (dict) : the dgv reference regions file loaded by load_masking_regions
         distance (int) : the minimum distance required to match a dgv event with a breakpoint
+        dgv_index (dict): the regions indexed by :func:`index_dgv_regions`. Computed from the regions if not given
     """
-    for chrom in dgv_regions_by_reference_name:
-        dgv_regions_by_reference_name[chrom] = sorted(dgv_regions_by_reference_name[chrom], key=lambda x: x.start)
-
-    lowest_resolution = max([len(b.break1) for b in bpps])  # only need start res
+    if dgv_index is None:
+        dgv_index = index_dgv_regions(dgv_regions_by_reference_name)
 
     # only look at the bpps that dgv events could pair to, Intrachromosomal
-    for bpp in [b for b in bpps if not b.interchromosomal and b.break1.chr in dgv_regions_by_reference_name]:
-        for dgv_region in dgv_regions_by_reference_name[bpp.break1.chr]:
-            dist = abs(Interval.dist(Interval(dgv_region.start), bpp.break1))
-            if dist > lowest_resolution + distance:
-                break
-            elif dist > distance or abs(Interval.dist(Interval(dgv_region.end), bpp.break2)) > distance:
+    for bpp in [b for b in bpps if not b.interchromosomal and b.break1.chr in dgv_index]:
+        starts, regions = dgv_index[bpp.break1.chr]
+        # regions which start within the distance of the first breakpoint
+        first = bisect.bisect_left(starts, bpp.break1.start - distance)
+        last = bisect.bisect_right(starts, bpp.break1.end + distance)
+        for dgv_region in regions[first:last]:
+            if abs(Interval.dist(Interval(dgv_region.end), bpp.break2)) > distance:
                 continue
             refname = dgv_region.reference_object
             try:
@@ -1,9 +1,12 @@
 from functools import partial
+import heapq
 import itertools
 import math
 import statistics
 import warnings
 
+import numpy as np
+
 from .evidence import TranscriptomeEvidence
 from ..align import SplitAlignment, query_coverage_interval, call_read_events, call_paired_read_event, convert_to_duplication
 from ..bam import read as _read
@@ -623,17 +626,28 @@ def call_events(source_evidence):
             type_consumed_evidence.update(call.support())
             calls.append(call)
 
-        try:
-            call = _call_by_flanking_pairs(source_evidence, event_type, type_consumed_evidence)
-            if len(call.flanking_pairs) < source_evidence.min_flanking_pairs_resolution:
-                errors.add('flanking call ({}) failed to supply the minimum evidence required ({} < {})'.format(
-                    event_type, len(call.flanking_pairs), source_evidence.min_flanking_pairs_resolution))
-            else:
-                calls.append(call)
-        except AssertionError as err:
-            errors.add(str(err))
-        except ValueError:  # incompatible type
-            pass
+        available_flanking_pairs = filter_consumed_pairs(source_evidence.flanking_pairs, type_consumed_evidence)
+        clusters = _cluster_flanking_pairs(source_evidence, event_type, available_flanking_pairs) or [set()]
+        cluster_errors = []  # the number of pairs and the error for each cluster which did not produce a call
+        called = False
+        for flanking_pairs in clusters:
+            try:
+                call = _call_by_flanking_pairs(source_evidence, event_type, type_consumed_evidence, flanking_pairs=flanking_pairs)
+                if len(call.flanking_pairs) < source_evidence.min_flanking_pairs_resolution:
+                    cluster_errors.append((len(flanking_pairs), 'flanking call ({}) failed to supply the minimum evidence required ({} < {})'.format(
+                        event_type, len(call.flanking_pairs), source_evidence.min_flanking_pairs_resolution)))
+                else:
+                    calls.append(call)
+                    called = True
+            except AssertionError as err:
+                cluster_errors.append((len(flanking_pairs), str(err)))
+            except ValueError:  # incompatible type
+                pass
+        if not called and len(cluster_errors) == 1:
+            errors.add(cluster_errors[0][1])
+        elif not called and cluster_errors:
+            errors.add('flanking call ({}) failed for all {} clusters of flanking pairs (largest cluster: {})'.format(
+                event_type, len(cluster_errors), max(cluster_errors)[1]))
 
     if not calls and errors:
         raise UserWarning(';'.join(sorted(list(errors))))
@@ -666,42 +680,18 @@ def _call_interval_by_flanking_coverage(coverage, orientation, max_expected_frag
         raise ValueError('orientation must be specific', orientation)
 
 
-def _call_by_flanking_pairs(evidence, event_type, consumed_evidence=None):
+def _select_flanking_pairs(evidence, event_type, flanking_pairs):
     """
-    Given a set of flanking reads, computes the coverage interval (the area that is covered by flanking read alignments)
-    this area gives the starting position for computing the breakpoint interval.
-
-    .. todo::
+    Selects the flanking pairs with a fragment size which is abnormal for the given event type
 
-        pre-split pairs into clusters by position and fragment size. This will enable calling multiple
-        events in close proximity by flanking reads only. It will also aid in stopping FP reads from
-        interfering with resolving events by flanking pairs.
+    Returns:
+        tuple:
+            - :class:`list` of :class:`tuple` - the selected flanking pairs
+            - :class:`list` of :class:`~mavis.interval.Interval` - the fragment size of each selected pair
     """
-    if consumed_evidence is None:
-        consumed_evidence = set()
-    # for all flanking read pairs mark the farthest possible distance to the breakpoint
-    # the start/end of the read on the breakpoint side
     selected_flanking_pairs = []
     fragments = []
-    available_flanking_pairs = filter_consumed_pairs(evidence.flanking_pairs, consumed_evidence)
-
-    def _compute_coverage_intervals(pairs):
-        first_positions = []
-        second_positions = []
-        for read, mate in pairs:
-            if evidence.break1.orient == ORIENT.LEFT:
-                first_positions.extend([read.reference_end, read.reference_end - read.query_alignment_length + 1])
-            else:
-                first_positions.extend([read.reference_start + 1, read.reference_start + read.query_alignment_length])
-            if evidence.break2.orient == ORIENT.LEFT:
-                second_positions.extend([mate.reference_end, mate.reference_end - mate.query_alignment_length + 1])
-            else:
-                second_positions.extend([mate.reference_start + 1, mate.reference_start + mate.query_alignment_length])
-        cover1 = Interval(min(first_positions), max(first_positions))
-        cover2 = Interval(min(second_positions), max(second_positions))
-        return cover1, cover2
-
-    for read, mate in available_flanking_pairs:
+    for read, mate in flanking_pairs:
         # check that the fragment size is reasonable
         fragment_size = evidence.compute_fragment_size(read, mate)
         if event_type == SVTYPE.DEL:
@@ -712,14 +702,246 @@ def _call_by_flanking_pairs(evidence, event_type, consumed_evidence=None):
                 continue
         fragments.append(fragment_size)
         selected_flanking_pairs.append((read, mate))
+    return selected_flanking_pairs, fragments
+
+
+def _flanking_breakpoint_position(read, orient):
+    """
+    the position of the end of the read on the breakpoint side
+    """
+    if orient == ORIENT.LEFT:
+        return read.reference_end
+    return read.reference_start + 1
+
+
+def _cluster_flanking_pairs(evidence, event_type, flanking_pairs):
+    """
+    Splits the flanking pairs into groups which could each support a separate event. The pairs are sorted once by the
+    read position on the breakpoint side and swept in that order. Each pair joins the open clusters which it is within
+    range of on all three of
+
+    - read position: the distance from the last read position in the cluster
+    - mate position: the distance from the range of mate positions in the cluster
+    - fragment size: the distance from the range of fragment sizes in the cluster
+
+    where the position limit is the largest possible coverage interval (max expected fragment size - read length) and
+    the fragment size limit is the range of normal fragment sizes. A pair within range of several clusters merges them.
+    Clusters are closed once the sweep has moved past their last read position by more than the position limit
+
+    Args:
+        evidence (Evidence): the evidence object
+        event_type (SVTYPE): the event type to call (used to select the flanking pairs)
+        flanking_pairs (set of tuple): the flanking pairs to be clustered
+
+    Returns:
+        :class:`list` of :class:`set` of :class:`tuple`: the flanking pairs clusters
+    """
+    selected_flanking_pairs, fragments = _select_flanking_pairs(evidence, event_type, flanking_pairs)
+    max_position_gap = evidence.max_expected_fragment_size - evidence.read_length
+    max_fragment_gap = evidence.max_expected_fragment_size - evidence.min_expected_fragment_size
+    points = []
+    for (read, mate), fragment_size in zip(selected_flanking_pairs, fragments):
+        points.append((
+            _flanking_breakpoint_position(read, evidence.break1.orient),
+            _flanking_breakpoint_position(mate, evidence.break2.orient),
+            fragment_size,
+            (read, mate)
+        ))
+    points.sort(key=lambda p: (p[0], p[1], p[2].start, p[2].end))
+
+    open_clusters = []
+    clusters = []
+    for position, mate_position, fragment_size, pair in points:
+        still_open = []
+        for cluster in open_clusters:
+            if evidence.distance(cluster.last_position, position).start > max_position_gap:
+                clusters.append(cluster)
+            else:
+                still_open.append(cluster)
+        joined = None
+        open_clusters = []
+        for cluster in still_open:
+            if not cluster.within_range(evidence, mate_position, fragment_size, max_position_gap, max_fragment_gap):
+                open_clusters.append(cluster)
+            elif joined is None:
+                joined = cluster
+            else:  # the pair links the clusters
+                joined.merge(cluster)
+        if joined is None:
+            joined = _FlankingPairCluster(position, mate_position, fragment_size, pair)
+        else:
+            joined.add(position, mate_position, fragment_size, pair)
+        open_clusters.append(joined)
+    clusters.extend(open_clusters)
+    clusters.sort(key=lambda cluster: cluster.first)
+    return [set(cluster.pairs) for cluster in clusters]
+
+
+class _FlankingPairCluster:
+    """
+    A group of flanking pairs being collected by the sweep in :func:`_cluster_flanking_pairs`
+    """
+
+    def __init__(self, position, mate_position, fragment_size, pair):
+        self.first = (position, mate_position)
+        self.last_position = position
+        self.mate_positions = Interval(mate_position)
+        self.fragment_sizes = Interval(fragment_size.start, fragment_size.end)
+        self.pairs = [pair]
+
+    def add(self, position, mate_position, fragment_size, pair):
+        self.first = min(self.first, (position, mate_position))
+        self.last_position = position
+        self.mate_positions = Interval.union(self.mate_positions, Interval(mate_position))
+        self.fragment_sizes = Interval.union(self.fragment_sizes, fragment_size)
+        self.pairs.append(pair)
+
+    def merge(self, other):
+        self.first = min(self.first, other.first)
+        self.last_position = max(self.last_position, other.last_position)
+        self.mate_positions = Interval.union(self.mate_positions, other.mate_positions)
+        self.fragment_sizes = Interval.union(self.fragment_sizes, other.fragment_sizes)
+        self.pairs.extend(other.pairs)
+
+    def within_range(self, evidence, mate_position, fragment_size, max_position_gap, max_fragment_gap):
+        """
+        Returns:
+            bool: True if the mate position and the fragment size are within the limits of the ranges of the cluster
+        """
+        if mate_position < self.mate_positions.start:
+            mate_distance = evidence.distance(mate_position, self.mate_positions.start).start
+        elif mate_position > self.mate_positions.end:
+            mate_distance = evidence.distance(self.mate_positions.end, mate_position).start
+        else:
+            mate_distance = 0
+        return mate_distance <= max_position_gap and abs(Interval.dist(self.fragment_sizes, fragment_size)) <= max_fragment_gap
+
+
+class _FlankingPairSelection:
+    """
+    Tracks the coverage intervals and the mean fragment size of a set of flanking pairs while fragment size outliers
+    are removed. Uses heaps with lazy deletion so that each removal is O(log n) rather than re-scanning all the pairs
+    """
+
+    def __init__(self, pairs, fragments, orient1, orient2):
+        """
+        Args:
+            pairs (list of tuple): the flanking pairs
+            fragments (list of Interval): the fragment size of each flanking pair
+            orient1 (ORIENT): the orientation of the first breakpoint
+            orient2 (ORIENT): the orientation of the second breakpoint
+        """
+        self.pairs = pairs
+        self.fragments = fragments
+        self.removed = [False for pair in pairs]
+        self.count = len(pairs)
+        self.start_sum = sum([f.start for f in fragments])
+        self.end_sum = sum([f.end for f in fragments])
+        self.fragment_groups = {}
+        self.cover1_lower = []
+        self.cover1_upper = []
+        self.cover2_lower = []
+        self.cover2_upper = []
+        self.by_fragment_end = []
+        self.by_fragment_start = []
+        for index, ((read, mate), fragment) in enumerate(zip(pairs, fragments)):
+            lower, upper = self._read_positions(read, orient1)
+            self.cover1_lower.append((lower, index))
+            self.cover1_upper.append((-1 * upper, index))
+            lower, upper = self._read_positions(mate, orient2)
+            self.cover2_lower.append((lower, index))
+            self.cover2_upper.append((-1 * upper, index))
+            self.by_fragment_end.append((fragment.end, index))
+            self.by_fragment_start.append((-1 * fragment.start, index))
+            self.fragment_groups.setdefault((fragment.start, fragment.end), []).append(index)
+        self.by_index = [(index, index) for index in range(len(pairs))]
+        for heap in [
+            self.cover1_lower, self.cover1_upper, self.cover2_lower, self.cover2_upper,
+            self.by_fragment_end, self.by_fragment_start
+        ]:
+            heapq.heapify(heap)
+
+    @staticmethod
+    def _read_positions(read, orient):
+        if orient == ORIENT.LEFT:
+            positions = (read.reference_end, read.reference_end - read.query_alignment_length + 1)
+        else:
+            positions = (read.reference_start + 1, read.reference_start + read.query_alignment_length)
+        return min(positions), max(positions)
+
+    def _top(self, heap):
+        while self.removed[heap[0][1]]:
+            heapq.heappop(heap)
+        return heap[0]
+
+    def coverage_intervals(self):
+        """
+        Returns:
+            tuple of Interval: the coverage interval for the first and second breakpoint
+        """
+        cover1 = Interval(self._top(self.cover1_lower)[0], -1 * self._top(self.cover1_upper)[0])
+        cover2 = Interval(self._top(self.cover2_lower)[0], -1 * self._top(self.cover2_upper)[0])
+        return cover1, cover2
+
+    def remove_farthest_fragment(self):
+        """
+        removes all pairs with the fragment size farthest from the current average fragment size. Ties are broken by
+        the input order of the pairs. The farthest fragment must either have the smallest end or the largest start
+        """
+        average = Interval(self.start_sum / self.count, self.end_sum / self.count)
+        farthest = None
+        farthest_dist = 0
+        for index in [self._top(self.by_fragment_end)[1], self._top(self.by_fragment_start)[1]]:
+            distance = abs(Interval.dist(self.fragments[index], average))
+            if farthest is None or distance > farthest_dist or (distance == farthest_dist and index < farthest):
+                farthest = index
+                farthest_dist = distance
+        if farthest_dist == 0:  # all fragments overlap the average
+            farthest = self._top(self.by_index)[1]
+        fragment = self.fragments[farthest]
+        for index in self.fragment_groups.pop((fragment.start, fragment.end)):
+            self.removed[index] = True
+            self.count -= 1
+            self.start_sum -= self.fragments[index].start
+            self.end_sum -= self.fragments[index].end
+
+    def selected_pairs(self):
+        """
+        Returns:
+            list of tuple: the pairs which have not been removed (in input order)
+        """
+        return [pair for pair, removed in zip(self.pairs, self.removed) if not removed]
+
+
+def _call_by_flanking_pairs(evidence, event_type, consumed_evidence=None, flanking_pairs=None):
+    """
+    Given a set of flanking reads, computes the coverage interval (the area that is covered by flanking read alignments)
+    this area gives the starting position for computing the breakpoint interval.
+
+    Args:
+        evidence (Evidence): the evidence object
+        event_type (SVTYPE): the event type to call
+        consumed_evidence (set of pysam.AlignedSegment): reads which have already been used by other calls
+        flanking_pairs (set of tuple): the flanking pairs to call from (defaults to all flanking pairs of the evidence).
+            See :func:`_cluster_flanking_pairs`
+    """
+    if consumed_evidence is None:
+        consumed_evidence = set()
+    # for all flanking read pairs mark the farthest possible distance to the breakpoint
+    # the start/end of the read on the breakpoint side
+    available_flanking_pairs = filter_consumed_pairs(
+        evidence.flanking_pairs if flanking_pairs is None else flanking_pairs, consumed_evidence)
+
+    selected_flanking_pairs, fragments = _select_flanking_pairs(evidence, event_type, available_flanking_pairs)
+    selection = _FlankingPairSelection(selected_flanking_pairs, fragments, evidence.break1.orient, evidence.break2.orient)
 
     cover1 = None
     cover2 = None
     window1 = None
     window2 = None
 
-    while selected_flanking_pairs:  # try calling until you run out of available reads
-        cover1, cover2 = _compute_coverage_intervals(selected_flanking_pairs)
+    while selection.count:  # try calling until you run out of available reads
+        cover1, cover2 = selection.coverage_intervals()
         try:
             window1 = _call_interval_by_flanking_coverage(
                 cover1, evidence.break1.orient, evidence.max_expected_fragment_size, evidence.read_length,
@@ -732,15 +954,10 @@ def _call_by_flanking_pairs(evidence, event_type, consumed_evidence=None):
         except AssertionError:
             # length of coverage is greater than expected
             # remove the farthest outlier from the pairs wrt fragment size (most likely to belong to a different event)
-            average = Interval(
-                sum([f.start for f in fragments]) / len(fragments),
-                sum([f.end for f in fragments]) / len(fragments)
-            )
-            farthest = max(fragments, key=lambda f: abs(Interval.dist(f, average)))
-            fragments = [f for f in fragments if f != farthest]
-            selected_flanking_pairs = [(r, m) for r, m in selected_flanking_pairs if evidence.compute_fragment_size(r, m) != farthest]
+            selection.remove_farthest_fragment()
         else:
             break
+    selected_flanking_pairs = selection.selected_pairs()
     if len(selected_flanking_pairs) < evidence.min_flanking_pairs_resolution:
         raise AssertionError('insufficient flanking pairs ({}) to call {} by flanking reads'.format(
             len(selected_flanking_pairs), event_type))
@@ -787,6 +1004,64 @@ def _call_by_flanking_pairs(evidence, event_type, consumed_evidence=None):
     return call
 
 
+def _tally_split_read_positions(reads, orient, name_ids, seq_ids, min_reads=1, min_non_target_reads=0):
+    """
+    Groups split reads by the breakpoint position they support. Positions are tallied as histograms over the distinct
+    positions so the per-position read sets are only built for positions which pass the minimum read counts
+
+    Args:
+        reads (set of pysam.AlignedSegment): the split reads for a single breakpoint
+        orient (ORIENT): the orientation of the breakpoint
+        name_ids (dict of str to int): integer encoding of query names (updated in-place)
+        seq_ids (dict of tuple to int): integer encoding of (query name, query sequence) pairs (updated in-place)
+        min_reads (int): minimum number of reads supporting a position
+        min_non_target_reads (int): minimum number of reads supporting a position which were not re-aligned
+
+    Returns:
+        tuple: a tuple of three dicts keyed by position
+
+            - set of reads supporting the position
+            - counts of the integer-encoded query names
+            - counts of the integer-encoded (query name, query sequence) pairs
+    """
+    reads = list(reads)
+    positions = []
+    non_target = []
+    kept_reads = []
+    for read in reads:
+        try:
+            positions.append(_read.breakpoint_pos(read, orient) + 1)
+        except AttributeError:
+            continue
+        kept_reads.append(read)
+        non_target.append(
+            not read.has_tag(PYSAM_READ_FLAGS.TARGETED_ALIGNMENT) or not read.get_tag(PYSAM_READ_FLAGS.TARGETED_ALIGNMENT)
+        )
+    if not kept_reads:
+        return {}, {}, {}
+
+    distinct_positions, offsets = np.unique(np.array(positions, dtype=np.int64), return_inverse=True)
+    read_counts = np.bincount(offsets)
+    non_target_counts = np.bincount(offsets, weights=np.array(non_target, dtype=np.float64))
+    passed = (read_counts >= min_reads) & (non_target_counts >= min_non_target_reads)
+
+    pos_reads = {}
+    pos_names = {}
+    pos_seqs = {}
+    for read, offset in zip(kept_reads, offsets):
+        if not passed[offset]:
+            continue
+        pos = int(distinct_positions[offset])
+        name = name_ids.setdefault(read.query_name, len(name_ids))
+        seq = seq_ids.setdefault((read.query_name, read.query_sequence), len(seq_ids))
+        pos_reads.setdefault(pos, set()).add(read)
+        names = pos_names.setdefault(pos, {})
+        names[name] = names.get(name, 0) + 1
+        seqs = pos_seqs.setdefault(pos, {})
+        seqs[seq] = seqs.get(seq, 0) + 1
+    return pos_reads, pos_names, pos_seqs
+
+
 def _call_by_split_reads(evidence, event_type, consumed_evidence=None):
     """
     use split read evidence to resolve bp-level calls for breakpoint pairs (where possible)
@@ -795,50 +1070,29 @@ def _call_by_split_reads(evidence, event_type, consumed_evidence=None):
     """
     if consumed_evidence is None:
         consumed_evidence = set()
-    pos1 = {}
-    pos2 = {}
-
     available_flanking_pairs = filter_consumed_pairs(evidence.flanking_pairs, consumed_evidence)
 
-    for i, breakpoint, pos_dict in [(0, evidence.break1, pos1), (1, evidence.break2, pos2)]:
-        for read in evidence.split_reads[i] - consumed_evidence:
-            try:
-                pos = _read.breakpoint_pos(read, breakpoint.orient) + 1
-                if pos not in pos_dict:
-                    pos_dict[pos] = set()
-                pos_dict[pos].add(read)
-            except AttributeError:
-                pass
-        putative_positions = list(pos_dict.keys())
-        for pos in putative_positions:
-            if len(pos_dict[pos]) < evidence.min_splits_reads_resolution:
-                del pos_dict[pos]
-            else:
-                count = 0
-                for read in pos_dict[pos]:
-                    if not read.has_tag(PYSAM_READ_FLAGS.TARGETED_ALIGNMENT) or \
-                            not read.get_tag(PYSAM_READ_FLAGS.TARGETED_ALIGNMENT):
-                        count += 1
-                if count < evidence.min_non_target_aligned_split_reads:
-                    del pos_dict[pos]
+    name_ids = {}  # integer encoding of the query names
+    seq_ids = {}  # integer encoding of the (query name, query sequence) pairs
+    pos1, names1, seqs1 = _tally_split_read_positions(
+        evidence.split_reads[0] - consumed_evidence, evidence.break1.orient, name_ids, seq_ids,
+        evidence.min_splits_reads_resolution, evidence.min_non_target_aligned_split_reads
+    )
+    pos2, names2, seqs2 = _tally_split_read_positions(
+        evidence.split_reads[1] - consumed_evidence, evidence.break2.orient, name_ids, seq_ids,
+        evidence.min_splits_reads_resolution, evidence.min_non_target_aligned_split_reads
+    )
 
     linked_pairings = []
     # now pair up the breakpoints with their putative partners
-    for first, second in itertools.product(pos1, pos2):
+    for first, second in itertools.product(sorted(pos1), sorted(pos2)):
         if evidence.break1.chr == evidence.break2.chr:
             if first >= second:
                 continue
-        links = 0
-        read_names = set([r.query_name for r in pos1[first]])
-        reads = set([(r.query_name, r.query_sequence) for r in pos1[first]])
-        tgt_align = 0
-        for read in pos2[second]:
-            if read.query_name in read_names:
-                links += 1
-            if (read.query_name, read.query_sequence) in reads:
-                tgt_align += 1
+        links = sum([names2[second][name] for name in names2[second].keys() & names1[first]])
         if links < evidence.min_linking_split_reads:
             continue
+        tgt_align = sum([seqs2[second][seq] for seq in seqs2[second].keys() & seqs1[first]])
         deletion_size = second - first - 1
         if tgt_align >= evidence.min_double_aligned_to_estimate_insertion_size:
             # we can estimate the fragment size
@@ -678,6 +678,51 @@ class TestSelectContigAlignments(unittest.TestCase):
         self.assertEqual(2, len(alignments))
 
 
+class TestPairedAlignmentCandidates(unittest.TestCase):
+    def setUp(self):
+        self.seq = 'A' * 100
+        self.evidence = MockObject(
+            break1=MockObject(chr='1'),
+            break2=MockObject(chr='1'),
+            outer_window1=Interval(1000, 1200),
+            outer_window2=Interval(5000, 5200),
+            contig_aln_min_extend_overlap=10
+        )
+
+    def read(self, reference_start, cigar, reference_name='1'):
+        return SamRead(
+            reference_id=0, reference_start=reference_start, cigar=_cigar.convert_string_to_cigar(cigar),
+            query_sequence=self.seq, is_reverse=False, reference_name=reference_name
+        )
+
+    def test_pairs_across_windows(self):
+        read1 = self.read(1050, '50=50S')
+        read2 = self.read(5100, '50S50=')
+        pairs = align.paired_alignment_candidates(self.evidence, [read1, read2])
+        self.assertEqual(1, len(pairs))
+        self.assertEqual({read1, read2}, set(pairs[0]))
+
+    def test_reject_same_window(self):
+        read1 = self.read(1050, '50=50S')
+        read2 = self.read(1100, '50S50=')
+        self.assertEqual([], align.paired_alignment_candidates(self.evidence, [read1, read2]))
+
+    def test_reject_other_chromosome(self):
+        read1 = self.read(1050, '50=50S')
+        read2 = self.read(5100, '50S50=', reference_name='2')
+        self.assertEqual([], align.paired_alignment_candidates(self.evidence, [read1, read2]))
+
+    def test_reject_no_query_extension(self):
+        read1 = self.read(1050, '50=50S')
+        read2 = self.read(5100, '45=55S')
+        self.assertEqual([], align.paired_alignment_candidates(self.evidence, [read1, read2]))
+
+    def test_reject_no_breakpoint(self):
+        read1 = self.read(1050, '50=50S')
+        read2 = self.read(5100, '100=')
+        self.assertEqual([], align.paired_alignment_candidates(self.evidence, [read1, read2]))
+
+
 class TestGetAlignerVersion(unittest.TestCase):
 
     def test_get_blat_36x2(self):
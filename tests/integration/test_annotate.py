@@ -1,7 +1,7 @@
 import os
 import unittest
 
-from mavis.annotate.base import BioInterval, ReferenceName
+from mavis.annotate.base import BioInterval, ReferenceName, SEQUENCE_CACHE
 from mavis.annotate.file_io import load_reference_genes, load_reference_genome
 from mavis.annotate.genomic import Exon, Gene, Template, Transcript, PreTranscript
 from mavis.annotate.protein import calculate_orf, Domain, DomainRegion, translate, Translation
@@ -802,6 +802,17 @@ class TestSequenceFetching(unittest.TestCase):
         seqs = ['VPC*PPIIRK', 'C*NHFNVFLF']
         self.assertEqual(seqs, self.domain.get_seqs(REFERENCE_GENOME))
 
+    def test_fetch_translation_aa_seq_cached(self):
+        SEQUENCE_CACHE.clear()
+        aa_seq = self.translation.get_aa_seq(REFERENCE_GENOME)
+        self.assertEqual(3, SEQUENCE_CACHE.misses)  # genomic, cdna, aa
+        self.assertEqual(aa_seq, self.translation.get_aa_seq(REFERENCE_GENOME))
+        self.assertEqual(3, SEQUENCE_CACHE.misses)
+        self.assertEqual(3, SEQUENCE_CACHE.hits)
+        # a different strand is a different sequence
+        self.gene.strand = STRAND.NEG
+        self.assertEqual(reverse_complement(self.spliced_seq), self.transcript.get_seq(REFERENCE_GENOME))
+
 
 class TestStrandInheritance(unittest.TestCase):
 
@@ -885,6 +896,23 @@ class TestCoordinateCoversion(unittest.TestCase):
         self.assertEqual(50, self.rev_transcript.convert_genomic_to_cdna(551))
         self.assertEqual(250, self.rev_transcript.convert_genomic_to_cdna(151))
 
+    def test_coordinate_map_is_cached(self):
+        coordinate_map = self.pre_transcript.coordinate_map(self.transcript.splicing_pattern)
+        self.assertIs(coordinate_map, self.pre_transcript.coordinate_map(self.transcript.splicing_pattern))
+        self.assertEqual(300, len(coordinate_map))
+        self.assertEqual([101, 301, 501], coordinate_map.starts)
+        self.assertEqual([0, 100, 200], coordinate_map.offsets)
+
+    def test_coordinate_map_cdna_zero(self):
+        with self.assertRaises(IndexError):
+            self.transcript.convert_cdna_to_genomic(0)
+
+    def test_coordinate_map_genomic_to_cdna_array(self):
+        coordinate_map = self.rev_ust.coordinate_map(self.rev_transcript.splicing_pattern)
+        cdna, exonic = coordinate_map.genomic_to_cdna_array([100, 151, 250, 551, 700])
+        self.assertEqual([False, True, False, True, False], exonic.tolist())
+        self.assertEqual([0, 250, 0, 50, 0], cdna.tolist())
+
     def test_aa_to_cdna(self):
         self.assertEqual(Interval(51, 53), self.translation.convert_aa_to_cdna(1))
         self.assertEqual(Interval(249, 251), self.translation.convert_aa_to_cdna(67))
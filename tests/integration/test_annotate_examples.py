@@ -1,13 +1,20 @@
+import json
 import os
+import shutil
+from tempfile import mkdtemp
 import unittest
+from unittest import mock
 
 from mavis.annotate.variant import annotate_events, Annotation, flatten_fusion_transcript
-from mavis.annotate.fusion import FusionTranscript
+from mavis.annotate.fusion import FUSION_PRODUCT_CACHE, FusionTranscript
 from mavis.annotate.constants import SPLICE_TYPE
+from mavis.annotate import main as annotate_module
+from mavis.annotate.main import AnnotationCache, main as annotate_main
 from mavis.breakpoint import Breakpoint, BreakpointPair
 from mavis.constants import ORIENT, PROTOCOL, STRAND, SVTYPE
+from mavis.util import mkdirp
 
-from . import get_example_genes, MockObject, MockLongString
+from . import get_example_genes, MockObject, MockLongString, set_example_genes
 
 
 def get_best(gene):
@@ -165,3 +172,242 @@ class TestDSTYK(unittest.TestCase):
         self.assertEqual(1860, ft.break1)
         self.assertEqual(2065, ft.break2)
         flatten_fusion_transcript(ft.transcripts[0])  # test no error
+
+
+class TestFusionProductCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.gene = (get_example_genes() or set_example_genes())['SVEP1']
+
+    def setUp(self):
+        self.reference_genome = {self.gene.chr: MockObject(
+            seq=MockLongString(self.gene.seq, offset=self.gene.start - 1)
+        )}
+        self.best = get_best(self.gene)
+        FUSION_PRODUCT_CACHE.clear()
+
+    def build(self, offset):
+        # deletion of the middle exon with the breakpoints in the flanking introns
+        exons = sorted(self.best.exons, key=lambda x: x.start)
+        bpp = BreakpointPair(
+            Breakpoint(self.gene.chr, exons[2].end + 20 + offset, orient=ORIENT.LEFT),
+            Breakpoint(self.gene.chr, exons[4].start - 20 - offset, orient=ORIENT.RIGHT),
+            opposing_strands=False,
+            stranded=False,
+            event_type=SVTYPE.DEL,
+            protocol=PROTOCOL.GENOME,
+            untemplated_seq=''
+        )
+        ann = Annotation(bpp, transcript1=self.best, transcript2=self.best)
+        return FusionTranscript.build(ann, self.reference_genome, min_orf_size=300, max_orf_cap=10, min_domain_mapping_match=0.9)
+
+    def products(self, fusion_transcript):
+        result = []
+        for spl_tx in fusion_transcript.transcripts:
+            for translation in spl_tx.translations:
+                self.assertIs(spl_tx, translation.transcript)
+                domains = []
+                for domain in translation.domains:
+                    self.assertIs(translation, domain.translation)
+                    domains.append((domain.name, [(r.start, r.end, r.seq) for r in domain.regions]))
+                result.append((translation.start, translation.end, translation.get_aa_seq(), domains))
+        return result
+
+    def test_reuse_for_intronic_breakpoints(self):
+        first = self.build(0)
+        self.assertEqual(0, FUSION_PRODUCT_CACHE.hits)
+        second = self.build(5)
+        self.assertNotEqual(first.get_seq(), second.get_seq())
+        self.assertEqual(len(second.transcripts), FUSION_PRODUCT_CACHE.hits)
+        expected = self.products(first)
+        self.assertTrue(expected)
+        self.assertTrue(any([domains for _, _, _, domains in expected]))
+        self.assertEqual(expected, self.products(second))
+        # the cached results are not shared between the fusion transcripts
+        self.assertIsNot(first.transcripts[0].translations[0], second.transcripts[0].translations[0])
+
+
+class TestAnnotateMain(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.example_genes = get_example_genes() or set_example_genes()
+
+    def setUp(self):
+        self.output = mkdtemp()
+        self.gene = self.example_genes['NDUFA12']
+        self.reference_annotations = {self.gene.chr: [self.gene]}
+        self.reference_genome = {self.gene.chr: MockObject(
+            seq=MockLongString(self.gene.seq, offset=self.gene.start - 1)
+        )}
+        self.input = os.path.join(self.output, 'input.tab')
+        with open(self.input, 'w') as fh:
+            fh.write('\t'.join([
+                '#break1_chromosome', 'break1_position_start', 'break1_position_end', 'break2_chromosome',
+                'break2_position_start', 'break2_position_end', 'break1_orientation', 'break2_orientation',
+                'event_type', 'stranded', 'untemplated_seq', 'validation_id'
+            ]) + '\n')
+            for i, (start, end) in enumerate([(95344068, 95344379), (95319900, 95325100), (95290000, 95322000)]):
+                fh.write('\t'.join([
+                    self.gene.chr, str(start), str(start), self.gene.chr, str(end), str(end), ORIENT.LEFT, ORIENT.RIGHT,
+                    SVTYPE.DEL, 'False', '', 'vid{}'.format(i)
+                ]) + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.output)
+
+    def run_annotate(self, name, workers, **kwargs):
+        output = os.path.join(self.output, name)
+        mkdirp(output)
+        kwargs.setdefault('min_orf_size', 100)
+        annotate_main(
+            [self.input], output, 'library', PROTOCOL.GENOME, self.reference_genome, self.reference_annotations, None,
+            draw_fusions_only=False, draw_non_synonymous_cdna_only=False, annotate_workers=workers, **kwargs
+        )
+        with open(os.path.join(output, 'annotations.tab')) as fh:
+            # drop the randomly generated tracking id and the output directory from the drawing paths
+            rows = [line.replace(output, '').split('\t')[1:] for line in fh.readlines()]
+        with open(os.path.join(output, 'annotations.fusion-cdna.fa')) as fh:
+            fasta = fh.read()
+        drawings = sorted(os.listdir(os.path.join(output, 'drawings')))
+        return rows, fasta, drawings
+
+    def test_workers_match_serial(self):
+        serial_rows, serial_fasta, serial_drawings = self.run_annotate('serial', 1)
+        rows, fasta, drawings = self.run_annotate('parallel', 2)
+        self.assertLess(1, len(serial_rows))
+        self.assertEqual(serial_rows, rows)
+        self.assertEqual(serial_fasta, fasta)
+        self.assertEqual(serial_drawings, drawings)
+
+    def test_deferred_drawings_match(self):
+        serial_rows, serial_fasta, serial_drawings = self.run_annotate('serial', 1)
+        for workers in [1, 2]:
+            name = 'deferred{}'.format(workers)
+            rows, fasta, drawings = self.run_annotate(name, workers, defer_drawings=True)
+            self.assertEqual(serial_rows, rows)
+            self.assertEqual(serial_fasta, fasta)
+            self.assertEqual(serial_drawings, drawings)
+            self.assertEqual(
+                ['annotations.fusion-cdna.fa', 'annotations.tab', 'drawings'],
+                sorted([f for f in os.listdir(os.path.join(self.output, name)) if not f.endswith('.COMPLETE')]))
+
+    def test_drawings_measured_before_drawing(self):
+        draw_sv_summary_diagram = annotate_module.draw_sv_summary_diagram
+        widths = []
+
+        def draw(config, *pos, **kwargs):
+            widths.append(config.width)
+            return draw_sv_summary_diagram(config, *pos, **kwargs)
+
+        with mock.patch.object(annotate_module, 'draw_sv_summary_diagram', side_effect=draw):
+            rows, fasta, drawings = self.run_annotate('measured', 1, width=100)
+        # widths which are too small are skipped without drawing so each illustration is drawn once
+        self.assertEqual(len([d for d in drawings if d.endswith('.svg')]), len(widths))
+        self.assertTrue(widths)
+        self.assertNotIn(100, widths)
+
+    def cached_keys(self, name):
+        with open(os.path.join(self.output, name, 'annotations.cache.jsonl')) as fh:
+            return [json.loads(line)['key'] for line in fh.readlines()]
+
+    def test_cache_reused(self):
+        first = self.run_annotate('cached', 1, annotate_cache=True)
+        keys = self.cached_keys('cached')
+        self.assertEqual(3, len(keys))
+        # remove the annotation function inputs so that a rerun can only succeed using the cache
+        self.reference_annotations.clear()
+        self.reference_genome.clear()
+        self.assertEqual(first, self.run_annotate('cached', 1, annotate_cache=True))
+        self.assertEqual(keys, self.cached_keys('cached'))
+
+    def test_cache_invalidated_by_options(self):
+        self.run_annotate('cached', 1, annotate_cache=True)
+        keys = self.cached_keys('cached')
+        uncached = self.run_annotate('uncached', 1, min_orf_size=300)
+        self.assertEqual(uncached, self.run_annotate('cached', 1, annotate_cache=True, min_orf_size=300))
+        self.assertEqual(3, len(self.cached_keys('cached')))
+        self.assertFalse(set(keys) & set(self.cached_keys('cached')))
+
+    def test_cache_resume_from_partial_checkpoint(self):
+        expected = self.run_annotate('uncached', 1)
+        self.assertFalse(os.path.exists(os.path.join(self.output, 'uncached', 'annotations.cache.jsonl')))
+        self.run_annotate('cached', 1, annotate_cache=True)
+        # simulate a job killed while writing the third record
+        cache_file = os.path.join(self.output, 'cached', 'annotations.cache.jsonl')
+        with open(cache_file) as fh:
+            lines = fh.readlines()
+        with open(cache_file, 'w') as fh:
+            fh.write(''.join(lines[:2]) + lines[2][:20])
+        self.assertEqual(expected, self.run_annotate('cached', 2, annotate_cache=True))
+        self.assertEqual(3, len(self.cached_keys('cached')))
+
+
+class TestAnnotationCache(unittest.TestCase):
+
+    def setUp(self):
+        self.output = mkdtemp()
+        self.filename = os.path.join(self.output, 'cache.jsonl')
+        self.bpp = BreakpointPair(
+            Breakpoint('1', 100, orient=ORIENT.LEFT), Breakpoint('1', 200, orient=ORIENT.RIGHT),
+            opposing_strands=False, event_type=SVTYPE.DEL, data={'tracking_id': 'a'}
+        )
+        self.results = [(['tracking_id'], [{'tracking_id': 'a', 'annotation_figure': 'None'}], [('seq-1', 'ATCG')])]
+
+    def tearDown(self):
+        shutil.rmtree(self.output)
+
+    def test_key_ignores_tracking_id(self):
+        cache = AnnotationCache(self.filename, {'min_orf_size': 300})
+        key = cache.key(self.bpp)
+        self.bpp.data['tracking_id'] = 'b'
+        self.assertEqual(key, cache.key(self.bpp))
+        self.bpp.data['validation_id'] = 'v1'
+        self.assertNotEqual(key, cache.key(self.bpp))
+        self.assertNotEqual(key, AnnotationCache(self.filename, {'min_orf_size': 200}).key(self.bpp))
+
+    def test_get_after_reload(self):
+        cache = AnnotationCache(self.filename, {}, checkpoint_interval=10)
+        key = cache.key(self.bpp)
+        self.assertIsNone(cache.get(key))
+        cache.put(key, self.results)
+        cache.close()
+        cache = AnnotationCache(self.filename, {})
+        results = cache.get(key, 'b')
+        self.assertEqual(1, cache.hits)
+        self.assertEqual([('seq-1', 'ATCG')], results[0][2])
+        self.assertEqual('b', results[0][1][0]['tracking_id'])
+
+    def test_get_same_key_with_different_tracking_ids(self):
+        cache = AnnotationCache(self.filename, {})
+        key = cache.key(self.bpp)
+        cache.put(key, self.results)
+        cache.close()
+        cache = AnnotationCache(self.filename, {})
+        first = cache.get(key, 't1')
+        second = cache.get(key, 't2')
+        self.assertEqual('t1', first[0][1][0]['tracking_id'])
+        self.assertEqual('t2', second[0][1][0]['tracking_id'])
+        cache.close(compact=True)
+        with open(self.filename) as fh:
+            self.assertEqual('a', json.loads(fh.readline())['results'][0][1][0]['tracking_id'])
+
+    def test_missing_drawing_is_not_reused(self):
+        cache = AnnotationCache(self.filename, {})
+        key = cache.key(self.bpp)
+        self.results[0][1][0]['annotation_figure'] = os.path.join(self.output, 'missing.svg')
+        cache.put(key, self.results)
+        cache.close()
+        self.assertIsNone(AnnotationCache(self.filename, {}).get(key))
+
+    def test_compact(self):
+        cache = AnnotationCache(self.filename, {})
+        cache.put('k1', self.results)
+        cache.put('k2', self.results)
+        cache.close()
+        cache = AnnotationCache(self.filename, {})
+        cache.get('k2')
+        cache.close(compact=True)
+        with open(self.filename) as fh:
+            self.assertEqual(['k2'], [json.loads(line)['key'] for line in fh.readlines()])
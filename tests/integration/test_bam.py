@@ -8,9 +8,11 @@ from mavis.bam import cigar as _cigar
 from mavis.bam import read as _read
 from mavis.bam.cache import BamCache
 from mavis.bam.read import breakpoint_pos, orientation_supports_type, read_pair_type, sequenced_strand
-from mavis.bam.stats import compute_genome_bam_stats, compute_transcriptome_bam_stats, Histogram
+from mavis.annotate.genomic import PreTranscript, Transcript
+from mavis.bam.stats import _transcriptome_fragment_sizes, compute_genome_bam_stats, compute_transcriptome_bam_stats, Histogram, StatsConvergence
 from mavis.constants import CIGAR, DNA_ALPHABET, ORIENT, READ_PAIR_TYPE, STRAND, SVTYPE, NA_MAPPING_QUALITY
 from mavis.interval import Interval
+import numpy as np
 import timeout_decorator
 
 from . import BAM_INPUT, FULL_BAM_INPUT, FULL_REFERENCE_ANNOTATIONS_FILE_JSON, MockBamFileHandle, MockRead, REFERENCE_GENOME_FILE, TRANSCRIPTOME_BAM_INPUT
@@ -341,6 +343,22 @@ class TestHistogram(unittest.TestCase):
         err = h.distribution_stderr(m, 1)
         self.assertEqual(116 / 15, err)
 
+    def test_median_weighted(self):
+        h = Histogram()
+        h.add(3, 5)
+        h.add(1, 2)
+        h.add(10, 3)
+        self.assertEqual(3, h.median())
+        h.add(10, 4)
+        self.assertEqual(6.5, h.median())
+
+    def test_distib_stderr_partial_fraction(self):
+        h = Histogram()
+        h.add(5, 2)
+        h.add(6, 3)
+        h.add(9, 5)
+        self.assertEqual((0 + 0 + 1 + 1 + 1) / 5, h.distribution_stderr(5, 0.5))
+
     def test_add_operator(self):
         x = Histogram()
         y = Histogram()
@@ -352,6 +370,48 @@ class TestHistogram(unittest.TestCase):
         self.assertEqual(5, z[1])
 
 
+class TestStatsConvergence(unittest.TestCase):
+    def test_converged_after_stable_window(self):
+        convergence = StatsConvergence(0.01, 1, window=2, min_samples=20)
+        h = Histogram()
+        h.add(100, 4)
+        h.add(200, 4)
+        self.assertFalse(convergence.update(h))
+        h.add(100, 4)
+        h.add(200, 4)
+        self.assertFalse(convergence.update(h))
+        h.add(100, 4)
+        h.add(200, 4)
+        self.assertTrue(convergence.update(h))
+        self.assertTrue(convergence.update(h))  # no new samples does not add to the trace
+        self.assertEqual([8, 16, 24], [samples for samples, _, _ in convergence.trace])
+
+    def test_below_min_samples(self):
+        convergence = StatsConvergence(0.01, 1, window=1, min_samples=20)
+        h = Histogram()
+        h.add(100, 5)
+        convergence.update(h)
+        h.add(100, 5)
+        self.assertFalse(convergence.update(h))
+        self.assertEqual(1, convergence.stable_checks)
+
+    def test_unstable_resets(self):
+        convergence = StatsConvergence(0.1, 1, window=1, min_samples=1)
+        h = Histogram()
+        h.add(100, 2)
+        convergence.update(h)
+        h.add(300, 4)
+        self.assertFalse(convergence.update(h))
+        self.assertEqual(0, convergence.stable_checks)
+        h.add(300, 1)
+        self.assertTrue(convergence.update(h))
+
+    def test_empty_histogram(self):
+        convergence = StatsConvergence(0.01, 1)
+        self.assertFalse(convergence.update(Histogram()))
+        self.assertEqual([], convergence.trace)
+
+
 class TestBamStats(unittest.TestCase):
     def test_genome_bam_stats(self):
         bamfh = BamCache(FULL_BAM_INPUT)
@@ -367,6 +427,25 @@ class TestBamStats(unittest.TestCase):
         self.assertEqual(150, stats.read_length)
         bamfh.close()
 
+    def test_genome_bam_stats_convergence(self):
+        bamfh = BamCache(FULL_BAM_INPUT)
+        stats = compute_genome_bam_stats(
+            bamfh,
+            1000,
+            100,
+            min_mapping_quality=1,
+            sample_cap=10000,
+            distribution_fraction=0.99,
+            convergence_tolerance=0.05
+        )
+        self.assertGreaterEqual(50, abs(stats.median_fragment_size - 420))
+        self.assertEqual(150, stats.read_length)
+        self.assertTrue(stats.convergence_trace)
+        samples, median, stdev = stats.convergence_trace[-1]
+        self.assertEqual(stats.median_fragment_size, median)
+        self.assertAlmostEqual(stats.stdev_fragment_size, stdev)
+        bamfh.close()
+
     def test_trans_bam_stats(self):
         bamfh = BamCache(TRANSCRIPTOME_BAM_INPUT)
         annotations = load_reference_genes(FULL_REFERENCE_ANNOTATIONS_FILE_JSON)
@@ -384,6 +463,21 @@ class TestBamStats(unittest.TestCase):
         self.assertTrue(stats.stdev_fragment_size < 50)
         bamfh.close()
 
+    def test_transcriptome_fragment_sizes(self):
+        transcripts = []
+        for exons in [[(101, 200), (301, 400), (501, 600)], [(101, 200), (501, 600)], [(101, 400)]]:
+            pre_transcript = PreTranscript(exons, strand=STRAND.POS)
+            for pattern in pre_transcript.generate_splicing_patterns():
+                transcripts.append(Transcript(pre_transcript, pattern))
+        read_starts = np.array([110, 110, 110, 250, 450])
+        mate_starts = np.array([150, 320, 550, 350, 460])
+        sizes = _transcriptome_fragment_sizes(transcripts, read_starts, mate_starts)
+        # the last read is intronic in all transcripts, the second last is only exonic in the unspliced transcript
+        self.assertEqual([38, (108 + 208) / 2, (238 + 138) / 2, 98], sizes.tolist())
+
+    def test_transcriptome_fragment_sizes_empty(self):
+        self.assertEqual(0, len(_transcriptome_fragment_sizes([], np.array([1]), np.array([2]))))
+
 
 class TestMapRefRangeToQueryRange(unittest.TestCase):
     def setUp(self):
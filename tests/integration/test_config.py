@@ -2,7 +2,12 @@ import unittest
 from unittest.mock import mock_open, patch
 import configparser
 
-from mavis.config import MavisConfig
+import numpy as np
+
+from mavis.config import build_library_configs, MavisConfig
+from mavis.constants import PROTOCOL
+
+from . import FULL_BAM_INPUT
 
 
 STUB = """
@@ -61,3 +66,44 @@ class TestConfig(unittest.TestCase):
 
     def test_ok(self):
         self.mock_config(STUB)
+
+
+class TestBuildLibraryConfigs(unittest.TestCase):
+
+    def setUp(self):
+        self.library_kwargs = [
+            dict(
+                library=name, protocol=PROTOCOL.GENOME, bam_file=FULL_BAM_INPUT, inputs=['input'],
+                disease_status='diseased', sample_size=20
+            ) for name in ['lib1', 'lib2', 'lib3']
+        ]
+
+    def stats(self, libs):
+        return [(lib.library, lib.median_fragment_size, lib.stdev_fragment_size, lib.read_length) for lib in libs]
+
+    def test_workers_do_not_change_seeded_results(self):
+        messages = []
+        serial = build_library_configs(self.library_kwargs, seed=1, log=lambda *pos, **kwargs: messages.append(pos))
+        parallel = build_library_configs(self.library_kwargs, workers=2, seed=1)
+        self.assertEqual(['lib1', 'lib2', 'lib3'], [lib.library for lib in parallel])
+        self.assertEqual(self.stats(serial), self.stats(parallel))
+        self.assertEqual(('generated the config section for:', 'lib1'), messages[0])
+
+    def test_seed_per_library(self):
+        libs = build_library_configs(self.library_kwargs, seed=1)
+        self.assertNotEqual(libs[0].stdev_fragment_size, libs[1].stdev_fragment_size)
+
+    def test_unseeded_workers_sample_independently(self):
+        np.random.seed(1)
+        serial = build_library_configs(self.library_kwargs)
+        np.random.seed(1)
+        parallel = build_library_configs(self.library_kwargs, workers=2)
+        self.assertEqual(self.stats(serial), self.stats(parallel))
+        self.assertEqual(3, len(set([stats[1:] for stats in self.stats(parallel)])))
+
+    def test_caller_random_state_not_reset(self):
+        np.random.seed(1)
+        expected = np.random.rand()
+        np.random.seed(1)
+        build_library_configs(self.library_kwargs, seed=1)
+        self.assertEqual(expected, np.random.rand())
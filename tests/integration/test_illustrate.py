@@ -11,7 +11,8 @@ from mavis.annotate import fusion
 from mavis.breakpoint import Breakpoint, BreakpointPair
 from mavis.constants import ORIENT, PROTOCOL, STRAND, SVTYPE
 from mavis.illustrate.constants import DiagramSettings, DEFAULTS
-from mavis.illustrate.diagram import draw_multi_transcript_overlay, draw_sv_summary_diagram, generate_interval_mapping, HEX_BLACK, HEX_WHITE
+from mavis.error import DrawingFitError
+from mavis.illustrate.diagram import draw_multi_transcript_overlay, draw_sv_summary_diagram, generate_interval_mapping, HEX_BLACK, HEX_WHITE, measure_sv_summary_diagram
 from mavis.illustrate.elements import draw_genes, draw_legend, draw_template, draw_ustranscript
 from mavis.illustrate.scatter import ScatterPlot
 from mavis.illustrate.util import dynamic_label_color, split_intervals_into_tracks
@@ -426,6 +427,37 @@ class TestDraw(unittest.TestCase):
             d.template_track_height
         self.assertAlmostEqual(expected_height, canvas.attribs['height'])
 
+    def test_measure_translocation_with_template(self):
+        d = DiagramSettings()
+        g1 = genomic.Gene(TEMPLATE_METADATA['1'], 150, 1000, strand=STRAND.POS, aliases=['HUGO2'])
+        g2 = genomic.Gene(TEMPLATE_METADATA['X'], 5000, 7500, strand=STRAND.NEG, aliases=['HUGO3'])
+        t1 = build_transcript(
+            gene=g1, name='transcript1', cds_start=50, cds_end=249,
+            exons=[(200, 299), (400, 499), (700, 899)], domains=[]
+        )
+        t2 = build_transcript(
+            gene=g2, name='transcript2', cds_start=120, cds_end=700,
+            exons=[(5100, 5299), (5800, 6199), (6500, 6549), (6700, 6799)], domains=[]
+        )
+        bpp = BreakpointPair(
+            Breakpoint('1', 350, orient=ORIENT.LEFT), Breakpoint('2', 6520, orient=ORIENT.LEFT),
+            opposing_strands=True, untemplated_seq='')
+        ann = variant.Annotation(bpp, transcript1=t1, transcript2=t2, event_type=SVTYPE.ITRANS, protocol=PROTOCOL.GENOME)
+        ann.add_gene(genomic.Gene('1', 1500, 1950, strand=STRAND.POS, aliases=['HUGO5']))
+        ann.add_gene(genomic.Gene('1', 3000, 3980, strand=STRAND.POS))
+        ann.add_gene(genomic.Gene('2', 5500, 9000, strand=STRAND.POS))
+        reference_genome = {'1': MockObject(seq=MockString('A')), '2': MockObject(seq=MockString('A'))}
+        ann.fusion = variant.FusionTranscript.build(ann, reference_genome)
+
+        for settings in [{}, {'stack_reference_transcripts': True}, {'draw_fusion_transcript': False}]:
+            width = measure_sv_summary_diagram(d, ann, templates=TEMPLATE_METADATA, **settings)
+            # the measured width is the smallest which fits
+            d.width = int(width) + 1
+            draw_sv_summary_diagram(d, ann, templates=TEMPLATE_METADATA, **settings)
+            d.width = int(width) - 1
+            with self.assertRaises(DrawingFitError):
+                draw_sv_summary_diagram(d, ann, templates=TEMPLATE_METADATA, **settings)
+
     def test_draw_overlay(self):
         gene = genomic.Gene('12', 25357723, 25403870, strand=STRAND.NEG, name='KRAS')
         marker = BioInterval('12', 25403865, name='splice site mutation')
@@ -1,9 +1,18 @@
+import itertools
+import os
+import random
+import shutil
+from tempfile import mkdtemp
 import unittest
+from unittest import mock
 
 from mavis.annotate.genomic import PreTranscript
 from mavis.breakpoint import Breakpoint, BreakpointPair
 from mavis.constants import CALL_METHOD, COLUMNS, ORIENT, PROTOCOL, STRAND, SVTYPE
 from mavis.pairing import pairing
+from mavis.pairing import main as pairing_module
+from mavis.pairing.main import _pairing_category, _shard_categories, _write_shard_inputs, main as pairing_main
+from mavis.util import output_tabbed_file, read_bpp_from_input_file
 
 
 class TestPairing(unittest.TestCase):
@@ -391,6 +400,39 @@ class TestBreakpointPrediction(unittest.TestCase):
         self.assertEqual(301, breaks[0].start)
 
 
+class TestBreakpointPredictionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.pre_transcript = PreTranscript([(101, 200), (301, 400), (501, 600)], strand=STRAND.POS, name='t1')
+        self.cache = pairing.BreakpointPredictionCache()
+
+    def test_predict(self):
+        b = Breakpoint('1', 350, orient=ORIENT.LEFT)
+        expected = pairing.predict_transcriptome_breakpoint(b, self.pre_transcript)
+        self.assertEqual(expected, self.cache.predict(b, self.pre_transcript))
+        self.assertEqual(expected, self.cache.predict(Breakpoint('1', 350, orient=ORIENT.LEFT), self.pre_transcript))
+        self.assertEqual(1, self.cache.misses)
+        self.assertEqual(1, self.cache.hits)
+        self.cache.predict(Breakpoint('1', 350, orient=ORIENT.RIGHT), self.pre_transcript)
+        self.assertEqual(2, self.cache.misses)
+        self.assertEqual(2, len(self.cache))
+
+    def test_result_is_a_copy(self):
+        b = Breakpoint('1', 350, orient=ORIENT.LEFT)
+        self.cache.predict(b, self.pre_transcript).append(b)
+        self.assertEqual(2, len(self.cache.predict(b, self.pre_transcript)))
+
+    def test_error_is_cached(self):
+        b = Breakpoint('1', 100, orient=ORIENT.RIGHT)
+        for i in range(2):
+            with self.assertRaises(AssertionError):
+                self.cache.predict(b, self.pre_transcript)
+        self.assertEqual(1, self.cache.hits)
+        self.cache.clear()
+        self.assertEqual(0, len(self.cache))
+        self.assertEqual(0, self.cache.hits)
+
+
 class TestEquivalent(unittest.TestCase):
 
     def test_useq_uncertainty(self):
@@ -425,3 +467,244 @@ class TestEquivalent(unittest.TestCase):
             untemplated_seq='TTTTTTTTT'
         )
         self.assertTrue(pairing.equivalent(event1, event2))
+
+
+class TestPairByDistance(unittest.TestCase):
+
+    def build_call(self, library, start, end, chrom='1', call_method=CALL_METHOD.CONTIG, event_type=SVTYPE.DEL):
+        return BreakpointPair(
+            Breakpoint(chrom, start, orient=ORIENT.LEFT),
+            Breakpoint(chrom, end, orient=ORIENT.RIGHT),
+            opposing_strands=False,
+            data={
+                COLUMNS.event_type: event_type,
+                COLUMNS.call_method: call_method,
+                COLUMNS.library: library,
+                COLUMNS.protocol: PROTOCOL.GENOME,
+                COLUMNS.annotation_id: '{}-{}-{}-{}'.format(library, chrom, start, end),
+                COLUMNS.fusion_splicing_pattern: None,
+                COLUMNS.fusion_cdna_coding_start: None,
+                COLUMNS.fusion_cdna_coding_end: None
+            }
+        )
+
+    def test_pairs_across_grid_cells(self):
+        distances = {CALL_METHOD.CONTIG: 10}
+        # cells are 51bp wide (flanking reads distance plus the breakpoint resolution) so A and B are in neighbouring cells
+        calls = [self.build_call('A', 48, 1048), self.build_call('B', 53, 1053), self.build_call('C', 60, 1040)]
+        pairings = pairing.pair_by_distance(calls, distances)
+        keys = [pairing.product_key(c) for c in calls]
+        self.assertEqual({keys[1]}, pairings[keys[0]])
+        self.assertEqual({keys[0]}, pairings[keys[1]])
+        self.assertEqual(set(), pairings[keys[2]])
+
+    def test_same_library(self):
+        calls = [self.build_call('A', 100, 1000), self.build_call('A', 101, 1001)]
+        keys = [pairing.product_key(c) for c in calls]
+        self.assertEqual({keys[0]: set(), keys[1]: set()}, pairing.pair_by_distance(calls, {CALL_METHOD.CONTIG: 10}))
+        pairings = pairing.pair_by_distance(calls, {CALL_METHOD.CONTIG: 10}, against_self=True)
+        self.assertEqual({keys[1]}, pairings[keys[0]])
+
+    def test_different_chromosome_or_event_type(self):
+        calls = [
+            self.build_call('A', 100, 1000),
+            self.build_call('B', 100, 1000, chrom='2'),
+            self.build_call('C', 100, 1000, event_type=SVTYPE.DUP)
+        ]
+        pairings = pairing.pair_by_distance(calls, {CALL_METHOD.CONTIG: 10})
+        self.assertEqual([set(), set(), set()], list(pairings.values()))
+
+    def test_matches_all_pairs(self):
+        random.seed(1)
+        methods = [CALL_METHOD.CONTIG, CALL_METHOD.SPLIT, CALL_METHOD.FLANK]
+        calls = []
+        for i in range(300):
+            start = random.randint(1, 2000)
+            calls.append(self.build_call(
+                random.choice('ABCD'), start, start + random.randint(1, 500), call_method=random.choice(methods),
+                event_type=random.choice([SVTYPE.DEL, SVTYPE.DUP])))
+        distances = {CALL_METHOD.CONTIG: 5, CALL_METHOD.SPLIT: 20, CALL_METHOD.FLANK: 100}
+        expected = {pairing.product_key(c): set() for c in calls}
+        for current, other in itertools.combinations(calls, 2):
+            if current.library != other.library and pairing.equivalent(current, other, distances=distances):
+                expected[pairing.product_key(current)].add(pairing.product_key(other))
+                expected[pairing.product_key(other)].add(pairing.product_key(current))
+        self.assertEqual(expected, pairing.pair_by_distance(calls, distances))
+
+
+class TestPairByProduct(unittest.TestCase):
+
+    def setUp(self):
+        self.transcript = PreTranscript(exons=[(1, 100), (301, 400), (501, 600)], strand=STRAND.POS, name='t1')
+        self.reference_transcripts = {self.transcript.name: self.transcript}
+        self.distances = {CALL_METHOD.CONTIG: 0, CALL_METHOD.FLANK: 0, CALL_METHOD.SPLIT: 10}
+
+    def build_call(self, library, protocol, start, end, fasta_id=None, coding_start=None):
+        return BreakpointPair(
+            Breakpoint('1', start, orient=ORIENT.LEFT),
+            Breakpoint('1', end, orient=ORIENT.RIGHT),
+            opposing_strands=False,
+            data={
+                COLUMNS.event_type: SVTYPE.DEL,
+                COLUMNS.call_method: CALL_METHOD.SPLIT,
+                COLUMNS.library: library,
+                COLUMNS.protocol: protocol,
+                COLUMNS.annotation_id: '{}-{}-{}'.format(library, start, end),
+                COLUMNS.fusion_sequence_fasta_id: fasta_id,
+                COLUMNS.fusion_cdna_coding_start: coding_start,
+                COLUMNS.fusion_cdna_coding_end: None,
+                COLUMNS.fusion_splicing_pattern: None,
+                COLUMNS.transcript1: self.transcript.name,
+                COLUMNS.transcript2: self.transcript.name
+            }
+        )
+
+    def test_same_product_far_apart(self):
+        calls = [
+            self.build_call('A', PROTOCOL.GENOME, 50, 350, 'seq1', 10),
+            self.build_call('B', PROTOCOL.TRANS, 80, 580, 'seq1', 10),
+            self.build_call('C', PROTOCOL.TRANS, 50, 350, 'seq1', 11)
+        ]
+        keys = [pairing.product_key(c) for c in calls]
+        pairings = pairing.pair_by_product(calls, self.distances, self.reference_transcripts)
+        self.assertEqual({keys[0]: {keys[1]}, keys[1]: {keys[0]}}, pairings)
+
+    def test_predicted_transcriptome_breakpoint(self):
+        # the intronic genome breakpoints are predicted to splice at the exon boundaries (100 and 301)
+        calls = [
+            self.build_call('A', PROTOCOL.GENOME, 150, 250),
+            self.build_call('B', PROTOCOL.TRANS, 100, 301),
+            self.build_call('C', PROTOCOL.TRANS, 100, 501)
+        ]
+        keys = [pairing.product_key(c) for c in calls]
+        pairings = pairing.pair_by_product(calls, self.distances, self.reference_transcripts)
+        self.assertEqual({keys[0]: {keys[1]}, keys[1]: {keys[0]}}, pairings)
+
+    def test_same_library(self):
+        calls = [
+            self.build_call('A', PROTOCOL.GENOME, 150, 250),
+            self.build_call('A', PROTOCOL.TRANS, 100, 301)
+        ]
+        self.assertEqual({}, pairing.pair_by_product(calls, self.distances, self.reference_transcripts))
+
+    def test_matches_all_pairs(self):
+        random.seed(1)
+        calls = []
+        for i in range(200):
+            fasta_id = random.choice([None, None, 'seq1', 'seq2'])
+            calls.append(self.build_call(
+                random.choice('ABC'), random.choice([PROTOCOL.GENOME, PROTOCOL.TRANS]),
+                random.randint(1, 300), random.randint(301, 600), fasta_id, random.choice([1, 2]) if fasta_id else None
+            ))
+        expected = {}
+        for current, other in itertools.combinations(calls, 2):
+            if current.library != other.library and pairing.inferred_equivalent(
+                    current, other, self.reference_transcripts, distances=self.distances):
+                expected.setdefault(pairing.product_key(current), set()).add(pairing.product_key(other))
+                expected.setdefault(pairing.product_key(other), set()).add(pairing.product_key(current))
+        self.assertEqual(expected, pairing.pair_by_product(calls, self.distances, self.reference_transcripts))
+
+
+class TestPairingMain(unittest.TestCase):
+
+    def setUp(self):
+        self.output = mkdtemp()
+        random.seed(1)
+        self.inputs = []
+        for library in ['A', 'B', 'C']:
+            calls = []
+            for i in range(40):
+                chrom = random.choice(['1', '2', '3'])
+                start = random.randint(1, 500)
+                fasta_id = random.choice([None, None, 'seq1'])
+                calls.append(BreakpointPair(
+                    Breakpoint(chrom, start, orient=ORIENT.LEFT),
+                    Breakpoint(chrom, start + random.randint(100, 300), orient=ORIENT.RIGHT),
+                    opposing_strands=False,
+                    data={
+                        COLUMNS.event_type: SVTYPE.DEL,
+                        COLUMNS.call_method: CALL_METHOD.SPLIT,
+                        COLUMNS.library: library,
+                        COLUMNS.protocol: random.choice([PROTOCOL.GENOME, PROTOCOL.TRANS]),
+                        COLUMNS.annotation_id: '{}-{}'.format(library, i),
+                        COLUMNS.gene1: random.choice([None, 'g1', 'g2']),
+                        COLUMNS.gene2: None,
+                        COLUMNS.transcript1: random.choice(['t1', 't2']),
+                        COLUMNS.transcript2: None,
+                        COLUMNS.fusion_sequence_fasta_id: fasta_id,
+                        COLUMNS.fusion_cdna_coding_start: 1 if fasta_id else None,
+                        COLUMNS.fusion_cdna_coding_end: 10 if fasta_id else None,
+                        COLUMNS.fusion_splicing_pattern: None
+                    }
+                ))
+            filename = os.path.join(self.output, 'annotations_{}.tab'.format(library))
+            output_tabbed_file(calls, filename)
+            self.inputs.append(filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.output)
+
+    def run_pairing(self, name, **kwargs):
+        output = os.path.join(self.output, name)
+        os.makedirs(output)
+        pairing_main(self.inputs, output, {}, **kwargs)
+        bpps = read_bpp_from_input_file(os.path.join(output, 'mavis_paired_A_B_C.tab'))
+        return {
+            bpp.data[COLUMNS.product_id]: (bpp.data[COLUMNS.pairing], bpp.data[COLUMNS.inferred_pairing]) for bpp in bpps
+        }
+
+    def test_workers_match_serial(self):
+        expected = self.run_pairing('serial')
+        self.assertTrue(any([distance for distance, inferred in expected.values()]))
+        self.assertTrue(any([inferred for distance, inferred in expected.values()]))
+        self.assertEqual(expected, self.run_pairing('workers', pairing_workers=2))
+        self.assertEqual(expected, self.run_pairing('load_shards', pairing_workers=2, pairing_load_shards=True))
+        self.assertEqual(expected, self.run_pairing('load_shards_serial', pairing_workers=1, pairing_load_shards=True))
+
+    def test_load_shards_parent_streams_inputs(self):
+        expected = self.run_pairing('serial')
+        chunk_sizes = []
+        parent = os.getpid()
+        read_pairing_inputs = pairing_module._read_pairing_inputs
+
+        def read_chunk(*pos, **kwargs):
+            bpps = read_bpp_from_input_file(*pos, **kwargs)
+            if os.getpid() == parent:
+                chunk_sizes.append(len(bpps))
+            return bpps
+
+        def read_all(inputs):
+            # the worker processes are forked from the parent so they see the patch too
+            self.assertNotEqual(parent, os.getpid(), 'the parent read a whole input file')
+            return read_pairing_inputs(inputs)
+
+        with mock.patch.object(pairing_module, '_READ_CHUNK_SIZE', 10), \
+                mock.patch.object(pairing_module, 'read_bpp_from_input_file', side_effect=read_chunk), \
+                mock.patch.object(pairing_module, '_read_pairing_inputs', side_effect=read_all):
+            result = self.run_pairing('load_shards', pairing_workers=2, pairing_load_shards=True)
+        self.assertEqual(expected, result)
+        # the parent only ever converts one chunk of rows at a time and never loads the whole input
+        self.assertTrue(chunk_sizes)
+        self.assertLessEqual(max(chunk_sizes), 10)
+        self.assertEqual([], [f for f in os.listdir(os.path.join(self.output, 'load_shards')) if 'shard' in f])
+
+    def test_write_shard_inputs(self):
+        bpps = pairing_module._read_pairing_inputs(self.inputs)
+        categories = sorted({_pairing_category(pairing_module.DISTANCE_PAIRING, bpp) for bpp in bpps})
+        shards = {pairing_module.DISTANCE_PAIRING: [categories[:1], categories[1:]]}
+        shard_files = _write_shard_inputs(self.inputs, shards, self.output)
+        total = 0
+        for shard, filename in zip(shards[pairing_module.DISTANCE_PAIRING], shard_files[pairing_module.DISTANCE_PAIRING]):
+            rows = pairing_module._read_pairing_inputs([filename])
+            self.assertTrue(rows)
+            for bpp in rows:
+                self.assertIn(_pairing_category(pairing_module.DISTANCE_PAIRING, bpp), shard)
+            total += len(rows)
+        self.assertEqual(len(bpps), total)
+
+    def test_shard_categories(self):
+        category_sizes = {'a': 5, 'b': 4, 'c': 3, 'd': 2}
+        shards = _shard_categories(category_sizes, 2)
+        self.assertEqual([['a', 'd'], ['b', 'c']], shards)
+        self.assertEqual([['a', 'b', 'c', 'd']], _shard_categories(category_sizes, 1))
+        self.assertEqual(4, len(_shard_categories(category_sizes, 10)))
@@ -1,10 +1,11 @@
 import os
+import random
 import unittest
 
-from mavis.annotate.constants import SPLICE_SITE_RADIUS, SPLICE_TYPE
 from mavis.annotate.file_io import load_annotations, load_reference_genome
 from mavis.annotate.genomic import Exon, PreTranscript
-from mavis.annotate.splicing import predict_splice_sites
+from mavis.annotate.constants import ACCEPTOR_SEQ, DONOR_SEQ, SPLICE_SEQ_ANCHORS, SPLICE_SITE_RADIUS, SPLICE_SITE_TYPE, SPLICE_TYPE
+from mavis.annotate.splicing import _scan_motif, predict_splice_sites
 from mavis.annotate.variant import annotate_events
 from mavis.breakpoint import Breakpoint, BreakpointPair
 from mavis.constants import PROTOCOL, reverse_complement, STRAND, SVTYPE
@@ -295,6 +296,30 @@ class TestPredictSpliceSites(unittest.TestCase):
             self.assertEqual(d.seq, gimap4_seq[d.start - 1:d.end])
         self.assertEqual(5, len(donors))
 
+    def test_motif_anchors(self):
+        random.seed(1)
+        for i in range(200):
+            seq = ''.join([random.choice('ACGT') for j in range(500)])
+            for regex in DONOR_SEQ + ACCEPTOR_SEQ:
+                offset, literal = SPLICE_SEQ_ANCHORS[regex]
+                expected = [(m.start(), m.end()) for m in regex.finditer(seq)]
+                for start, end in expected:
+                    self.assertEqual(literal, seq[start + offset:start + offset + len(literal)])
+                self.assertEqual(expected, [(m.start(), m.end()) for m in _scan_motif(regex, seq, {})])
+
+    def test_overlapping_motifs(self):
+        # overlapping matches of the same pattern are not reported (as with re.finditer)
+        seq = 'CCAGGTAAGGTAAGTT'
+        sites = predict_splice_sites(seq)
+        donors = [s for s in sites if s.type == SPLICE_SITE_TYPE.DONOR]
+        expected = []
+        for regex in DONOR_SEQ:
+            for match in regex.finditer(seq):
+                expected.append(match.start() + len(match.group(1)))
+        self.assertEqual(sorted(set(expected)), sorted([d.pos for d in donors]))
+        for site in sites:
+            self.assertEqual(site.seq, seq[site.start - 1:site.end])
+
     def test_fusion_with_novel_splice_site(self):
         raise unittest.SkipTest('TODO: dependent functionality not yet implemented')
         bpp = BreakpointPair(
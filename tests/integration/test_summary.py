@@ -0,0 +1,106 @@
+import os
+import random
+import shutil
+from tempfile import mkdtemp
+import unittest
+
+from mavis.breakpoint import Breakpoint, BreakpointPair
+from mavis.constants import CALL_METHOD, COLUMNS, DISEASE_STATUS, ORIENT, PROTOCOL, SVTYPE
+from mavis.summary.main import main as summary_main
+from mavis.util import output_tabbed_file
+
+
+def read_rows(filename):
+    with open(filename, 'r') as fh:
+        header = fh.readline()
+        return header, sorted(fh.readlines())
+
+
+class TestSummaryMain(unittest.TestCase):
+
+    def setUp(self):
+        self.output = mkdtemp()
+        random.seed(1)
+        self.libraries = {
+            'A': (PROTOCOL.GENOME, DISEASE_STATUS.DISEASED),
+            'B': (PROTOCOL.GENOME, DISEASE_STATUS.NORMAL),
+            'C': (PROTOCOL.TRANS, DISEASE_STATUS.DISEASED)
+        }
+        self.calls = []
+        for library, (protocol, disease_status) in sorted(self.libraries.items()):
+            for i in range(60):
+                chrom = random.choice(['1', '2', '3'])
+                start = random.randint(1, 300)
+                fasta_id = random.choice([None, None, 'seq1'])
+                call_method = random.choice([CALL_METHOD.SPLIT, CALL_METHOD.SPLIT, CALL_METHOD.CONTIG])
+                self.calls.append(BreakpointPair(
+                    Breakpoint(chrom, start, orient=ORIENT.LEFT),
+                    Breakpoint(chrom, start + random.randint(100, 200), orient=ORIENT.RIGHT),
+                    opposing_strands=False,
+                    data={
+                        COLUMNS.event_type: SVTYPE.DEL,
+                        COLUMNS.call_method: call_method,
+                        COLUMNS.library: library,
+                        COLUMNS.protocol: protocol,
+                        COLUMNS.disease_status: disease_status,
+                        COLUMNS.annotation_id: '{}-{}'.format(library, i),
+                        COLUMNS.product_id: '{}-{}'.format(library, i),
+                        COLUMNS.tracking_id: '{}-{}'.format(library, i),
+                        COLUMNS.pairing: ';'.join(
+                            ['{}-{}'.format(lib, i) for lib in self.libraries if lib != library and random.random() < 0.3]),
+                        COLUMNS.inferred_pairing: '',
+                        COLUMNS.gene1: random.choice([None, 'g1']),
+                        COLUMNS.gene1_direction: None,
+                        COLUMNS.gene2: None,
+                        COLUMNS.gene2_direction: None,
+                        COLUMNS.gene_product_type: None,
+                        COLUMNS.genes_encompassed: None,
+                        COLUMNS.transcript1: random.choice(['t1', 't2']),
+                        COLUMNS.transcript2: None,
+                        COLUMNS.fusion_sequence_fasta_id: fasta_id,
+                        COLUMNS.fusion_cdna_coding_start: 1 if fasta_id else None,
+                        COLUMNS.fusion_cdna_coding_end: 10 if fasta_id else None,
+                        COLUMNS.fusion_splicing_pattern: None,
+                        COLUMNS.fusion_mapped_domains: None,
+                        COLUMNS.tools: 'manta',
+                        COLUMNS.exon_last_5prime: None,
+                        COLUMNS.exon_first_3prime: None,
+                        COLUMNS.break1_split_reads: random.randint(0, 10),
+                        COLUMNS.break2_split_reads: random.randint(0, 10),
+                        COLUMNS.break1_split_reads_forced: 0,
+                        COLUMNS.break2_split_reads_forced: 0,
+                        COLUMNS.linking_split_reads: random.randint(0, 3),
+                        COLUMNS.contig_remapped_reads: random.randint(0, 10),
+                        COLUMNS.protein_synon: random.choice([None, None, None, 'p.1A>A'])
+                    }
+                ))
+
+    def tearDown(self):
+        shutil.rmtree(self.output)
+
+    def run_summary(self, name, calls, **kwargs):
+        output = os.path.join(self.output, name)
+        os.makedirs(output)
+        filename = os.path.join(self.output, name + '.tab')
+        output_tabbed_file(calls, filename)
+        summary_main([filename], output, {}, **kwargs)
+        return output
+
+    def test_streaming_matches_summary(self):
+        calls = sorted(self.calls, key=lambda b: (b.library, b.break1.chr, b.break2.chr))
+        expected = self.run_summary('summary', calls)
+        result = self.run_summary('streaming', calls, summary_streaming=True)
+        filenames = sorted(os.listdir(expected))
+        self.assertEqual(filenames, sorted(os.listdir(result)))
+        for filename in filenames:
+            if not filename.endswith('.tab'):
+                continue
+            header, rows = read_rows(os.path.join(expected, filename))
+            self.assertTrue(rows)
+            self.assertEqual((header, rows), read_rows(os.path.join(result, filename)))
+
+    def test_streaming_error_on_unsorted_groups(self):
+        calls = sorted(self.calls, key=lambda b: b.data[COLUMNS.annotation_id])
+        calls = calls[1:] + calls[:1]
+        with self.assertRaises(AssertionError):
+            self.run_summary('streaming', calls, summary_streaming=True)
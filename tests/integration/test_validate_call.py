@@ -849,6 +849,45 @@ class TestCallBySupportingReads(unittest.TestCase):
         self.assertEqual(1, len(b1 & b2))
 
 
+class TestTallySplitReadPositions(unittest.TestCase):
+    def test_filter_by_read_counts(self):
+        reads = [
+            MockRead(query_name='t1', reference_start=100, cigar=[(CIGAR.S, 20), (CIGAR.EQ, 20)], query_sequence='A' * 40),
+            MockRead(query_name='t2', reference_start=100, cigar=[(CIGAR.S, 20), (CIGAR.EQ, 20)], query_sequence='C' * 40),
+            MockRead(query_name='t3', reference_start=200, cigar=[(CIGAR.S, 20), (CIGAR.EQ, 20)], query_sequence='G' * 40),
+            MockRead(query_name='t4', reference_start=300, cigar=[(CIGAR.EQ, 40)], query_sequence='T' * 40)
+        ]
+        name_ids = {}
+        seq_ids = {}
+        pos_reads, pos_names, pos_seqs = call._tally_split_read_positions(reads, ORIENT.RIGHT, name_ids, seq_ids, min_reads=2)
+        self.assertEqual({101: set(reads[:2])}, pos_reads)
+        self.assertEqual({101: {name_ids['t1']: 1, name_ids['t2']: 1}}, pos_names)
+        self.assertEqual(2, len(pos_seqs[101]))
+
+    def test_filter_by_non_target_counts(self):
+        reads = [
+            MockRead(query_name='t1', reference_start=100, cigar=[(CIGAR.S, 20), (CIGAR.EQ, 20)], query_sequence='A' * 40),
+            MockRead(
+                query_name='t2', reference_start=100, cigar=[(CIGAR.S, 20), (CIGAR.EQ, 20)], query_sequence='C' * 40,
+                tags=[(PYSAM_READ_FLAGS.TARGETED_ALIGNMENT, 1)]
+            )
+        ]
+        pos_reads, pos_names, pos_seqs = call._tally_split_read_positions(reads, ORIENT.RIGHT, {}, {}, min_non_target_reads=2)
+        self.assertEqual({}, pos_reads)
+        pos_reads, pos_names, pos_seqs = call._tally_split_read_positions(reads, ORIENT.RIGHT, {}, {}, min_non_target_reads=1)
+        self.assertEqual({101: set(reads)}, pos_reads)
+
+    def test_shared_name_encoding(self):
+        name_ids = {}
+        seq_ids = {}
+        read1 = MockRead(query_name='t1', reference_start=100, cigar=[(CIGAR.S, 20), (CIGAR.EQ, 20)], query_sequence='A' * 40)
+        read2 = MockRead(query_name='t1', reference_start=500, cigar=[(CIGAR.S, 20), (CIGAR.EQ, 20)], query_sequence='A' * 40)
+        names1 = call._tally_split_read_positions([read1], ORIENT.RIGHT, name_ids, seq_ids)[1]
+        names2 = call._tally_split_read_positions([read2], ORIENT.RIGHT, name_ids, seq_ids)[1]
+        self.assertEqual(names1[101], names2[501])
+        self.assertEqual(1, len(seq_ids))
+
+
 class TestCallByFlankingReadsGenome(unittest.TestCase):
 
     def setUp(self):
@@ -942,6 +981,103 @@ class TestCallByFlankingReadsGenome(unittest.TestCase):
         with self.assertRaises(AssertionError):
             call._call_by_flanking_pairs(self.ev_LR, SVTYPE.DEL)
 
+    def test_cluster_flanking_pairs_by_position(self):
+        pair1 = mock_read_pair(
+            MockRead(reference_start=19, reference_end=60, next_reference_start=599, query_alignment_length=25),
+            MockRead(reference_start=599, reference_end=650, next_reference_start=19, query_alignment_length=25, is_reverse=True)
+        )
+        pair2 = mock_read_pair(
+            MockRead(reference_start=39, reference_end=80, next_reference_start=649, query_alignment_length=25),
+            MockRead(reference_start=649, reference_end=675, next_reference_start=39, query_alignment_length=25, is_reverse=True)
+        )
+        pair3 = mock_read_pair(
+            MockRead(reference_start=379, reference_end=420, next_reference_start=1499, query_alignment_length=25),
+            MockRead(reference_start=1499, reference_end=1550, next_reference_start=379, query_alignment_length=25, is_reverse=True)
+        )
+        clusters = call._cluster_flanking_pairs(self.ev_LR, SVTYPE.DEL, {pair1, pair2, pair3})
+        self.assertEqual([{pair1, pair2}, {pair3}], clusters)
+
+    def test_cluster_flanking_pairs_by_fragment_size(self):
+        pair1 = mock_read_pair(
+            MockRead(reference_start=19, reference_end=60, next_reference_start=599, query_alignment_length=25, template_length=650),
+            MockRead(reference_start=599, reference_end=650, next_reference_start=19, query_alignment_length=25, is_reverse=True)
+        )
+        pair2 = mock_read_pair(
+            MockRead(reference_start=39, reference_end=80, next_reference_start=649, query_alignment_length=25, template_length=1500),
+            MockRead(reference_start=649, reference_end=675, next_reference_start=39, query_alignment_length=25, is_reverse=True)
+        )
+        clusters = call._cluster_flanking_pairs(self.ev_LR, SVTYPE.DEL, {pair1, pair2})
+        self.assertEqual([{pair1}, {pair2}], clusters)
+
+    def flanking_pair(self, read_end, mate_start, template_length=600):
+        return mock_read_pair(
+            MockRead(
+                reference_start=read_end - 41, reference_end=read_end, next_reference_start=mate_start - 1,
+                query_alignment_length=25, template_length=template_length
+            ),
+            MockRead(
+                reference_start=mate_start - 1, reference_end=mate_start + 50, next_reference_start=read_end - 41,
+                query_alignment_length=25, is_reverse=True
+            )
+        )
+
+    def test_cluster_flanking_pairs_by_mate_position(self):
+        pair1 = self.flanking_pair(60, 600)
+        pair2 = self.flanking_pair(80, 1500)
+        pair3 = self.flanking_pair(100, 620)
+        clusters = call._cluster_flanking_pairs(self.ev_LR, SVTYPE.DEL, {pair1, pair2, pair3})
+        self.assertEqual([{pair1, pair3}, {pair2}], clusters)
+
+    def test_cluster_flanking_pairs_chained(self):
+        # consecutive pairs are within range but the first and last are not
+        pairs = [self.flanking_pair(60 + i * 90, 600 + i * 90) for i in range(3)]
+        self.assertEqual([set(pairs)], call._cluster_flanking_pairs(self.ev_LR, SVTYPE.DEL, set(pairs)))
+        # a later pair linking two open clusters merges them
+        pair1 = self.flanking_pair(60, 600)
+        pair2 = self.flanking_pair(70, 800)
+        pair3 = self.flanking_pair(100, 700)
+        self.assertEqual(
+            [{pair1, pair2, pair3}], call._cluster_flanking_pairs(self.ev_LR, SVTYPE.DEL, {pair1, pair2, pair3}))
+
+    def test_failed_clusters_combined_error(self):
+        self.ev_LR.min_flanking_pairs_resolution = 3
+        self.ev_LR.flanking_pairs.update([self.flanking_pair(60, 600), self.flanking_pair(80, 1500)])
+        with self.assertRaises(UserWarning) as context:
+            call.call_events(self.ev_LR)
+        message = str(context.exception)
+        self.assertIn('flanking call (deletion) failed for all 2 clusters of flanking pairs', message)
+        self.assertEqual(1, message.count('to call deletion by flanking reads'))
+
+    def test_cluster_flanking_pairs_ignores_normal_fragments(self):
+        pair = mock_read_pair(
+            MockRead(reference_start=39, reference_end=50, next_reference_start=91, query_alignment_length=25),
+            MockRead(reference_start=91, reference_end=110, next_reference_start=39, query_alignment_length=25, is_reverse=True)
+        )
+        self.assertEqual([], call._cluster_flanking_pairs(self.ev_LR, SVTYPE.DEL, {pair}))
+
+    def test_flanking_pair_selection_remove_outlier(self):
+        pairs = [
+            mock_read_pair(
+                MockRead(reference_start=19, reference_end=60, next_reference_start=599, query_alignment_length=25),
+                MockRead(reference_start=599, reference_end=650, next_reference_start=19, query_alignment_length=25, is_reverse=True)
+            ),
+            mock_read_pair(
+                MockRead(reference_start=39, reference_end=80, next_reference_start=649, query_alignment_length=25),
+                MockRead(reference_start=649, reference_end=675, next_reference_start=39, query_alignment_length=25, is_reverse=True)
+            ),
+            mock_read_pair(
+                MockRead(reference_start=299, reference_end=350, next_reference_start=899, query_alignment_length=25),
+                MockRead(reference_start=899, reference_end=950, next_reference_start=299, query_alignment_length=25, is_reverse=True)
+            )
+        ]
+        fragments = [Interval(500), Interval(520), Interval(900)]
+        selection = call._FlankingPairSelection(pairs, fragments, ORIENT.LEFT, ORIENT.RIGHT)
+        self.assertEqual((Interval(36, 350), Interval(600, 924)), selection.coverage_intervals())
+        selection.remove_farthest_fragment()
+        self.assertEqual(2, selection.count)
+        self.assertEqual(pairs[:2], selection.selected_pairs())
+        self.assertEqual((Interval(36, 80), Interval(600, 674)), selection.coverage_intervals())
+
     def test_close_to_zero(self):
         # this test is for ensuring that if a theoretical window calculated for the
         # first breakpoint overlaps the actual coverage for the second breakpoint (or the reverse)
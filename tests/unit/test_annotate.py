@@ -2,8 +2,9 @@ import itertools
 import os
 import unittest
 
-from mavis.annotate.base import ReferenceName
-from mavis.annotate.protein import calculate_orf, Domain, DomainRegion
+from mavis.annotate.base import ReferenceName, SequenceCache
+from mavis.annotate.protein import _diagonal_match_counts, _sequence_array, _unique_ordered_chain, calculate_orf, Domain, DomainRegion
+from mavis.interval import Interval
 from mavis.annotate.variant import IndelCall
 import timeout_decorator
 
@@ -12,6 +13,43 @@ from .mock import Mock, MockFunction
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 
 
+class TestSequenceCache(unittest.TestCase):
+
+    def test_hit_and_miss(self):
+        cache = SequenceCache()
+        compute = MockFunction('ACGT')
+        self.assertEqual('ACGT', cache.fetch(('seq', 1), compute))
+        self.assertEqual('ACGT', cache.fetch(('seq', 1), compute))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(1, cache.misses)
+        self.assertEqual(1, len(cache))
+
+    def test_evicts_least_recently_used(self):
+        cache = SequenceCache(max_length=10)
+        cache.fetch(('a', ), lambda: 'AAAA')
+        cache.fetch(('b', ), lambda: 'CCCC')
+        cache.fetch(('a', ), lambda: 'XXXX')  # hit, a is now most recently used
+        cache.fetch(('c', ), lambda: 'GGGG')
+        self.assertEqual(2, len(cache))
+        self.assertEqual(10, cache.length)  # includes the key strings
+        self.assertEqual('AAAA', cache.fetch(('a', ), lambda: 'XXXX'))
+        self.assertEqual('TTTT', cache.fetch(('b', ), lambda: 'TTTT'))
+
+    def test_key_sequence_counts_towards_length(self):
+        cache = SequenceCache(max_length=10)
+        self.assertEqual('A', cache.fetch(('cdna', 'ACGTACGTACGT'), lambda: 'A'))
+        self.assertEqual(0, len(cache))
+        self.assertEqual(0, cache.length)
+
+    def test_clear(self):
+        cache = SequenceCache()
+        cache.fetch(('a', ), lambda: 'AAAA')
+        cache.clear()
+        self.assertEqual(0, len(cache))
+        self.assertEqual(0, cache.length)
+        self.assertEqual(0, cache.misses)
+
+
 class TestDomainAlignSeq(unittest.TestCase):
 
     def test_large_combinations_finishes_with_error(self):
@@ -289,6 +327,49 @@ class TestCalculateORF(unittest.TestCase):
         calculate_orf(self.seq, 300)
 
 
+class TestDomainAlignHelpers(unittest.TestCase):
+
+    def test_diagonal_match_counts(self):
+        scores = _diagonal_match_counts(_sequence_array('ABCABD'), _sequence_array('abd'))
+        self.assertEqual([2, 0, 0, 3], scores.tolist())
+
+    def test_diagonal_match_counts_query_longer(self):
+        self.assertEqual(0, len(_diagonal_match_counts(_sequence_array('AB'), _sequence_array('ABC'))))
+
+    def test_unique_ordered_chain(self):
+        chain = _unique_ordered_chain([[Interval(1, 3), Interval(8, 10)], [Interval(5, 7)]])
+        self.assertEqual([Interval(1, 3), Interval(5, 7)], chain)
+
+    def test_unique_ordered_chain_multiple(self):
+        with self.assertRaises(UserWarning):
+            _unique_ordered_chain([[Interval(1, 3), Interval(2, 4)], [Interval(5, 7)]])
+
+    def test_unique_ordered_chain_none(self):
+        with self.assertRaises(UserWarning):
+            _unique_ordered_chain([[Interval(5, 7)], [Interval(1, 3)]])
+
+
+class TestCalculateORFScan(unittest.TestCase):
+
+    def test_orfs_by_frame(self):
+        # frame 0: ATG TAA and ATG ATG CCC TGA (the second start codon is ignored), frame 1: ATG CCA TGT AAA TGA
+        seq = 'CATGCCATGTAAATGATGCCCTGA'
+        orfs = calculate_orf(seq)
+        self.assertEqual([(7, 12), (13, 24), (2, 16)], [(o.start, o.end) for o in orfs])
+
+    def test_min_orf_size(self):
+        seq = 'CATGCCATGTAAATGATGCCCTGA'
+        self.assertEqual([(13, 24), (2, 16)], [(o.start, o.end) for o in calculate_orf(seq, min_orf_size=12)])
+
+    def test_ambiguous_rna_and_lowercase_codons(self):
+        self.assertEqual([(1, 9)], [(o.start, o.end) for o in calculate_orf('augNNNtar')])
+        self.assertEqual([], calculate_orf('ATGNNNTAN'))  # TAN is not necessarily a stop
+
+    def test_invalid_characters_raise(self):
+        with self.assertRaises(Exception):
+            calculate_orf('ATG?CCTAA')
+
+
 class TestReferenceName(unittest.TestCase):
     def test_naked_vs_naked_str(self):
         self.assertEqual('1', ReferenceName('1'))
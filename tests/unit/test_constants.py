@@ -24,6 +24,16 @@ class TestConstants(unittest.TestCase):
         self.assertEqual('ATCG', reverse_complement('CGAT'))
         self.assertEqual('', reverse_complement(''))
 
+    def test_reverse_complement_ambiguous(self):
+        self.assertEqual('NnYRacgT', reverse_complement('AcgtYRnN'))
+        with self.assertRaises(ValueError):
+            reverse_complement('AC-GT')
+
+    def test_translate_ambiguous(self):
+        self.assertEqual('KXPX', translate('aaaNNNCCNTAN'))
+        self.assertEqual('R', translate('MGR'))
+        self.assertEqual('-', translate('---'))
+
     def test_translate(self):
         seq = 'ATG' 'AAT' 'TCT' 'GGA' 'TGA'
         translated_seq = translate(seq, 0)
@@ -1,5 +1,6 @@
 import unittest
-from mavis.illustrate.util import generate_interval_mapping
+from mavis.error import DrawingFitError
+from mavis.illustrate.util import generate_interval_mapping, minimum_mapping_width
 from mavis.interval import Interval
 
 
@@ -16,3 +17,13 @@ class TestGenerateIntervalMapping(unittest.TestCase):
         min_inter = 10
         m = generate_interval_mapping(regions, target, ratio, min_width, buffer_, start, end, min_inter)
         self.assertEqual(7, len(m.keys()))
+
+    def test_minimum_width(self):
+        regions = [Interval(4222347, 4222347), Interval(4221673, 4221903), Interval(2792992, 4852494)]
+        start = 2791992
+        end = 4853494
+        width = minimum_mapping_width(regions, 60, start=start, end=end, min_inter_width=10)
+        self.assertEqual(5 * 60 + 2 * 10, width)
+        generate_interval_mapping(regions, width, 5, 60, None, start, end, 10)
+        with self.assertRaises(DrawingFitError):
+            generate_interval_mapping(regions, width - 1, 5, 60, None, start, end, 10)
@@ -1,8 +1,12 @@
+import random
 import unittest
 
+from mavis.annotate.base import BioInterval
 from mavis.breakpoint import Breakpoint, BreakpointPair
-from mavis.constants import CALL_METHOD, COLUMNS, PROTOCOL, STRAND, SVTYPE
-from mavis.summary.summary import filter_by_annotations
+from mavis.constants import CALL_METHOD, COLUMNS, ORIENT, PROTOCOL, STRAND, SVTYPE
+from mavis.pairing.pairing import pair_by_distance, product_key
+from mavis.summary.summary import annotate_dgv, filter_by_annotations, group_by_distance, group_events, index_dgv_regions
+from mavis.util import get_connected_components
 
 
 class TestFilterByAnnotations(unittest.TestCase):
@@ -144,3 +148,138 @@ class TestFilterByAnnotations(unittest.TestCase):
 
     def test_get_pairing_state(self):
         raise unittest.SkipTest('TODO')
+
+
+class TestAnnotateDgv(unittest.TestCase):
+
+    def setUp(self):
+        self.regions = {'1': [
+            BioInterval('1', 5000, 9000, name='dgv3'),
+            BioInterval('1', 100, 300, name='dgv1'),
+            BioInterval('1', 1000, 2000, name='dgv2')
+        ]}
+
+    def build_call(self, start, end, chrom2='1'):
+        return BreakpointPair(Breakpoint('1', start), Breakpoint(chrom2, end), opposing_strands=False)
+
+    def test_match_past_first_region(self):
+        bpp = self.build_call(1005, 1995)
+        annotate_dgv([bpp], self.regions, distance=10)
+        self.assertEqual('dgv2(1:1000-2000)', bpp.data['dgv'])
+
+    def test_no_match(self):
+        bpps = [self.build_call(1011, 1995), self.build_call(1000, 2011), self.build_call(1000, 2000, '2')]
+        annotate_dgv(bpps, self.regions, distance=10)
+        self.assertEqual([None, None, None], [bpp.data.get('dgv') for bpp in bpps])
+
+    def test_regions_not_modified(self):
+        index = index_dgv_regions(self.regions)
+        self.assertEqual([100, 1000, 5000], index['1'][0])
+        self.assertEqual('dgv3', self.regions['1'][0].name)
+
+    def test_matches_scan(self):
+        random.seed(1)
+        regions = []
+        for i in range(500):
+            start = random.randint(1, 20000)
+            regions.append(BioInterval('1', start, start + random.randint(1, 2000), name='dgv{}'.format(i)))
+        bpps = []
+        for i in range(500):
+            start = random.randint(1, 20000)
+            bpps.append(self.build_call(start, start + random.randint(1, 2000)))
+        annotate_dgv(bpps, {'1': regions}, distance=50)
+        for bpp in bpps:
+            expected = None
+            for region in sorted(regions, key=lambda x: x.start):
+                if abs(bpp.break1.start - region.start) <= 50 and abs(bpp.break2.start - region.end) <= 50:
+                    expected = '{}(1:{}-{})'.format(region.name, region.start, region.end)
+            self.assertEqual(expected, bpp.data.get('dgv'))
+
+
+class TestGroupByDistance(unittest.TestCase):
+
+    def build_call(
+        self, start, end, annotation_id, orient1=ORIENT.LEFT, orient2=ORIENT.RIGHT, event_type=SVTYPE.DEL,
+        call_method=CALL_METHOD.SPLIT, library='library'
+    ):
+        return BreakpointPair(
+            Breakpoint('1', start, orient=orient1),
+            Breakpoint('1', end, orient=orient2),
+            opposing_strands=orient1 == orient2,
+            data={
+                COLUMNS.event_type: event_type,
+                COLUMNS.call_method: call_method,
+                COLUMNS.library: library,
+                COLUMNS.protocol: PROTOCOL.GENOME,
+                COLUMNS.annotation_id: annotation_id,
+                COLUMNS.fusion_splicing_pattern: None,
+                COLUMNS.fusion_cdna_coding_start: None,
+                COLUMNS.fusion_cdna_coding_end: None
+            }
+        )
+
+    def test_transitive_group(self):
+        # a-b and b-c are within the split distance but a-c is not
+        calls = [self.build_call(100, 1000, 'a'), self.build_call(115, 1000, 'b'), self.build_call(130, 1000, 'c')]
+        grouped, removed = group_by_distance(calls, {CALL_METHOD.SPLIT: 20})
+        self.assertEqual(1, len(grouped))
+        self.assertEqual(3, len(removed))
+        self.assertEqual(100, grouped[0].break1.start)
+        self.assertEqual(130, grouped[0].break1.end)
+        self.assertEqual('a;b;c', grouped[0].data[COLUMNS.annotation_id])
+
+    def test_no_group(self):
+        calls = [self.build_call(100, 1000, 'a'), self.build_call(200, 1000, 'b')]
+        grouped, removed = group_by_distance(calls, {CALL_METHOD.SPLIT: 20})
+        self.assertEqual(calls, grouped)
+        self.assertEqual([], removed)
+
+    def test_same_product_key_not_grouped(self):
+        calls = [self.build_call(100, 1000, 'a'), self.build_call(500, 2000, 'a'), self.build_call(900, 3000, 'b')]
+        grouped, removed = group_by_distance(calls, {CALL_METHOD.SPLIT: 20})
+        self.assertEqual(calls, grouped)
+        self.assertEqual([], removed)
+
+    def test_matches_connected_components(self):
+        random.seed(1)
+        distances = {CALL_METHOD.CONTIG: 5, CALL_METHOD.SPLIT: 20, CALL_METHOD.FLANK: 100}
+        event_types = [
+            (ORIENT.LEFT, ORIENT.RIGHT, SVTYPE.DEL), (ORIENT.RIGHT, ORIENT.LEFT, SVTYPE.DUP),
+            (ORIENT.LEFT, ORIENT.LEFT, SVTYPE.INV), (ORIENT.RIGHT, ORIENT.RIGHT, SVTYPE.INV)
+        ]
+        calls = []
+        for i in range(300):
+            orient1, orient2, event_type = random.choice(event_types)
+            start = random.randint(1, 10000)
+            # a small pool of annotation ids so that some calls share a product key
+            annotation_id = '{}{}-{}'.format(orient1, orient2, random.randint(1, 40))
+            calls.append(self.build_call(
+                start, start + random.randint(1, 500), annotation_id, orient1, orient2, event_type,
+                call_method=random.choice(list(distances)), library=random.choice(['library1', 'library2'])
+            ))
+        # group the connected components of all the pairs (the previous implementation)
+        mapping = {}
+        for call in calls:
+            mapping.setdefault(product_key(call), []).append(call)
+        expected_grouped = []
+        expected_removed = []
+        for component in get_connected_components(pair_by_distance(calls, distances, against_self=True)):
+            if len(component) == 1:
+                expected_grouped.extend(mapping[component.pop()])
+            else:
+                pairs = []
+                for key in component:
+                    pairs.extend(mapping[key])
+                expected_grouped.append(group_events(pairs))
+                expected_removed.extend(pairs)
+
+        def signature(call):
+            return (
+                call.break1.start, call.break1.end, call.break1.orient, call.break2.start, call.break2.end,
+                call.break2.orient, str(call.data[COLUMNS.annotation_id]), str(call.data.get(COLUMNS.library))
+            )
+        grouped, removed = group_by_distance(calls, distances)
+        self.assertLess(0, len(removed))
+        self.assertTrue(any([len(group) > 1 for group in mapping.values()]))
+        self.assertEqual(sorted([signature(c) for c in expected_grouped]), sorted([signature(c) for c in grouped]))
+        self.assertEqual(sorted([id(c) for c in expected_removed]), sorted([id(c) for c in removed]))
@@ -0,0 +1,129 @@
+"""
+Script used to compare the scaling of the grid indexed pair_by_distance against the previous implementation (sorting the
+calls by each breakpoint and scanning forward) on synthetic cohorts of calls
+"""
+import argparse
+import random
+import time
+
+from mavis.breakpoint import Breakpoint, BreakpointPair
+from mavis.constants import CALL_METHOD, COLUMNS, ORIENT, PROTOCOL, SVTYPE
+from mavis.interval import Interval
+from mavis.pairing.constants import PAIRING_DISTANCES
+from mavis.pairing.pairing import equivalent, pair_by_distance, product_key
+from mavis.util import log
+
+
+def parse_arguments():
+    """
+    parse command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--calls', default=[1000, 2000, 4000, 8000], type=int, nargs='+', metavar='INT',
+        help='number of calls in each synthetic cohort')
+    parser.add_argument('--libraries', default=24, type=int, metavar='INT', help='number of libraries in the cohort')
+    parser.add_argument(
+        '--hotspot_fraction', default=0.3, type=float, metavar='FLOAT',
+        help='fraction of the events which fall in a single dense region (ex. an immunoglobulin locus)')
+    parser.add_argument('--seed', default=1, type=int, metavar='INT', help='seed for generating the random calls')
+    parser.add_argument(
+        '--skip_previous', default=False, action='store_true',
+        help='only time the current implementation (the previous implementation is very slow for large cohorts)')
+    return parser.parse_args()
+
+
+def scan_pair_by_distance(calls, distances, against_self=False):
+    """
+    the previous implementation of pair_by_distance
+    """
+    distance_pairings = {}
+    break1_sorted = sorted(calls, key=lambda b: b.break1.start)
+    break2_sorted = sorted(calls, key=lambda b: b.break2.start)
+    lowest_resolution = max([len(b.break1) for b in calls] + [len(b.break2) for b in calls] + [1])
+    max_distance = max(distances.values())
+    max_useq = max([len(c.untemplated_seq) if c.untemplated_seq else 0 for c in calls] + [0])
+    max_distance += max_useq * 2
+
+    for sorted_calls, attr in [(break1_sorted, 'break1'), (break2_sorted, 'break2')]:
+        for i in range(0, len(sorted_calls)):
+            current = sorted_calls[i]
+            distance_pairings.setdefault(product_key(current), set())
+            for j in range(i + 1, len(sorted_calls)):
+                other = sorted_calls[j]
+                if abs(Interval.dist(getattr(current, attr), getattr(other, attr))) > max_distance + lowest_resolution:
+                    break
+                if not against_self and current.library == other.library and current.protocol == other.protocol:
+                    continue
+                if equivalent(current, other, distances=distances):
+                    distance_pairings[product_key(current)].add(product_key(other))
+                    distance_pairings.setdefault(product_key(other), set()).add(product_key(current))
+    return distance_pairings
+
+
+def synthetic_cohort(total_calls, libraries, hotspot_fraction):
+    """
+    generates calls for events shared between random subsets of the libraries. The calls for the same event are
+    jittered within the pairing distance of their call method
+    """
+    calls = []
+    methods = [CALL_METHOD.CONTIG, CALL_METHOD.SPLIT, CALL_METHOD.SPAN, CALL_METHOD.FLANK]
+    hotspot = 1000000
+    while len(calls) < total_calls:
+        if random.random() < hotspot_fraction:
+            # breakpoints clustered on one side with a diverse partner breakpoint
+            start = hotspot + random.randint(0, 2000)
+            end = start + random.randint(50, 5000000)
+        else:
+            start = random.randint(1, 200000000)
+            end = start + random.randint(50, 50000)
+        event_type = random.choice([SVTYPE.DEL, SVTYPE.DUP])
+        for library in random.sample(range(libraries), random.randint(1, min(libraries, 6))):
+            method = random.choice(methods)
+            jitter = PAIRING_DISTANCES[method] // 2
+            untemplated_seq = ''.join([random.choice('ACTG') for i in range(random.randint(0, 5))])
+            bpp = BreakpointPair(
+                Breakpoint('1', start + random.randint(0, jitter), orient=ORIENT.LEFT),
+                Breakpoint('1', end + random.randint(0, jitter), orient=ORIENT.RIGHT),
+                opposing_strands=False,
+                untemplated_seq=untemplated_seq,
+                data={
+                    COLUMNS.event_type: event_type,
+                    COLUMNS.call_method: method,
+                    COLUMNS.library: 'library{}'.format(library),
+                    COLUMNS.protocol: PROTOCOL.GENOME,
+                    COLUMNS.annotation_id: len(calls),
+                    COLUMNS.fusion_splicing_pattern: None,
+                    COLUMNS.fusion_cdna_coding_start: None,
+                    COLUMNS.fusion_cdna_coding_end: None
+                }
+            )
+            calls.append(bpp)
+    return calls[:total_calls]
+
+
+def main():
+    args = parse_arguments()
+    random.seed(args.seed)
+    distances = dict(PAIRING_DISTANCES.items())
+    log('pairing distances', distances)
+    for total_calls in args.calls:
+        calls = synthetic_cohort(total_calls, args.libraries, args.hotspot_fraction)
+        start_time = time.time()
+        pairings = pair_by_distance(calls, distances)
+        current_time = time.time() - start_time
+        log('{} calls, {} pairings: {:.2f}s'.format(
+            total_calls, sum([len(v) for v in pairings.values()]) // 2, current_time))
+        if args.skip_previous:
+            continue
+        start_time = time.time()
+        previous_pairings = scan_pair_by_distance(calls, distances)
+        previous_time = time.time() - start_time
+        if previous_pairings != pairings:
+            raise AssertionError('pairings do not match the previous implementation')
+        log('previous implementation: {:.2f}s (speedup: {:.1f}x)'.format(
+            previous_time, previous_time / current_time), time_stamp=False)
+
+
+if __name__ == '__main__':
+    main()
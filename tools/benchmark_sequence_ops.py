@@ -0,0 +1,63 @@
+"""
+Script used to compare the speed of the table based reverse_complement and translate functions against building
+Bio.Seq objects (the previous implementation)
+"""
+import argparse
+import random
+import timeit
+
+from Bio.Seq import Seq
+
+from mavis.constants import DNA_ALPHABET, reverse_complement, translate
+from mavis.util import log
+
+
+def parse_arguments():
+    """
+    parse command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--length', default=150, type=int, metavar='INT', help='length of the random sequences to be used')
+    parser.add_argument(
+        '--sequences', default=1000, type=int, metavar='INT', help='number of random sequences to be used')
+    parser.add_argument(
+        '--repeat', default=10, type=int, metavar='INT', help='number of times to process the sequences')
+    parser.add_argument('--seed', default=1, type=int, metavar='INT', help='seed for generating the random sequences')
+    return parser.parse_args()
+
+
+def bio_reverse_complement(seq):
+    return str(Seq(seq, DNA_ALPHABET).reverse_complement())
+
+
+def bio_translate(seq):
+    seq = seq[:len(seq) - len(seq) % 3]
+    return str(Seq(seq, DNA_ALPHABET).translate())
+
+
+def benchmark(name, func, sequences, repeat):
+    seconds = timeit.timeit(lambda: [func(s) for s in sequences], number=repeat)
+    log('{}: {:.4f}s'.format(name, seconds), time_stamp=False)
+    return seconds
+
+
+def main():
+    args = parse_arguments()
+    random.seed(args.seed)
+    sequences = [''.join([random.choice('ACGTN') for i in range(args.length)]) for j in range(args.sequences)]
+    log('processing {} sequences of length {} ({} times)'.format(args.sequences, args.length, args.repeat))
+    for name, current, previous in [
+        ('reverse_complement', reverse_complement, bio_reverse_complement),
+        ('translate', translate, bio_translate)
+    ]:
+        if any([current(s) != previous(s) for s in sequences]):
+            raise AssertionError('results do not match', name)
+        log(name)
+        previous_time = benchmark('Bio.Seq', previous, sequences, args.repeat)
+        current_time = benchmark('mavis', current, sequences, args.repeat)
+        log('speedup: {:.1f}x'.format(previous_time / current_time), time_stamp=False)
+
+
+if __name__ == '__main__':
+    main()